@@ -0,0 +1,187 @@
+"""Offline benchmarks of crawling, assembly and rendering, against the local BioCyc stand-in server.
+
+For each input size, measures request throughput of `get_ontology_data`, assembly time of `build_ontology`,
+render times of `to_string` and `to_html`, and peak (Python-allocated) memory of building and rendering.
+Results are written as JSON lines, one record per input size, so they can be tracked across commits:
+
+    python benchmarks/run.py --sizes 10 1000 100000 --latency 0.02 --output results.jsonl
+
+With --assemble-scaling, only assembly is timed (straight from the synthetic hierarchy, without a server), and
+a single record gives the growth exponent of assembly time between the smallest and largest size. With
+--max-exponent, the run fails if assembly grows faster than that (1 is linear, 2 quadratic):
+
+    python benchmarks/run.py --assemble-scaling --sizes 10000 80000 --max-exponent 1.5
+"""
+
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from collections import defaultdict
+
+import requests
+
+from server import BioCycServer, SyntheticHierarchy
+
+import ontologize.biocyc as biocyc
+from ontologize.biocyc import SessionPool
+from ontologize.ontology import _assemble, get_ontology_data
+
+SIZES = [10, 100, 1_000, 10_000, 100_000]
+
+
+def _serve(config, conn):
+    # Server process: build the hierarchy, then report the URL and serve until terminated
+    hierarchy = SyntheticHierarchy(config["objects"], depth=config["depth"], fanout=config["fanout"],
+                                   multi_parent_rate=config["multi_parent_rate"], seed=config["seed"])
+    server = BioCycServer(hierarchy, latency=config["latency"], jitter=config["jitter"],
+                          error_rate=config["error_rate"], seed=config["seed"])
+    conn.send(server.url)
+    server._server.serve_forever()
+
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def _timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def run_one(config, max_workers, batch_size, preload):
+    """Benchmark one input size, with the server running in its own process so that it does not
+    compete with the client for the GIL or show up in its memory."""
+    parent_conn, child_conn = multiprocessing.Pipe()
+    process = multiprocessing.Process(target=_serve, args=(config, child_conn), daemon=True)
+    process.start()
+    try:
+        url = parent_conn.recv()
+        biocyc.BIOCYC_URL = url
+        objects = [f"OBJ-{i}" for i in range(config["objects"])]
+
+        # Crawl
+        session = SessionPool(user="benchmark", password="benchmark")
+        (common_names, parents), crawl_seconds = _timed(
+            get_ontology_data, objects, "Gene", session=session, show_progress=False, cache=False,
+            max_workers=max_workers, batch_size=batch_size, preload=preload)
+        server_stats = requests.get(f"{url}/_stats").json()
+
+        # Assemble and render
+        property = [[obj] for obj in objects]
+        ontology, assemble_seconds = _timed(_assemble, objects, property, common_names, parents)
+        _, to_string_seconds = _timed(ontology.to_string)
+        _, to_html_seconds = _timed(ontology.to_html)
+        _, to_html_lazy_seconds = _timed(ontology.to_html, lazy=True)
+
+        # Peak memory of assembling and rendering, measured separately since tracing slows everything down
+        tracemalloc.start()
+        traced = _assemble(objects, property, common_names, parents)
+        traced.to_string()
+        traced.to_html()
+        _, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del traced
+    finally:
+        process.terminate()
+        process.join()
+
+    return {
+        **config,
+        "max_workers": max_workers,
+        "batch_size": batch_size,
+        "preload": preload,
+        "nodes": ontology.graph.number_of_nodes(),
+        "edges": ontology.graph.number_of_edges(),
+        "requests": server_stats["requests"],
+        "server_errors": server_stats["errors"],
+        "response_bytes": server_stats["bytes"],
+        "crawl_seconds": crawl_seconds,
+        "requests_per_second": server_stats["requests"] / crawl_seconds if crawl_seconds > 0 else None,
+        "objects_per_second": config["objects"] / crawl_seconds if crawl_seconds > 0 else None,
+        "assemble_seconds": assemble_seconds,
+        "to_string_seconds": to_string_seconds,
+        "to_html_seconds": to_html_seconds,
+        "to_html_lazy_seconds": to_html_lazy_seconds,
+        "peak_memory_bytes": peak_memory,
+    }
+
+
+def assemble_scaling(sizes, depth, fanout, multi_parent_rate, seed, repeat=3):
+    """Best assembly time of each input size, and the growth exponent between the smallest and largest size."""
+    seconds = {}
+    for size in sizes:
+        hierarchy = SyntheticHierarchy(size, depth=depth, fanout=fanout, multi_parent_rate=multi_parent_rate,
+                                       seed=seed)
+        common_names = {frame: name for frame, (name, _) in hierarchy.frames.items()}
+        parents = defaultdict(list, {frame: frame_parents for frame, (_, frame_parents) in hierarchy.frames.items()})
+        property = [[obj] for obj in hierarchy.objects]
+        seconds[size] = min(_timed(_assemble, hierarchy.objects, property, common_names, parents)[1]
+                            for _ in range(repeat))
+
+    smallest, largest = min(sizes), max(sizes)
+    exponent = (math.log(seconds[largest] / seconds[smallest]) / math.log(largest / smallest)
+                if largest > smallest else None)
+    return {"assemble_seconds": {str(size): t for size, t in seconds.items()}, "assemble_exponent": exponent}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run offline ontologize benchmarks against a local BioCyc stand-in.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES, help="Numbers of objects to benchmark.")
+    parser.add_argument("--depth", type=int, default=4, help="Number of class levels below the root.")
+    parser.add_argument("--fanout", type=int, default=8, help="Subclasses per class.")
+    parser.add_argument("--multi-parent", type=float, default=0.1, help="Probability of a second parent.")
+    parser.add_argument("--latency", type=float, default=0.0, help="Server latency per request, in seconds.")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Random extra server latency, in seconds.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with a 503.")
+    parser.add_argument("--max-workers", type=int, default=None, help="Maximum requests in flight (library default if omitted).")
+    parser.add_argument("--batch-size", type=int, default=None, help="Objects per request (library default if omitted).")
+    parser.add_argument("--preload", action="store_true", help="Preload the class hierarchy.")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed of the hierarchy and server.")
+    parser.add_argument("--output", type=str, default=None, help="File to append JSON lines to (stdout if omitted).")
+    parser.add_argument("--assemble-scaling", action="store_true",
+                        help="Only time assembly, and report how it grows with the input size.")
+    parser.add_argument("--max-exponent", type=float, default=None,
+                        help="With --assemble-scaling, fail if assembly time grows faster than size to this power.")
+    args = parser.parse_args()
+
+    from ontologize.defaults import MAX_WORKERS, BATCH_SIZE
+    environment = {"commit": _commit(), "python": platform.python_version(), "platform": platform.platform(),
+                   "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z")}
+
+    out = open(args.output, "a") if args.output else sys.stdout
+    try:
+        if args.assemble_scaling:
+            record = assemble_scaling(args.sizes, args.depth, args.fanout, args.multi_parent, args.seed)
+            out.write(json.dumps({**environment, **record}) + "\n")
+            exponent = record["assemble_exponent"]
+            if args.max_exponent is not None and exponent is not None and exponent > args.max_exponent:
+                sys.exit(f"Assembly time grows with size to the power {exponent:.2f} (limit {args.max_exponent}).")
+            return
+
+        for size in args.sizes:
+            config = {"objects": size, "depth": args.depth, "fanout": args.fanout,
+                      "multi_parent_rate": args.multi_parent, "latency": args.latency, "jitter": args.jitter,
+                      "error_rate": args.error_rate, "seed": args.seed}
+            record = run_one(config, args.max_workers or MAX_WORKERS, args.batch_size or BATCH_SIZE, args.preload)
+            out.write(json.dumps({**environment, **record}) + "\n")
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
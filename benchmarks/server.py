@@ -0,0 +1,241 @@
+"""Local stand-in for the BioCyc web services, serving a synthetic class hierarchy.
+
+Mimics the endpoints ontologize uses: `credentials/login`, `getxml` (single and batched frames) and
+`apixml` (`get-class-all-subs` and `get-class-all-instances`), with configurable latency and error rates.
+Point ontologize at it by setting ONTOLOGIZE_BIOCYC_URL (or `ontologize.biocyc.BIOCYC_URL`) to its URL.
+
+Run standalone with:
+
+    python benchmarks/server.py --objects 1000 --depth 4 --fanout 8 --latency 0.05
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+from xml.sax.saxutils import escape, quoteattr
+
+COOKIE = "PTools-session=synthetic"
+
+
+class SyntheticHierarchy:
+    """Random class hierarchy with objects at the leaves.
+
+    Classes form `depth` levels below a root class, each class having `fanout` subclasses. Objects hang off
+    random classes of the deepest level. With probability `multi_parent_rate`, a class or object gets a second
+    parent, chosen at random from the level of its first parent.
+
+    Args:
+        objects (int): Number of objects.
+        depth (int, optional): Number of class levels below the root. Defaults to 4.
+        fanout (int, optional): Subclasses per class. Defaults to 8.
+        multi_parent_rate (float, optional): Probability of a second parent. Defaults to 0.1.
+        schema_type (str, optional): Type of the frames. Defaults to "Gene".
+        root (str, optional): ID of the root class. Defaults to "Genes".
+        seed (int, optional): Random seed. Defaults to 0.
+    """
+
+    def __init__(self, objects, depth=4, fanout=8, multi_parent_rate=0.1, schema_type="Gene", root="Genes",
+                 seed=0) -> None:
+        self.schema_type = schema_type
+        self.root = root
+        rng = random.Random(seed)
+
+        # frame ID -> (common name, parent IDs)
+        self.frames = {root: (root, [])}
+        self.classes = {root}
+        levels = [[root]]
+        for level in range(1, depth + 1):
+            nodes = []
+            for i, parent in enumerate(p for p in levels[-1] for _ in range(fanout)):
+                node = f"CLASS-{level}-{i}"
+                self.frames[node] = (f"Class {level}.{i}", self._parents(rng, parent, levels, multi_parent_rate))
+                nodes.append(node)
+            self.classes.update(nodes)
+            levels.append(nodes)
+
+        self.objects = [f"OBJ-{i}" for i in range(objects)]
+        for i, obj in enumerate(self.objects):
+            parent = rng.choice(levels[-1])
+            self.frames[obj] = (f"Object {i}", self._parents(rng, parent, levels, multi_parent_rate))
+
+    @staticmethod
+    def _parents(rng, parent, levels, multi_parent_rate):
+        # The second parent comes from the same level as the first, so the hierarchy stays acyclic
+        parents = [parent]
+        if rng.random() < multi_parent_rate:
+            other = rng.choice(levels[-1])
+            if other != parent:
+                parents.append(other)
+        return parents
+
+    def frame_xml(self, org_id, frame_id) -> str:
+        common_name, parents = self.frames[frame_id]
+        t = self.schema_type
+        parent_xml = "".join(
+            f'<parent><{t} resource="getxml?{org_id}:{p}" orgid="{org_id}" frameid={quoteattr(p)} class="true"/></parent>'
+            for p in parents)
+        return (f'<{t} ID="{org_id}:{frame_id}" orgid="{org_id}" frameid={quoteattr(frame_id)} detail="low">'
+                f'{parent_xml}<common-name datatype="string">{escape(common_name)}</common-name></{t}>')
+
+
+class BioCycServer:
+    """Threaded HTTP server serving a `SyntheticHierarchy` as BioCyc would.
+
+    Args:
+        hierarchy (SyntheticHierarchy): Hierarchy to serve.
+        latency (float, optional): Delay added to every response, in seconds. Defaults to 0.
+        jitter (float, optional): Random extra delay of up to this many seconds. Defaults to 0.
+        error_rate (float, optional): Fraction of requests answered with a 503. Defaults to 0.
+        require_login (bool, optional): Whether requests without the login cookie get a 401. Defaults to True.
+        host (str, optional): Host to bind to. Defaults to "127.0.0.1".
+        port (int, optional): Port to bind to, or 0 for any free port. Defaults to 0.
+        seed (int, optional): Random seed for latency jitter and errors. Defaults to 0.
+    """
+
+    def __init__(self, hierarchy, latency=0.0, jitter=0.0, error_rate=0.0, require_login=True,
+                 host="127.0.0.1", port=0, seed=0) -> None:
+        self.hierarchy = hierarchy
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.require_login = require_login
+        self.stats = {"requests": 0, "errors": 0, "bytes": 0, "frames": 0}
+
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "BioCycServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "BioCycServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                # Login accepts any credentials
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if urlsplit(self.path).path.rstrip("/") == "/credentials/login":
+                    self._send(200, "", headers={"Set-Cookie": f"{COOKIE}; Path=/"})
+                else:
+                    self._send(404, "")
+
+            def do_GET(self):
+                path = urlsplit(self.path).path
+                if path == "/_stats":
+                    with server._lock:
+                        stats = json.dumps(server.stats)
+                    return self._send(200, stats, content_type="application/json")
+                status, body = server._respond(self.path, self.headers.get("Cookie", ""))
+                self._send(status, body)
+
+            def _send(self, status, body, content_type="text/xml", headers=None):
+                data = body.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+                with server._lock:
+                    server.stats["bytes"] += len(data)
+
+        return Handler
+
+    def _respond(self, path, cookie):
+        with self._lock:
+            self.stats["requests"] += 1
+            delay = self.latency + self._rng.uniform(0, self.jitter)
+            fail = self._rng.random() < self.error_rate
+            if fail:
+                self.stats["errors"] += 1
+        time.sleep(delay)
+
+        if fail:
+            return 503, ""
+        if self.require_login and COOKIE not in cookie:
+            return 401, ""
+
+        parts = urlsplit(path)
+        hierarchy = self.hierarchy
+        if parts.path == "/getxml":
+            # Query is ORG:ID[,ORG:ID...] followed by options
+            ids = unquote(parts.query.split("&", 1)[0]).split(",")
+            frames = [(org_id, frame_id) for org_id, _, frame_id in (i.partition(":") for i in ids)
+                      if frame_id in hierarchy.frames]
+        elif parts.path == "/apixml":
+            query = parse_qs(parts.query)
+            fn = query.get("fn", [""])[0]
+            org_id, _, frame_id = query.get("id", [""])[0].partition(":")
+            if fn == "get-class-all-subs" and frame_id in hierarchy.classes:
+                frames = [(org_id, c) for c in hierarchy.classes if c != frame_id]
+            elif fn == "get-class-all-instances":
+                frames = [(org_id, obj) for obj in hierarchy.objects]
+            else:
+                return 404, ""
+        else:
+            return 404, ""
+
+        if not frames:
+            return 404, ""
+        with self._lock:
+            self.stats["frames"] += len(frames)
+        body = "".join(hierarchy.frame_xml(org_id, frame_id) for org_id, frame_id in frames)
+        return 200, f'<?xml version="1.0" encoding="UTF-8"?>\n<ptools-xml>{body}</ptools-xml>'
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a synthetic class hierarchy as the BioCyc web services would.")
+    parser.add_argument("--objects", type=int, default=1000, help="Number of objects.")
+    parser.add_argument("--depth", type=int, default=4, help="Number of class levels below the root.")
+    parser.add_argument("--fanout", type=int, default=8, help="Subclasses per class.")
+    parser.add_argument("--multi-parent", type=float, default=0.1, help="Probability of a second parent.")
+    parser.add_argument("--latency", type=float, default=0.0, help="Delay added to every response, in seconds.")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Random extra delay, in seconds.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with a 503.")
+    parser.add_argument("--port", type=int, default=0, help="Port to listen on (any free port by default).")
+    args = parser.parse_args()
+
+    hierarchy = SyntheticHierarchy(args.objects, depth=args.depth, fanout=args.fanout,
+                                   multi_parent_rate=args.multi_parent)
+    server = BioCycServer(hierarchy, latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                          port=args.port)
+    print(f"Serving {len(hierarchy.frames)} frames at {server.url}", flush=True)
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,20 @@
+import random
+import threading
+import time
+import warnings
+
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
 import requests
-import xmltodict
 import getpass
 
-from ontologize.defaults import ECOLI
+from ontologize.cache import resolve_cache
+from ontologize.defaults import (ECOLI, BIOCYC_URL, MAX_WORKERS, INITIAL_WORKERS, MAX_RETRIES, BACKOFF_BASE,
+                                 BACKOFF_MAX, XML_CHUNK_SIZE)
+from ontologize.stats import carry, current as current_stats
+from ontologize.xmlparse import iter_frames
 
 
 class SchemaError(Exception):
@@ -23,7 +35,7 @@ def get_session(user=None, password=None, retries=3):
             password = getpass.getpass("Enter your BioCyc password: ")
 
         # Post login credentials
-        r = s.post("https://websvc.biocyc.org/credentials/login/",
+        r = s.post(f"{BIOCYC_URL}/credentials/login/",
                    data={"email": user, "password": password})
 
         # Check if login was successful
@@ -41,6 +53,191 @@ def get_session(user=None, password=None, retries=3):
     return s
 
 
+class AdaptiveLimiter:
+    """Concurrency limit that adapts to the server using additive increase, multiplicative
+    decrease (AIMD): the limit grows by about one per round trip while requests succeed quickly,
+    and halves (at most once per round trip) when a request fails, is throttled, or takes more
+    than `tolerance` times the fastest latency seen.
+
+    The limit is also enforced on requests themselves (see `slot`), so that several crawls sharing
+    a limiter (e.g. through one SessionPool) stay within one budget together.
+
+    Args:
+        initial (int, optional): Initial limit. Defaults to INITIAL_WORKERS.
+        minimum (int, optional): Lowest limit. Defaults to 1.
+        maximum (int, optional): Highest limit. Defaults to MAX_WORKERS.
+        tolerance (float, optional): Latency, as a multiple of the fastest latency seen, above which
+            the server is considered congested. Defaults to 3.
+    """
+
+    def __init__(self, initial: int = INITIAL_WORKERS, minimum: int = 1, maximum: int = MAX_WORKERS,
+                 tolerance: float = 3.0) -> None:
+        self.minimum = minimum
+        self.maximum = maximum
+        self.tolerance = tolerance
+        self.min_latency = None
+
+        self._limit = float(max(minimum, min(maximum, initial)))
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._available = threading.Condition(self._lock)
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @contextmanager
+    def slot(self):
+        """Hold one of the `limit` request slots for the duration of a request, waiting for one to free up
+        if all are taken."""
+        with self._available:
+            while self._in_flight >= int(self._limit):
+                self._available.wait()
+            self._in_flight += 1
+        try:
+            yield
+        finally:
+            with self._available:
+                self._in_flight -= 1
+                self._available.notify()
+
+    def record(self, latency: float, ok: bool) -> None:
+        """Record the outcome of one request.
+
+        Args:
+            latency (float): Time taken by the request, in seconds.
+            ok (bool): Whether the request succeeded (i.e., was not failed or throttled).
+        """
+        with self._lock:
+            if ok and (self.min_latency is None or latency < self.min_latency):
+                self.min_latency = latency
+
+            congested = not ok or (self.min_latency is not None and latency > self.tolerance * self.min_latency)
+            if congested:
+                # Decrease at most once per round trip, so one burst is not punished repeatedly
+                now = time.monotonic()
+                if now - self._last_decrease > latency:
+                    self._limit = max(self.minimum, self._limit / 2)
+                    self._last_decrease = now
+            else:
+                self._limit = min(self.maximum, self._limit + 1 / self._limit)
+                self._available.notify_all()
+
+
+class SessionPool:
+    """Pool of BioCyc sessions sharing one login. Each thread gets its own `requests.Session`
+    carrying the login cookies, so sessions are never shared across threads. Connection errors,
+    timeouts and 429/5xx responses are retried with jittered exponential backoff, and every attempt
+    is reported to an `AdaptiveLimiter` that crawlers use to size their concurrency.
+
+    Logging in is deferred until the first request, so a pool costs nothing if every lookup
+    is served from the cache.
+
+    Args:
+        user (str, optional): BioCyc username. Prompted for if needed. Defaults to None.
+        password (str, optional): BioCyc password. Prompted for if needed. Defaults to None.
+        session (requests.Session, optional): Logged-in session whose cookies to share, instead of logging in.
+            Defaults to None.
+        retries (int, optional): Maximum number of retries per request. Defaults to MAX_RETRIES.
+        backoff (float, optional): Base delay between retries, in seconds, doubled after each retry. Defaults to BACKOFF_BASE.
+        limiter (AdaptiveLimiter, optional): Limiter to report to. Defaults to a new AdaptiveLimiter.
+    """
+
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+    def __init__(self, user=None, password=None, session=None, retries=MAX_RETRIES, backoff=BACKOFF_BASE,
+                 limiter=None) -> None:
+        self.user = user
+        self.password = password
+        self.retries = retries
+        self.backoff = backoff
+        self.limiter = limiter if limiter is not None else AdaptiveLimiter()
+
+        self._login_session = session
+        self._login_lock = threading.Lock()
+        self._local = threading.local()
+
+    def _cookies(self):
+        # Log in once, on first use
+        with self._login_lock:
+            if self._login_session is None:
+                self._login_session = get_session(self.user, self.password)
+            return self._login_session.cookies
+
+    def session(self) -> requests.Session:
+        """Get the session of the calling thread, creating it if needed."""
+        s = getattr(self._local, "session", None)
+        if s is None:
+            s = requests.Session()
+
+            # One request at a time per thread, so one pooled connection is enough
+            adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=1)
+            s.mount("https://", adapter)
+            s.mount("http://", adapter)
+
+            s.cookies.update(self._cookies())
+            self._local.session = s
+        return s
+
+    def _delay(self, attempt, response=None):
+        # Honour Retry-After if the server sent one, else back off exponentially with full jitter
+        if response is not None:
+            retry_after = response.headers.get("Retry-After", "")
+            if retry_after.isdigit():
+                return min(BACKOFF_MAX, float(retry_after))
+        return random.uniform(0, min(BACKOFF_MAX, self.backoff * 2 ** attempt))
+
+    def get(self, url, **kwargs) -> requests.Response:
+        """Send a GET request through the calling thread's session, retrying transient failures.
+        Takes the same arguments as `requests.Session.get`.
+        """
+        s = self.session()
+        stats = current_stats()
+        attempt = 0
+        while True:
+            try:
+                with self.limiter.slot():
+                    start = time.monotonic()
+                    r = s.get(url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                latency = time.monotonic() - start
+                self.limiter.record(latency, ok=False)
+                if stats is not None:
+                    stats.record_request(latency, type(e).__name__, retry=attempt > 0)
+                if attempt >= self.retries:
+                    raise
+                time.sleep(self._delay(attempt))
+                attempt += 1
+                continue
+
+            latency = time.monotonic() - start
+            retry = r.status_code in self.RETRY_STATUSES
+            self.limiter.record(latency, ok=not retry)
+            if stats is not None:
+                # Streamed bodies are not read yet, so go by the declared length
+                nbytes = (int(r.headers.get("Content-Length") or 0) if kwargs.get("stream")
+                          else len(r.content))
+                stats.record_request(latency, r.status_code, nbytes, retry=attempt > 0)
+            if not retry or attempt >= self.retries:
+                return r
+            r.close()
+            time.sleep(self._delay(attempt, r))
+            attempt += 1
+
+
+def as_session_pool(session=None):
+    """Wrap the `session` argument of the crawling functions: None gives a new pool (logging in lazily),
+    a `requests.Session` gives a pool sharing its login, and anything else (e.g. an existing pool)
+    is used as-is.
+    """
+    if session is None:
+        return SessionPool()
+    if isinstance(session, requests.Session):
+        return SessionPool(session=session)
+    return session
+
+
 def get_parents(object_id: str, object_type: str, org_id: str = ECOLI, session=None):
     """Get the parents of the given object in the given organism.
 
@@ -58,21 +255,19 @@ def get_parents(object_id: str, object_type: str, org_id: str = ECOLI, session=N
 
     # Get parents
     r = s.get(
-        f"https://websvc.biocyc.org/getxml?{org_id}:{object_id}&detail=low")
+        f"{BIOCYC_URL}/getxml?{org_id}:{object_id}&detail=low")
 
     # Check if request was successful
     if r.status_code != 200:
         raise Exception("Request failed")
 
-    o = xmltodict.parse(r.content)
-    parents = o["ptools-xml"][object_type].get("parent", [])
-    if isinstance(parents, dict):
-        parents = [parents]
-
-    return parents
+    for frame in _frames(r):
+        if frame["type"] == object_type:
+            return frame["parents"]
+    raise SchemaError(f"{object_id} does not match schema_type {object_type}.")
 
 
-def get_parents_and_common_name(object_id: str, object_type: str, org_id: str = ECOLI, session=None):
+def get_parents_and_common_name(object_id: str, object_type: str, org_id: str = ECOLI, session=None, cache=None):
     """Get the parents and the common name of the given object in the given organism.
     Defined as one function to save on requests.
 
@@ -80,88 +275,395 @@ def get_parents_and_common_name(object_id: str, object_type: str, org_id: str =
         object_id (str): Object for which to retrieve the parents.
         object_type (str) : Type of the object (Gene, Compound, etc.)
         org_id (str, optional): Organism id. Defaults to ECOLI.
+        cache (FrameCache | bool, optional): Cache of previous lookups. If None, the default cache is used;
+            if False, caching is disabled. Defaults to None.
 
     Returns:
         tuple[list[dict], str]: List of parents and the common name of the object. Parent information is returned as raw dict form.
     """
 
+    # Check cache
+    cache = resolve_cache(cache)
+    if cache is not None:
+        cached = cache.get(org_id, object_id, object_type)
+        if cached is not None:
+            parents, common_name = cached
+            return parents, common_name
+
     # Create session
     s = session if session is not None else get_session()
 
     # Get parents
     r = s.get(
-        f"https://websvc.biocyc.org/getxml?{org_id}:{object_id}&detail=low")
+        f"{BIOCYC_URL}/getxml?{org_id}:{object_id}&detail=low")
 
     # Check if request was successful
     if r.status_code != 200:
         raise requests.HTTPError(f"Request failed (status {r.status_code}).")
 
-    o = xmltodict.parse(r.content)["ptools-xml"]
-
-    if object_type not in o:
+    frame = next((frame for frame in _frames(r) if frame["type"] == object_type), None)
+    if frame is None:
         raise SchemaError(f"{object_id} does not match schema_type {object_type}.")
 
-    # Get common name if it exists, else use object id
-    common_name = o[object_type].get(
-        "common-name", {}).get("#text", object_id)
+    parents, common_name = _parse_frame(frame, object_id)
 
-    # Get parents
-    parents = o[object_type].get("parent", [])
-    if isinstance(parents, dict):
-        parents = [parents]
+    # Store in cache
+    if cache is not None:
+        cache.set(org_id, object_id, object_type, [parents, common_name])
 
     return parents, common_name
 
 
+def _frames(r):
+    # Parse frames from the response as its body is read (see FrameParser)
+    frames = iter_frames(r.iter_content(XML_CHUNK_SIZE))
+    stats = current_stats()
+    return frames if stats is None else _timed_frames(frames, stats)
+
+
+def _timed_frames(frames, stats):
+    # Record time spent reading and parsing, but not the caller's work between frames
+    elapsed = 0.0
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                frame = next(frames)
+            except StopIteration:
+                return
+            finally:
+                elapsed += time.perf_counter() - start
+            yield frame
+    finally:
+        stats.record_parse(elapsed)
+
+
+def _parse_frame(frame: dict, object_id: str):
+    # Get common name if it exists, else use object id
+    common_name = frame["common_name"] or object_id
+    return frame["parents"], common_name
+
+
+def get_parents_and_common_names(object_ids: list[str], object_type: str, org_id: str = ECOLI, session=None, cache=None):
+    """Get the parents and the common names of many objects in the given organism,
+    using a single request for all objects that are not already cached. Objects that
+    are missing from the batched response are retried one by one.
+
+    Args:
+        object_ids (list[str]): Objects for which to retrieve the parents.
+        object_type (str) : Type of the objects (Gene, Compound, etc.)
+        org_id (str, optional): Organism id. Defaults to ECOLI.
+        cache (FrameCache | bool, optional): Cache of previous lookups. If None, the default cache is used;
+            if False, caching is disabled. Defaults to None.
+
+    Returns:
+        tuple[dict[str, tuple[list[dict], str]], dict[str, Exception]]: Parents and common name of each object
+            that could be retrieved, and the error raised for each object that could not.
+    """
+    results = {}
+    errors = {}
+
+    # Check cache
+    cache = resolve_cache(cache)
+    remaining = []
+    for object_id in dict.fromkeys(object_ids):
+        cached = cache.get(org_id, object_id, object_type) if cache is not None else None
+        if cached is not None:
+            parents, common_name = cached
+            results[object_id] = (parents, common_name)
+        else:
+            remaining.append(object_id)
+
+    if len(remaining) == 0:
+        return results, errors
+
+    # Create session
+    s = session if session is not None else get_session()
+
+    # Get all remaining frames in one request
+    # (a single object goes straight to the per-object fallback)
+    if len(remaining) > 1:
+        ids = ",".join(f"{org_id}:{object_id}" for object_id in remaining)
+        try:
+            r = s.get(f"{BIOCYC_URL}/getxml?{ids}&detail=low")
+        except requests.exceptions.RequestException:
+            r = None
+
+        # If the batch is rejected as a whole, every object falls back to its own request
+        if r is not None and r.status_code == 200:
+            requested = set(remaining)
+            for frame in _frames(r):
+                object_id = frame["frameid"]
+                if object_id not in requested:
+                    continue
+
+                # Frames of the wrong type do not match the schema
+                if frame["type"] != object_type:
+                    errors[object_id] = SchemaError(
+                        f"{object_id} does not match schema_type {object_type}.")
+                    continue
+
+                # Parse frames of the requested type
+                results[object_id] = _parse_frame(frame, object_id)
+
+            # Store in cache, in one write
+            if cache is not None:
+                cache.set_many((org_id, object_id, object_type, list(results[object_id]))
+                               for object_id in remaining if object_id in results)
+
+            remaining = [object_id for object_id in remaining
+                         if object_id not in results and object_id not in errors]
+
+    # Per-object fallback for anything the batch did not return
+    for object_id in remaining:
+        try:
+            results[object_id] = get_parents_and_common_name(
+                object_id, object_type, org_id, s, cache=False)
+        except (requests.exceptions.RequestException, SchemaError) as e:
+            errors[object_id] = e
+
+    if cache is not None:
+        cache.set_many((org_id, object_id, object_type, list(results[object_id]))
+                       for object_id in remaining if object_id in results)
+
+    return results, errors
+
+
+def get_class_hierarchy(root: str, object_type: str, org_id: str = ECOLI, session=None, cache=None):
+    """Get the parents and common names of every class under (and including) the given class,
+    using a single request.
+
+    Args:
+        root (str): Class at the top of the hierarchy (e.g. "Genes", "Pathways").
+        object_type (str) : Type of the classes (Gene, Compound, etc.)
+        org_id (str, optional): Organism id. Defaults to ECOLI.
+        cache (FrameCache | bool, optional): Cache of previous lookups. If None, the default cache is used;
+            if False, caching is disabled. Defaults to None.
+
+    Returns:
+        dict[str, tuple[list[dict], str]]: Parents and common name of each class. Parent information is returned as raw dict form.
+    """
+
+    # Check cache (the whole hierarchy is stored as a single entry)
+    cache = resolve_cache(cache)
+    cache_type = f"{object_type}:class-all-subs"
+    if cache is not None:
+        cached = cache.get(org_id, root, cache_type)
+        if cached is not None:
+            return {class_id: tuple(value) for class_id, value in cached.items()}
+
+    # Create session
+    s = session if session is not None else get_session()
+
+    # Get all subclasses of the root
+    r = s.get(
+        f"{BIOCYC_URL}/apixml?fn=get-class-all-subs&id={org_id}:{root}&detail=low", stream=True)
+
+    # Check if request was successful
+    if r.status_code != 200:
+        raise requests.HTTPError(f"Request failed (status {r.status_code}).")
+
+    hierarchy = {}
+    for frame in _frames(r):
+        if frame["type"] == object_type:
+            class_id = frame["frameid"]
+            hierarchy[class_id] = _parse_frame(frame, class_id)
+
+    # Root itself is not one of its subclasses
+    if root not in hierarchy:
+        hierarchy[root] = get_parents_and_common_name(root, object_type, org_id, s, cache=False)
+
+    # Store in cache
+    if cache is not None:
+        cache.set(org_id, root, cache_type,
+                  {class_id: list(value) for class_id, value in hierarchy.items()})
+
+    return hierarchy
+
+
 def genes_of_reaction(reaction, orgid=ECOLI, session=None):
     # Use session if provided
     s = session if session is not None else get_session()
 
     # Request genes of reaction
     r = s.get(
-        f"https://websvc.biocyc.org/apixml?fn=genes-of-reaction&id={orgid}:{reaction}&detail=none")
+        f"{BIOCYC_URL}/apixml?fn=genes-of-reaction&id={orgid}:{reaction}&detail=none")
     if r.status_code == 404:
-        raise Exception("Reaction not found")
+        raise requests.HTTPError("Reaction not found")
+    if r.status_code != 200:
+        raise requests.HTTPError(f"Request failed (status {r.status_code}).")
 
     # Clean up response
-    genes = xmltodict.parse(r.text)["ptools-xml"].get("Gene", [])
-    if isinstance(genes, dict):
-        genes = [genes]
-    genes = [gene["@frameid"] for gene in genes]
+    return [frame["frameid"] for frame in _frames(r) if frame["type"] == "Gene"]
 
-    return genes
 
+def genes_of_reactions(reactions, orgid=ECOLI, session=None, cache=None, max_workers=MAX_WORKERS):
+    """Get the genes of many reactions, with requests for uncached reactions made in parallel through
+    a shared session pool. Reactions that cannot be looked up are warned about, and given no genes.
 
-def pathways_of_reactions(reactions, orgid=ECOLI, session=None):
-    # Use session if provided
-    s = session if session is not None else get_session()
+    Args:
+        reactions (list[str]): Reactions for which to retrieve the genes.
+        orgid (str, optional): Organism id. Defaults to ECOLI.
+        session (requests.Session | SessionPool, optional): BioCyc session to use (see `as_session_pool`). Defaults to None.
+        cache (FrameCache | bool, optional): Cache of previous lookups. If None, the default cache is used;
+            if False, caching is disabled. Defaults to None.
+        max_workers (int, optional): Maximum number of requests in flight at once. Within this limit, the number
+            of requests in flight follows the session pool's adaptive limit. Defaults to MAX_WORKERS.
+
+    Returns:
+        dict[str, list[str]]: Genes of each reaction.
+    """
+    cache_type = "Reaction:genes"
+    result = {}
+
+    # Check cache
+    cache = resolve_cache(cache)
+    remaining = deque()
+    for reaction in dict.fromkeys(reactions):
+        cached = cache.get(orgid, reaction, cache_type) if cache is not None else None
+        if cached is not None:
+            result[reaction] = cached
+        else:
+            remaining.append(reaction)
+
+    if not remaining:
+        return result
+
+    # Look up the rest in parallel, keeping as many requests in flight as the pool's limiter allows
+    s = as_session_pool(session)
+    limiter = getattr(s, "limiter", None)
+    lookup = carry(genes_of_reaction)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        future_to_reaction = {}
+        while remaining or future_to_reaction:
+            limit = max_workers if limiter is None else min(max_workers, limiter.limit)
+            while remaining and len(future_to_reaction) < limit:
+                reaction = remaining.popleft()
+                future_to_reaction[executor.submit(lookup, reaction, orgid, s)] = reaction
+
+            done, _ = wait(future_to_reaction, return_when=FIRST_COMPLETED)
+            for future in done:
+                reaction = future_to_reaction.pop(future)
+                try:
+                    result[reaction] = future.result()
+                except requests.exceptions.RequestException:
+                    warnings.warn(f"Request failed for reaction {reaction}. Skipping.")
+                    result[reaction] = []
+                    continue
+
+                # Store in cache
+                if cache is not None:
+                    cache.set(orgid, reaction, cache_type, result[reaction])
 
-    # For some inexplicable reason, contrary to the Pathway Tools Schema,
-    # there is no "in-pathway" slot on reactions. Our options are to either
-    # get the genes of the reaction and then get the pathways of the genes,
-    # or to get the reaction-list of each pathway and check if the reaction is in it.
-
-    # Get all pathways in the organism, and which reactions are in those pathways:
-    r = s.get(f"https://websvc.biocyc.org/apixml?fn=get-class-all-instances&id={orgid}:Pathways&detail=low")
-    o = xmltodict.parse(r.content)
-
-    pathway_to_reactions = {}
-    for pathway in o["ptools-xml"]["Pathway"]:
-        if "Reaction" not in pathway["reaction-list"]:  # Skip superpathways (containing pathways instead of reactions)
-            continue
-
-        # Get reaction list and wrap if needed
-        reaction_list = pathway["reaction-list"]["Reaction"]
-        if not isinstance(reaction_list, list):
-            reaction_list = [reaction_list]
-        
-        pathway_to_reactions[pathway["@frameid"]] = {reaction["@frameid"] for reaction in reaction_list}
-
-    # Find the pathways that contain the given reactions:
-    result = {reaction : set() for reaction in reactions}
-    for pathway, pathway_reactions in pathway_to_reactions.items():
-        for reaction in pathway_reactions:
-            if reaction in reactions:
-                result[reaction].add(pathway)
-    
     return result
+
+
+def get_pathway_reactions(org_id: str = ECOLI, session=None, cache=None):
+    """Get the reaction list of every pathway in the organism, using a single request.
+
+    Args:
+        org_id (str, optional): Organism id. Defaults to ECOLI.
+        cache (FrameCache | bool, optional): Cache of previous lookups. If None, the default cache is used;
+            if False, caching is disabled. Defaults to None.
+
+    Returns:
+        dict[str, tuple[list[str], list[str]]]: Reactions and sub-pathways directly listed in the reaction list of each
+            pathway (superpathways list pathways as well as reactions).
+    """
+
+    # Check cache (the whole map is stored as a single entry)
+    cache = resolve_cache(cache)
+    cache_type = "Pathway:reaction-list"
+    if cache is not None:
+        cached = cache.get(org_id, "Pathways", cache_type)
+        if cached is not None:
+            return {pathway: tuple(value) for pathway, value in cached.items()}
+
+    # Create session
+    s = session if session is not None else get_session()
+
+    # Get all pathways in the organism, and which reactions are in those pathways
+    r = s.get(f"{BIOCYC_URL}/apixml?fn=get-class-all-instances&id={org_id}:Pathways&detail=low",
+              stream=True)
+
+    # Check if request was successful
+    if r.status_code != 200:
+        raise requests.HTTPError(f"Request failed (status {r.status_code}).")
+
+    pathway_reactions = {}
+    for frame in _frames(r):
+        if frame["type"] == "Pathway":
+            pathway_reactions[frame["frameid"]] = (frame["reactions"], frame["subpathways"])
+
+    # Store in cache
+    if cache is not None:
+        cache.set(org_id, "Pathways", cache_type,
+                  {pathway: list(value) for pathway, value in pathway_reactions.items()})
+
+    return pathway_reactions
+
+
+def get_reaction_pathways(org_id: str = ECOLI, session=None, cache=None):
+    """Get the pathways of every reaction in the organism, as an index inverted from the reaction lists of
+    all pathways. A reaction belongs to the pathways listing it, and to every superpathway of those.
+
+    Args:
+        org_id (str, optional): Organism id. Defaults to ECOLI.
+        cache (FrameCache | bool, optional): Cache of previous lookups. If None, the default cache is used;
+            if False, caching is disabled. Defaults to None.
+
+    Returns:
+        dict[str, list[str]]: Pathways of each reaction that is part of any pathway.
+    """
+
+    # Check cache (the whole index is stored as a single entry)
+    cache = resolve_cache(cache)
+    cache_type = "Reaction:pathways"
+    if cache is not None:
+        cached = cache.get(org_id, "Reactions", cache_type)
+        if cached is not None:
+            return cached
+
+    pathway_reactions = get_pathway_reactions(org_id, session, cache=cache or False)
+
+    # Invert, expanding each pathway into the reactions of its sub-pathways (at any depth)
+    index = {}
+    for pathway in pathway_reactions:
+        stack = [pathway]
+        visited = {pathway}
+        while stack:
+            reactions, subpathways = pathway_reactions.get(stack.pop(), ((), ()))
+            for reaction in reactions:
+                pathways = index.setdefault(reaction, [])
+                if not pathways or pathways[-1] != pathway:
+                    pathways.append(pathway)
+            for subpathway in subpathways:
+                if subpathway not in visited:
+                    visited.add(subpathway)
+                    stack.append(subpathway)
+
+    # Store in cache
+    if cache is not None:
+        cache.set(org_id, "Reactions", cache_type, index)
+
+    return index
+
+
+def pathways_of_reactions(reactions, orgid=ECOLI, session=None, cache=None):
+    """Get the pathways (including superpathways) of each of the given reactions.
+
+    For some inexplicable reason, contrary to the Pathway Tools Schema, there is no "in-pathway" slot
+    on reactions, so this looks reactions up in an index inverted from the reaction lists of all pathways
+    (see `get_reaction_pathways`), which is downloaded once per organism and cached.
+
+    Args:
+        reactions (list[str]): Reactions for which to retrieve the pathways.
+        orgid (str, optional): Organism id. Defaults to ECOLI.
+        cache (FrameCache | bool, optional): Cache of previous lookups. If None, the default cache is used;
+            if False, caching is disabled. Defaults to None.
+
+    Returns:
+        dict[str, set[str]]: Pathways of each reaction (empty if the reaction is in no pathway).
+    """
+    index = get_reaction_pathways(orgid, session, cache=cache)
+    return {reaction: set(index.get(reaction, ())) for reaction in reactions}
@@ -0,0 +1,261 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from collections import OrderedDict
+from typing import Optional
+
+from ontologize.defaults import CACHE_PATH, CACHE_TTL, CACHE_MAXSIZE, CACHE_DISK_MAXSIZE
+
+
+class InFlight:
+    """Registry of lookups in flight, so that concurrent crawls sharing a cache wait for each other's
+    requests instead of repeating them. Keys are claimed before a lookup and released once its result
+    is cached (or the lookup failed); others claiming a key in the meantime are handed an event to wait on.
+    """
+
+    def __init__(self) -> None:
+        self._events = {}
+        self._lock = threading.Lock()
+
+    def claim(self, keys):
+        """Claim the keys not already claimed.
+
+        Returns:
+            tuple[list, dict]: Keys claimed by the caller, and events of keys claimed by others, set on release.
+        """
+        mine, theirs = [], {}
+        with self._lock:
+            for key in keys:
+                event = self._events.get(key)
+                if event is None:
+                    self._events[key] = threading.Event()
+                    mine.append(key)
+                else:
+                    theirs[key] = event
+        return mine, theirs
+
+    def release(self, keys) -> None:
+        """Release claimed keys, waking everyone waiting on them."""
+        with self._lock:
+            events = [self._events.pop(key) for key in keys if key in self._events]
+        for event in events:
+            event.set()
+
+
+class FrameCache:
+    """Two-tier cache of BioCyc frame lookups, keyed by (org_id, object_id, schema_type).
+
+    The first tier is an in-process LRU dict; the second is an SQLite database on disk,
+    so that lookups survive across runs. Entries older than `ttl` seconds are treated as
+    missing in both tiers.
+
+    Args:
+        path (str, optional): Path to the SQLite database. If None, only the in-process tier is used.
+            Defaults to CACHE_PATH.
+        maxsize (int, optional): Maximum number of entries held in memory. Defaults to CACHE_MAXSIZE.
+        ttl (float, optional): Time-to-live of entries, in seconds. If None, entries never expire.
+            Defaults to CACHE_TTL.
+        disk_maxsize (int, optional): Maximum number of entries held on disk. Oldest entries are evicted first.
+            Defaults to CACHE_DISK_MAXSIZE.
+    """
+
+    # Number of writes between checks of the on-disk size limit
+    PRUNE_INTERVAL = 256
+
+    def __init__(self,
+                 path: Optional[str] = CACHE_PATH,
+                 maxsize: int = CACHE_MAXSIZE,
+                 ttl: Optional[float] = CACHE_TTL,
+                 disk_maxsize: int = CACHE_DISK_MAXSIZE) -> None:
+        self.path = path
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.disk_maxsize = disk_maxsize
+        self.hits = 0
+        self.misses = 0
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+
+        # Lookups in flight, shared by crawls using this cache
+        self.inflight = InFlight()
+
+        # Open on-disk tier
+        self._db = None
+        if path is not None:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+
+            # Write-ahead logging without a sync per commit: a crash may lose the latest writes, but never
+            # corrupts the database, and lost lookups are simply fetched again
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS frames (
+                    org_id TEXT NOT NULL,
+                    object_id TEXT NOT NULL,
+                    schema_type TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    fetched REAL NOT NULL,
+                    PRIMARY KEY (org_id, object_id, schema_type)
+                )""")
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS frames_fetched ON frames (fetched)")
+            self._db.commit()
+
+    def _expired(self, fetched: float) -> bool:
+        return self.ttl is not None and time.time() - fetched > self.ttl
+
+    def get(self, org_id: str, object_id: str, schema_type: str):
+        """Get a cached value, or None if it is missing or expired.
+
+        Args:
+            org_id (str): Organism id.
+            object_id (str): Object id.
+            schema_type (str): Type of the object (Gene, Compound, etc.)
+
+        Returns:
+            Cached value, or None.
+        """
+        key = (org_id, object_id, schema_type)
+        with self._lock:
+            # Check in-process tier
+            if key in self._memory:
+                value, fetched = self._memory[key]
+                if not self._expired(fetched):
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._memory[key]
+
+            # Check on-disk tier, promoting hits to memory
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, fetched FROM frames WHERE org_id = ? AND object_id = ? AND schema_type = ?",
+                    key).fetchone()
+                if row is not None and not self._expired(row[1]):
+                    value = json.loads(row[0])
+                    self._remember(key, value, row[1])
+                    self.hits += 1
+                    return value
+
+            self.misses += 1
+            return None
+
+    def set(self, org_id: str, object_id: str, schema_type: str, value) -> None:
+        """Store a (JSON-serializable) value in both tiers.
+
+        Args:
+            org_id (str): Organism id.
+            object_id (str): Object id.
+            schema_type (str): Type of the object (Gene, Compound, etc.)
+            value: Value to store.
+        """
+        self.set_many([(org_id, object_id, schema_type, value)])
+
+    def set_many(self, items) -> None:
+        """Store several (JSON-serializable) values in both tiers, writing them to disk in one transaction.
+
+        Args:
+            items (Iterable[tuple[str, str, str, Any]]): (org_id, object_id, schema_type, value) of each entry.
+        """
+        fetched = time.time()
+        rows = [(org_id, object_id, schema_type, value) for org_id, object_id, schema_type, value in items]
+        if not rows:
+            return
+        with self._lock:
+            for org_id, object_id, schema_type, value in rows:
+                self._remember((org_id, object_id, schema_type), value, fetched)
+
+            if self._db is not None:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO frames VALUES (?, ?, ?, ?, ?)",
+                    ((*key, json.dumps(value), fetched) for *key, value in rows))
+                self._db.commit()
+
+                # Periodically enforce on-disk size limit
+                before = self._writes
+                self._writes += len(rows)
+                if self._writes // self.PRUNE_INTERVAL > before // self.PRUNE_INTERVAL:
+                    self._prune()
+
+    def _remember(self, key, value, fetched) -> None:
+        # Add to in-process tier, evicting least recently used entries
+        self._memory[key] = (value, fetched)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+
+    def _prune(self) -> None:
+        # Drop expired entries, then the oldest entries above the size limit
+        if self.ttl is not None:
+            self._db.execute("DELETE FROM frames WHERE fetched < ?",
+                             (time.time() - self.ttl,))
+        (count,) = self._db.execute("SELECT COUNT(*) FROM frames").fetchone()
+        if count > self.disk_maxsize:
+            self._db.execute(
+                "DELETE FROM frames WHERE rowid IN (SELECT rowid FROM frames ORDER BY fetched LIMIT ?)",
+                (count - self.disk_maxsize,))
+        self._db.commit()
+
+    def invalidate(self, org_id: Optional[str] = None) -> None:
+        """Remove all entries for the given organism, or all entries if org_id is None.
+
+        Args:
+            org_id (str, optional): Organism id. Defaults to None.
+        """
+        with self._lock:
+            if org_id is None:
+                self._memory.clear()
+            else:
+                for key in [key for key in self._memory if key[0] == org_id]:
+                    del self._memory[key]
+
+            if self._db is not None:
+                if org_id is None:
+                    self._db.execute("DELETE FROM frames")
+                else:
+                    self._db.execute(
+                        "DELETE FROM frames WHERE org_id = ?", (org_id,))
+                self._db.commit()
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache() -> FrameCache:
+    """Get the shared default cache, creating it on first use. Falls back to
+    an in-process-only cache if the on-disk database cannot be opened.
+
+    Returns:
+        FrameCache: The default cache.
+    """
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            try:
+                _default_cache = FrameCache()
+            except (OSError, sqlite3.Error):
+                _default_cache = FrameCache(path=None)
+        return _default_cache
+
+
+def resolve_cache(cache) -> Optional[FrameCache]:
+    """Resolve a `cache` argument: None means the default cache, False disables caching,
+    and a FrameCache is used as-is.
+    """
+    if cache is None:
+        return get_default_cache()
+    if cache is False:
+        return None
+    return cache
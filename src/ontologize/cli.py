@@ -1,7 +1,10 @@
 import os
+import sys
+import csv
 import argparse
-import pandas as pd
-from ontologize.ontology import build_ontology
+
+# Heavy modules (pandas, networkx, requests, ...) are only imported once arguments are parsed and
+# validated, so that --help and argument errors return right away.
 
 HELP = {
     "file": "Path to a .csv, .tsv, or .xlsx file with BioCyc object IDs to ontologize."
@@ -14,32 +17,239 @@ HELP = {
     "objects": "Name of the column containing BioCyc IDs for the objects to ontologize. Requires a header row containing column names.",
     "property": "For a multi-column file, the name of the column containing BioCyc IDs for"
                 " the property to ontologize. Requires a header row containing column names."
-                " When using this option, the objects must also be specified using the -o option.",
-    "database": "BioCyc organism ID, used to specify the organism-specific database within to search. ECOLI by default.",
+                " When using this option, the objects must also be specified using the -o option."
+                " If not a column, names a property derived from the objects instead: \"pathways\" or \"genes\""
+                " give the pathways or genes of Reaction objects.",
+    "group": "Name of the column grouping the objects into lists (e.g., contrasts). One ontology is built and printed per list,"
+             " sharing the lookups of all lists. Requires a header row containing column names.",
+    "combined": "With --group (or several organisms), prints a table of the number of members of each class in each list, side by side,"
+                " instead of the ontologies.",
+    "database": "BioCyc organism ID, used to specify the organism-specific database within to search. ECOLI by default."
+                " Several IDs build one ontology of the objects per organism, crawling all organisms at once, and print"
+                " them (or, with --combined, their member counts) as for --group.",
+    "org_column": "Name of the column giving the BioCyc organism ID of each row. One ontology is built per organism,"
+                  " as when giving several --database IDs. Requires a header row containing column names.",
+    "nocache": "Disables the cache of BioCyc lookups, fetching every object over the network.",
+    "preload": "Downloads the whole class hierarchy of the schema type up front, so only the objects themselves"
+               " need to be looked up individually. Faster for long lists of objects.",
+    "refresh": "Clears cached BioCyc lookups for the given organism before building the ontology.",
+    "save": "Path to save the built ontology to, in a compact binary format, for re-rendering later with --load.",
+    "load": "Path of an ontology saved with --save (or a directory written by --tables in Parquet format), to render"
+            " instead of building one. When given, file and schema_type may be omitted.",
+    "tables": "Directory to write node, edge and membership tables of the ontology to, for analysis with other tools."
+              " With --group or several organisms, writes one subdirectory per list.",
+    "table_format": "Format of the tables written by --tables: parquet (the default, requires pyarrow), csv or tsv.",
+    "background": "Path to a .csv, .tsv, or .xlsx file with the BioCyc IDs of the background set (e.g., all genes of the organism),"
+                  " in its first column. If given, prints the classes that are significantly enriched in the ontologized objects"
+                  " relative to the background, instead of the ontology.",
+    "alpha": "False discovery rate (q-value) threshold for significant classes, when a background is given. 0.05 by default.",
     "depth": "Maximum depth of the ontology to print. No limit by default.",
     "leaves": "Whether to show leaf nodes, i.e., the ontologized objects themselves. Not shown by default.",
-    "coloroff": "Turns off colorful printing."
+    "dedupe": "Prints the subtree of a class with several parents in full only once, marking later occurrences"
+              " \"(see above)\". Keeps large ontologies short.",
+    "coloroff": "Turns off colorful printing.",
+    "html": "Path to write an HTML report of the ontology to, instead of printing it. Respects --depth, --leaves and --dedupe.",
+    "lazy": "Makes the HTML report embed the ontology as compact JSON, creating the elements of a class only when it is"
+            " opened. Recommended for large ontologies.",
+    "server": "Address of an ontologize server (see `ontologize serve`) to build and render the ontology on, as HOST:PORT or"
+              " unix:PATH, instead of building it in this process. Defaults to the ONTOLOGIZE_SERVER environment variable, if set.",
+    "stats": "Prints metrics of building and rendering the ontology (requests, bytes, latencies, cache hits, skipped"
+             " objects and the time of each phase) to stderr, as a summary (the default) or as JSON."
 }
 
 
+def _column_index(names, column):
+    # Position of a column given by name or position (None if not a column)
+    if column is None or isinstance(column, int):
+        return column
+    return names.index(column) if column in names else None
+
+
+def read_columns(file, columns, sheet_name=None, header=False):
+    """Read columns of a .csv, .tsv or .xlsx file as lists. Columns are given by name (which requires a header row;
+    .xlsx files always have one) or by position.
+
+    .csv and .tsv files are streamed row by row, keeping only the requested columns; pandas is only imported
+    to read .xlsx files.
+
+    Returns:
+        tuple[list[str], list[list | None]]: Names of the columns of the file (empty if it has no header row), and the
+            values of each requested column, or None for a column that is None or not a column of the file.
+    """
+    _, ext = os.path.splitext(file)
+    match (ext):
+        case '.xlsx':
+            import pandas as pd
+            data = pd.read_excel(file, sheet_name=sheet_name if sheet_name is not None else 0)
+            names = [str(name) for name in data.columns]
+            indices = [_column_index(names, column) for column in columns]
+            return names, [data.iloc[:, i].tolist() if i is not None and i < len(names) else None for i in indices]
+        case '.csv' | '.tsv':
+            # utf-8-sig drops the byte order mark of files exported from Excel
+            with open(file, newline='', encoding='utf-8-sig') as f:
+                reader = csv.reader(f, delimiter=',' if ext == '.csv' else '\t')
+                names = next(reader, []) if header else []
+                indices = [_column_index(names, column) for column in columns]
+                values = [[] if i is not None else None for i in indices]
+                for row in reader:
+                    if not row:
+                        continue
+                    for i, column_values in zip(indices, values):
+                        if i is not None:
+                            column_values.append(row[i] if i < len(row) else "")
+                return names, values
+        case _:
+            raise ValueError(
+                f"Invalid file format ({ext}). Please provide a .csv, .tsv, or .xlsx file.")
+
+
+def write_groups(ontologies, combined, html_file, max_depth=None, include_leaves=False, colors=True, dedupe=False,
+                 lazy=False):
+    """Print the ontologies of several lists (or their combined member counts), or write one HTML report per list,
+    named after `html_file` with the list name appended."""
+    from ontologize.ontology import combined_counts
+
+    if combined:
+        print(combined_counts(ontologies).to_string())
+        return
+
+    for name, ontology in ontologies.items():
+        if html_file is not None:
+            stem, ext = os.path.splitext(html_file)
+            ontology.write_html(f"{stem}_{name}{ext or '.html'}", max_depth=max_depth,
+                                include_leaves=include_leaves, dedupe=dedupe, lazy=lazy)
+            continue
+        print(f"== {name} ==")
+        ontology.write(sys.stdout, max_depth=max_depth, include_leaves=include_leaves, colors=colors, dedupe=dedupe)
+
+
+def print_stats(stats, format):
+    """Print build stats to stderr, as a summary or as JSON (or not at all, if format is None)."""
+    if format is None:
+        return
+    print(stats.to_json(indent=2) if format == "json" else stats.summary(), file=sys.stderr)
+
+
+SERVE_HELP = {
+    "host": "Host to listen on. 127.0.0.1 by default.",
+    "port": "Port to listen on. 8765 by default.",
+    "socket": "Path of a Unix socket to listen on, instead of a host and port.",
+    "nocache": "Keeps BioCyc lookups in memory only, instead of also in the on-disk cache.",
+    "max_ontologies": "Maximum number of built ontologies kept in memory. 64 by default.",
+}
+
+
+def serve_cli(argv):
+    """Run `ontologize serve`: log in once, then serve build and render requests until interrupted."""
+    parser = argparse.ArgumentParser(
+        prog='ontologize serve',
+        description='Serve ontologize over a local JSON API, keeping a logged-in session and caches warm between requests.')
+    parser.add_argument('--host', type=str, default=None, help=SERVE_HELP['host'])
+    parser.add_argument('--port', type=int, default=None, help=SERVE_HELP['port'])
+    parser.add_argument('--socket', type=str, help=SERVE_HELP['socket'])
+    parser.add_argument('--no-cache', action='store_true', help=SERVE_HELP['nocache'])
+    parser.add_argument('--max-ontologies', type=int, default=None, help=SERVE_HELP['max_ontologies'])
+    args = parser.parse_args(argv)
+    if args.socket is not None and (args.host is not None or args.port is not None):
+        parser.error("--socket cannot be combined with --host or --port.")
+
+    from ontologize.cache import FrameCache
+    from ontologize.defaults import SERVE_HOST, SERVE_PORT, SERVE_MAX_ONTOLOGIES
+    from ontologize.serve import OntologyService, make_server
+
+    service = OntologyService(cache=FrameCache(path=None) if args.no_cache else None,
+                              max_ontologies=args.max_ontologies or SERVE_MAX_ONTOLOGIES)
+
+    # Log in up front, prompting for credentials if needed, rather than on the first request
+    service.session.session()
+
+    host = args.host if args.host is not None else SERVE_HOST
+    port = args.port if args.port is not None else SERVE_PORT
+    server = make_server(service, host=host, port=port, socket_path=args.socket)
+    address = f"unix:{args.socket}" if args.socket is not None else f"{host}:{server.server_address[1]}"
+    print(f"Serving on {address}", file=sys.stderr, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if args.socket is not None and os.path.exists(args.socket):
+            os.unlink(args.socket)
+
+
+def client_cli(parser, args, objects, property):
+    """Build and render the ontology on a server, writing the output as the CLI would."""
+    from ontologize.client import ServiceClient, ServiceError
+
+    if args.html is not None:
+        format, options = "html", {"lazy": args.lazy}
+    else:
+        format, options = "text", {"colors": not args.coloroff}
+    options.update(max_depth=args.depth, include_leaves=args.leaves, dedupe=args.dedupe)
+    try:
+        response = ServiceClient(args.server).render(
+            objects, args.schema_type, property=property, org_id=args.database[0], preload=args.preload,
+            refresh=args.refresh, format=format, **options)
+    except (OSError, ServiceError) as e:
+        parser.exit(1, f"ontologize: error from server {args.server}: {e}\n")
+
+    if args.html is not None:
+        with open(args.html, "w", encoding="utf-8") as f:
+            f.write(response["output"])
+    else:
+        try:
+            sys.stdout.write(response["output"])
+            sys.stdout.flush()
+        except BrokenPipeError:
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+    if args.stats is not None:
+        from ontologize.stats import BuildStats
+        print_stats(BuildStats.from_dict(response["stats"]), args.stats)
+
+
 def cli():
+    # `ontologize serve` runs a server instead of building an ontology
+    if sys.argv[1:2] == ['serve']:
+        return serve_cli(sys.argv[2:])
+
     parser = argparse.ArgumentParser(
         description='Build and print annotated ontology from a file containing a list of BioCyc IDs.')
 
-    parser.add_argument('file', type=str, help=HELP["file"])
-    parser.add_argument('schema_type', type=str, help=HELP['schema_type'])
+    parser.add_argument('file', type=str, nargs='?', help=HELP["file"])
+    parser.add_argument('schema_type', type=str, nargs='?', help=HELP['schema_type'])
 
     # Ontology-building/file options
     parser.add_argument('-s', '--sheet', type=str, help=HELP['sheet'])
     parser.add_argument('-o', '--objects', type=str, help=HELP['objects'])
     parser.add_argument('-p', '--property', type=str, help=HELP['property'])
-    parser.add_argument('--database', type=str,
-                        default='ECOLI', help=HELP['database'])
+    parser.add_argument('-g', '--group', type=str, help=HELP['group'])
+    parser.add_argument('--combined', action='store_true', help=HELP['combined'])
+    parser.add_argument('--database', type=str, nargs='+',
+                        default=['ECOLI'], help=HELP['database'])
+    parser.add_argument('--org-column', type=str, help=HELP['org_column'])
+    parser.add_argument('--no-cache', action='store_true', help=HELP['nocache'])
+    parser.add_argument('--refresh', action='store_true', help=HELP['refresh'])
+    parser.add_argument('--preload', action='store_true', help=HELP['preload'])
+    parser.add_argument('--save', type=str, help=HELP['save'])
+    parser.add_argument('--load', type=str, help=HELP['load'])
+    parser.add_argument('--tables', type=str, help=HELP['tables'])
+    parser.add_argument('--table-format', type=str, default='parquet', choices=['parquet', 'csv', 'tsv'],
+                        help=HELP['table_format'])
+
+    # Enrichment options
+    parser.add_argument('--background', type=str, help=HELP['background'])
+    parser.add_argument('--alpha', type=float, default=0.05, help=HELP['alpha'])
 
     # Ontology-printing options
     parser.add_argument('--depth', type=int, help=HELP['depth'])
     parser.add_argument('--leaves', action='store_true', help=HELP["leaves"])
+    parser.add_argument('--dedupe', action='store_true', help=HELP['dedupe'])
     parser.add_argument('--coloroff', action='store_true', help=HELP['coloroff'])
+    parser.add_argument('--html', type=str, help=HELP['html'])
+    parser.add_argument('--lazy', action='store_true', help=HELP['lazy'])
+    parser.add_argument('--server', type=str, help=HELP['server'])
+    parser.add_argument('--stats', nargs='?', const='summary', choices=['summary', 'json'], help=HELP['stats'])
 
     args = parser.parse_args()
 
@@ -48,49 +258,202 @@ def cli():
     sheet_name = args.sheet
     objects_column = args.objects
     property_column = args.property
-    org_id = args.database
+    group_column = args.group
+    combined = args.combined
+    org_ids = args.database
+    org_id = org_ids[0]
+    org_column = args.org_column
+    multi_org = len(org_ids) > 1 or org_column is not None
+    use_cache = not args.no_cache
+    refresh = args.refresh
+    preload = args.preload
+    save_file = args.save
+    load_file = args.load
+    tables_dir = args.tables
+    table_format = args.table_format
+    background_file = args.background
+    alpha = args.alpha
     max_depth = args.depth
     include_leaves = args.leaves
+    dedupe = args.dedupe
     colors = not args.coloroff
+    html_file = args.html
+    lazy = args.lazy
+    stats_format = args.stats
 
     # Validate
     if property_column and not objects_column:
         raise ValueError(
             "If specifying a property column, you must also specify an objects column.")
+    if load_file is None and (file is None or schema_type is None):
+        parser.error("file and schema_type are required, unless loading a saved ontology with --load.")
+    if background_file is not None and schema_type is None:
+        parser.error("schema_type is required to compute enrichment.")
+    if group_column is not None and (load_file is not None or save_file is not None or background_file is not None):
+        parser.error("--group cannot be combined with --load, --save or --background.")
+    if multi_org and (group_column is not None or load_file is not None or save_file is not None
+                      or background_file is not None):
+        parser.error("Several organisms cannot be combined with --group, --load, --save or --background.")
+    if len(org_ids) > 1 and org_column is not None:
+        parser.error("--org-column cannot be combined with several --database IDs.")
+    if combined and group_column is None and not multi_org:
+        parser.error("--combined requires --group or several organisms.")
 
-    # Read the file
-    dataframe = None
-    _, ext = os.path.splitext(file)
-    match (ext):
-        case '.xlsx':
-            data = pd.read_excel(file, sheet_name=sheet_name)
-        case '.csv' | '.tsv':
-            data = pd.read_csv(file,
-                               sep=',' if ext == '.csv' else '\t',
-                               header=(0
-                                       if objects_column is not None or
-                                       property_column is not None
-                                       else None))
-        case _:
-            raise ValueError(
-                f"Invalid file format ({ext}). Please provide a .csv, .tsv, or .xlsx file.")
+    from ontologize.defaults import SERVER
+    if args.server is None:
+        args.server = SERVER
+    if args.server is not None:
+        if (group_column is not None or multi_org or load_file is not None or save_file is not None
+                or tables_dir is not None or background_file is not None):
+            parser.error("--server cannot be combined with --group, several organisms, --load, --save, --tables"
+                         " or --background.")
+        if not use_cache:
+            parser.error("--server cannot be combined with --no-cache; the server keeps its own cache.")
+
+        # Read the file here, and leave the rest to the server
+        _, (objects, property) = read_columns(
+            file, [objects_column if objects_column is not None else 0, property_column],
+            sheet_name=sheet_name, header=objects_column is not None or property_column is not None)
+        if objects is None:
+            parser.error(f"No column named {objects_column}.")
+        return client_cli(parser, args, objects, property if property is not None else property_column)
+
+    from ontologize.cache import get_default_cache
+    from ontologize.ontology import Ontology, build_ontology, build_ontologies, build_organism_ontologies
+
+    if refresh and use_cache and org_column is None:
+        for refreshed in org_ids:
+            get_default_cache().invalidate(refreshed)
+
+    if multi_org:
+        # Build one ontology per organism, then print them all
+        _, (objects, property, orgs) = read_columns(
+            file, [objects_column if objects_column is not None else 0, property_column, org_column],
+            sheet_name=sheet_name, header=objects_column is not None or property_column is not None
+            or org_column is not None)
+        if objects is None:
+            parser.error(f"No column named {objects_column}.")
+        if org_column is not None and orgs is None:
+            parser.error(f"No column named {org_column}.")
+
+        # A property that is not a column is derived from the objects (e.g. "pathways")
+        derived = property_column if property is None else None
+        if org_column is None:
+            objects_by_org, property_by_org = objects, property if property is not None else derived
+        else:
+            objects_by_org, property_by_org = {}, {}
+            for i, row_org in enumerate(orgs):
+                if row_org is None or row_org == "" or row_org != row_org:  # Skip rows without an organism
+                    continue
+                objects_by_org.setdefault(str(row_org), []).append(objects[i])
+                if property is not None:
+                    property_by_org.setdefault(str(row_org), []).append(property[i])
+            if refresh and use_cache:
+                for refreshed in objects_by_org:
+                    get_default_cache().invalidate(refreshed)
+            property_by_org = property_by_org or derived
+        ontologies = build_organism_ontologies(
+            objects_by_org, schema_type, org_ids=org_ids if org_column is None else None, property=property_by_org,
+            cache=None if use_cache else False, preload=preload)
+        if tables_dir is not None:
+            for name, ontology in ontologies.items():
+                ontology.write_tables(os.path.join(tables_dir, name), format=table_format)
+        write_groups(ontologies, combined, html_file, max_depth=max_depth, include_leaves=include_leaves,
+                     colors=colors, dedupe=dedupe, lazy=lazy)
+        for name, ontology in ontologies.items():
+            if stats_format is not None:
+                print(f"== {name} ==", file=sys.stderr)
+            print_stats(ontology.stats, stats_format)
+        return
+
+    if group_column is not None:
+        # Build one ontology per group, then print them all
+        names, (group_values, objects, first, second, property) = read_columns(
+            file, [group_column, objects_column, 0, 1, property_column], sheet_name=sheet_name, header=True)
+        if group_values is None:
+            parser.error(f"No column named {group_column}.")
+
+        # Objects default to the first column other than the grouping column
+        if objects_column is None:
+            objects = first if names[0] != group_column else second
+        if objects is None:
+            parser.error(f"No column named {objects_column}.")
+        groups, properties = {}, {}
+        for i, name in enumerate(group_values):
+            if name is None or name == "" or name != name:  # Skip rows without a group (NaN != NaN)
+                continue
+            groups.setdefault(str(name), []).append(objects[i])
+            if property is not None:
+                properties.setdefault(str(name), []).append(property[i])
+
+        # A property that is not a column is derived from the objects (e.g. "pathways")
+        if property_column is not None and property is None:
+            properties = property_column
+        ontologies = build_ontologies(
+            groups, schema_type, properties=properties or None, org_id=org_id,
+            cache=None if use_cache else False, preload=preload)
+        if tables_dir is not None:
+            for name, ontology in ontologies.items():
+                ontology.write_tables(os.path.join(tables_dir, name), format=table_format)
+        write_groups(ontologies, combined, html_file, max_depth=max_depth, include_leaves=include_leaves,
+                     colors=colors, dedupe=dedupe, lazy=lazy)
+
+        # The ontologies share the stats of one crawl
+        if ontologies:
+            print_stats(next(iter(ontologies.values())).stats, stats_format)
+        return
+
+    if load_file is not None:
+        # Load a saved ontology (or Parquet tables) instead of building one
+        ontology = Ontology.read_tables(load_file) if os.path.isdir(load_file) else Ontology.load(load_file)
+    else:
+        # Read the file (objects default to the first column)
+        _, (objects, property) = read_columns(
+            file, [objects_column if objects_column is not None else 0, property_column],
+            sheet_name=sheet_name, header=objects_column is not None or property_column is not None)
+        if objects is None:
+            parser.error(f"No column named {objects_column}.")
+
+        # Derived from the objects, if not a column (e.g. "pathways")
+        if property is None:
+            property = property_column
+
+        ontology = build_ontology(
+            objects, schema_type, property=property, org_id=org_id,
+            cache=None if use_cache else False, preload=preload)
+
+    if save_file is not None:
+        ontology.save(save_file)
+    if tables_dir is not None:
+        ontology.write_tables(tables_dir, format=table_format)
+
+    # Print significantly enriched classes, if a background is given
+    if background_file is not None:
+        _, (background_ids,) = read_columns(background_file, [0])
+        background = build_ontology(
+            background_ids, schema_type, org_id=org_id,
+            cache=None if use_cache else False, preload=preload, compact=True)
+        table = ontology.enrichment(background)
+        print(table[table["q_value"] <= alpha].to_string())
+        print_stats(ontology.stats, stats_format)
+        return
+
+    # Write HTML report, if requested
+    if html_file is not None:
+        ontology.write_html(html_file, max_depth=max_depth, include_leaves=include_leaves,
+                            dedupe=dedupe, lazy=lazy)
+        print_stats(ontology.stats, stats_format)
+        return
 
-    dataframe = (data
-                 if objects_column is not None or
-                 property_column is not None
-                 else None)
-    # Defaults to the first column
-    objects = (dataframe[objects_column].tolist()
-               if objects_column is not None
-               else data.iloc[:, 0].tolist())
-    property = (dataframe[property_column].tolist()
-                if property_column is not None
-                else None)
-
-    ontology = build_ontology(
-        objects, schema_type, property=property, dataframe=dataframe, org_id=org_id)
-    print(ontology.to_string(max_depth=max_depth,
-          include_leaves=include_leaves, colors=colors))
+    # Stream the ontology, so output starts right away
+    try:
+        ontology.write(sys.stdout, max_depth=max_depth,
+                       include_leaves=include_leaves, colors=colors, dedupe=dedupe)
+        sys.stdout.flush()
+    except BrokenPipeError:
+        # Output was cut short (e.g. by a pager or head); silence the error on exit
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+    print_stats(ontology.stats, stats_format)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,116 @@
+import http.client
+import json
+import socket
+
+from urllib.parse import urlsplit
+
+# Only the standard library is imported here, so that the CLI stays fast to start when talking to a server.
+
+
+class ServiceError(Exception):
+    pass
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout=None) -> None:
+        super().__init__("localhost", timeout=timeout)
+        self.path = path
+
+    def connect(self) -> None:
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if self.timeout is not None:
+            self.sock.settimeout(self.timeout)
+        self.sock.connect(self.path)
+
+
+def parse_address(address):
+    """Parse a server address: "unix:PATH" (or a path containing a slash) for a Unix socket,
+    else "[http://]HOST:PORT".
+
+    Returns:
+        tuple[str, str | tuple[str, int]]: ("unix", path) or ("tcp", (host, port)).
+    """
+    if address.startswith("unix:"):
+        return "unix", address[len("unix:"):]
+    if "/" in address and "://" not in address:
+        return "unix", address
+    parts = urlsplit(address if "://" in address else f"http://{address}")
+    if parts.hostname is None or parts.port is None:
+        raise ValueError(f"Invalid server address {address!r}. Expected HOST:PORT or unix:PATH.")
+    return "tcp", (parts.hostname, parts.port)
+
+
+class ServiceClient:
+    """Client of an ontologize server (see `ontologize.serve`), speaking its JSON API.
+
+    Args:
+        address (str): Address of the server, as "HOST:PORT", "http://HOST:PORT" or "unix:PATH".
+        timeout (float, optional): Timeout of each request, in seconds. Defaults to None (no timeout).
+    """
+
+    def __init__(self, address, timeout=None) -> None:
+        self.address = address
+        self.timeout = timeout
+        self._kind, self._target = parse_address(address)
+
+    def _connection(self):
+        if self._kind == "unix":
+            return _UnixHTTPConnection(self._target, timeout=self.timeout)
+        return http.client.HTTPConnection(*self._target, timeout=self.timeout)
+
+    def request(self, path, body=None) -> dict:
+        """Send a request (a POST with a JSON body, or a GET if body is None) and return the decoded response.
+
+        Raises:
+            ServiceError: If the server answers with an error.
+        """
+        connection = self._connection()
+        try:
+            if body is None:
+                connection.request("GET", path)
+            else:
+                connection.request("POST", path, body=json.dumps(body).encode("utf-8"),
+                                   headers={"Content-Type": "application/json"})
+            response = connection.getresponse()
+            data = response.read()
+        finally:
+            connection.close()
+
+        result = json.loads(data) if data else {}
+        if response.status != 200:
+            raise ServiceError(result.get("error", f"Server answered {response.status} {response.reason}"))
+        return result
+
+    def build(self, objects, schema_type, property=None, org_id=None, preload=False, refresh=False) -> dict:
+        """Build an ontology on the server (or reuse one it has built before).
+
+        Returns:
+            dict: Numbers of nodes and edges, whether the ontology was reused, and its build stats.
+        """
+        return self.request("/build", _build_request(objects, schema_type, property, org_id, preload, refresh))
+
+    def render(self, objects, schema_type, property=None, org_id=None, preload=False, refresh=False,
+               format="text", **options) -> dict:
+        """Build an ontology on the server (or reuse one it has built before) and render it.
+
+        Args:
+            format (str, optional): "text" or "html". Defaults to "text".
+            options: Rendering options, as for `Ontology.write` or `Ontology.write_html`.
+
+        Returns:
+            dict: Rendered ontology under "output", along with the fields returned by `build`.
+        """
+        request = _build_request(objects, schema_type, property, org_id, preload, refresh)
+        request.update(format=format, options=options)
+        return self.request("/render", request)
+
+    def status(self) -> dict:
+        return self.request("/status")
+
+
+def _build_request(objects, schema_type, property, org_id, preload, refresh):
+    request = {"objects": list(objects), "schema_type": schema_type, "property": property, "preload": preload,
+               "refresh": refresh}
+    if org_id is not None:
+        request["org_id"] = org_id
+    return request
@@ -0,0 +1,218 @@
+import json
+import mmap
+
+from typing import Optional
+
+import numpy as np
+import networkx as nx
+
+# Binary format: MAGIC, then the format version and header length as little-endian uint32,
+# then a JSON header describing each section, then the sections, each aligned to ALIGNMENT bytes.
+MAGIC = b"ONTOLOGY"
+FORMAT_VERSION = 1
+ALIGNMENT = 8
+ARRAYS = ["child_ptr", "child_idx", "parent_ptr", "parent_idx", "member_ptr", "member_idx"]
+STRINGS = ["node_ids", "common_names", "labels"]
+
+
+def _csr(lists, size):
+    """Pack a list of integer lists into CSR (pointer, index) arrays."""
+    ptr = np.zeros(size + 1, dtype=np.int64)
+    ptr[1:] = np.cumsum([len(items) for items in lists])
+    idx = np.fromiter((i for items in lists for i in items), dtype=np.int32, count=ptr[-1])
+    return ptr, idx
+
+
+def _strings(values, name):
+    """Values as strings (e.g. numeric IDs read from a spreadsheet), as the string tables hold nothing else.
+
+    Raises:
+        ValueError: If a value is missing (None or NaN, e.g. an empty cell) or contains a NUL character.
+    """
+    strings = []
+    for value in values:
+        if not isinstance(value, str):
+            if value is None or (isinstance(value, float) and value != value):
+                raise ValueError(f"Missing value among the {name} of the ontology (e.g. an empty cell of the input).")
+            value = str(value)
+        if "\0" in value:
+            raise ValueError(f"NUL character in {value!r} among the {name} of the ontology.")
+        strings.append(value)
+    return strings
+
+
+class CompactGraph:
+    """Read-only, array-backed storage for an ontology graph.
+
+    Nodes are interned as integers indexing into `node_ids` (and `common_names`); children,
+    parents and members are stored in CSR form, i.e. the children of node `i` are
+    `child_idx[child_ptr[i]:child_ptr[i + 1]]`. Members are sorted integer indices into
+    `labels`, so a label shared by many nodes is only stored once as a string. Node IDs, common names
+    and labels that are not strings (e.g. numeric IDs) are converted to strings.
+
+    Args:
+        node_ids (list[str]): BioCyc ID of each node.
+        common_names (list[str]): Common name of each node.
+        labels (list[str]): Member labels.
+        edges (list[tuple[int, int]]): (parent, child) pairs of node indices.
+        members (list[list[int]]): Indices into `labels` of the members of each node.
+    """
+
+    def __init__(self, node_ids, common_names, labels, edges, members) -> None:
+        self.node_ids = _strings(node_ids, "node IDs")
+        self.common_names = _strings(common_names, "common names")
+        self.labels = _strings(labels, "labels")
+        self.index = {node: i for i, node in enumerate(self.node_ids)}
+        self.metadata = {}
+
+        n = len(self.node_ids)
+        children = [[] for _ in range(n)]
+        parents = [[] for _ in range(n)]
+        for parent, child in edges:
+            children[parent].append(child)
+            parents[child].append(parent)
+        self.child_ptr, self.child_idx = _csr(children, n)
+        self.parent_ptr, self.parent_idx = _csr(parents, n)
+        self.member_ptr, self.member_idx = _csr([sorted(m) for m in members], n)
+
+    @classmethod
+    def from_arrays(cls, node_ids, common_names, labels, **arrays) -> "CompactGraph":
+        """Create a graph directly from its string tables and CSR arrays (see ARRAYS), without copying them."""
+        graph = cls.__new__(cls)
+        graph.node_ids = _strings(node_ids, "node IDs")
+        graph.common_names = _strings(common_names, "common names")
+        graph.labels = _strings(labels, "labels")
+        graph.index = {node: i for i, node in enumerate(node_ids)}
+        graph.metadata = {}
+        for name in ARRAYS:
+            setattr(graph, name, arrays[name])
+        return graph
+
+    def save(self, path, metadata: Optional[dict] = None) -> None:
+        """Save the graph in a compact, versioned binary format that can be memory-mapped on load.
+
+        Args:
+            path (str | os.PathLike): Path to write to.
+            metadata (dict, optional): JSON-serializable metadata stored in the header, restored as
+                `metadata` on load. Defaults to None.
+        """
+        # Strings are stored as NUL-separated UTF-8 tables
+        sections = [(name, np.frombuffer("\0".join(getattr(self, name)).encode("utf-8"), dtype=np.uint8))
+                    for name in STRINGS]
+        sections += [(name, np.ascontiguousarray(getattr(self, name))) for name in ARRAYS]
+
+        # Lay out sections after the header
+        header = {"sections": {}, "counts": {name: len(getattr(self, name)) for name in STRINGS},
+                  "metadata": metadata or {}}
+        offset = 0
+        for name, array in sections:
+            header["sections"][name] = {"offset": offset, "dtype": array.dtype.str, "length": len(array)}
+            offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+        header_bytes = json.dumps(header).encode("utf-8")
+        start = -(-(len(MAGIC) + 8 + len(header_bytes)) // ALIGNMENT) * ALIGNMENT
+
+        with open(path, "wb") as f:
+            f.write(MAGIC)
+            f.write(np.array([FORMAT_VERSION, len(header_bytes)], dtype="<u4").tobytes())
+            f.write(header_bytes)
+            for name, array in sections:
+                f.seek(start + header["sections"][name]["offset"])
+                f.write(array.tobytes())
+            f.truncate(start + offset)
+
+    @classmethod
+    def load(cls, path, mmap_mode: bool = True) -> "CompactGraph":
+        """Load a graph saved with `save`.
+
+        Args:
+            path (str | os.PathLike): Path to read from.
+            mmap_mode (bool, optional): Whether to memory-map the arrays rather than read them into memory.
+                Defaults to True.
+
+        Returns:
+            CompactGraph: The loaded graph.
+        """
+        with open(path, "rb") as f:
+            buffer = (mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                      if mmap_mode else f.read())
+
+        if buffer[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a saved ontology.")
+        version, header_length = np.frombuffer(buffer, dtype="<u4", count=2, offset=len(MAGIC))
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported ontology format version {version} (expected {FORMAT_VERSION}).")
+        header_end = len(MAGIC) + 8 + int(header_length)
+        header = json.loads(bytes(buffer[len(MAGIC) + 8:header_end]))
+        start = -(-header_end // ALIGNMENT) * ALIGNMENT
+
+        def section(name):
+            info = header["sections"][name]
+            return np.frombuffer(buffer, dtype=np.dtype(info["dtype"]), count=info["length"],
+                                 offset=start + info["offset"])
+
+        def strings(name):
+            if header["counts"][name] == 0:
+                return []
+            return section(name).tobytes().decode("utf-8").split("\0")
+
+        graph = cls.from_arrays(*(strings(name) for name in STRINGS),
+                                **{name: section(name) for name in ARRAYS})
+        graph.metadata = header.get("metadata", {})
+        return graph
+
+    def __len__(self) -> int:
+        return len(self.node_ids)
+
+    def __contains__(self, node) -> bool:
+        return node in self.index
+
+    def children(self, i: int) -> np.ndarray:
+        return self.child_idx[self.child_ptr[i]:self.child_ptr[i + 1]]
+
+    def parents(self, i: int) -> np.ndarray:
+        return self.parent_idx[self.parent_ptr[i]:self.parent_ptr[i + 1]]
+
+    def members(self, i: int) -> np.ndarray:
+        return self.member_idx[self.member_ptr[i]:self.member_ptr[i + 1]]
+
+    def member_labels(self, i: int) -> set:
+        labels = self.labels
+        return {labels[j] for j in self.members(i)}
+
+    def topological_order(self) -> list[int]:
+        """Node indices ordered so that every parent comes before its children."""
+        in_degree = np.diff(self.parent_ptr)
+        order = [int(i) for i in np.flatnonzero(in_degree == 0)]
+        in_degree = in_degree.copy()
+        for i in order:
+            for child in self.children(i):
+                in_degree[child] -= 1
+                if in_degree[child] == 0:
+                    order.append(int(child))
+        return order
+
+    @classmethod
+    def from_networkx(cls, graph: nx.DiGraph) -> "CompactGraph":
+        node_ids = list(graph.nodes)
+        index = {node: i for i, node in enumerate(node_ids)}
+        label_index = {}
+        members = [[label_index.setdefault(label, len(label_index))
+                    for label in graph.nodes[node].get("members", ())]
+                   for node in node_ids]
+        return cls(node_ids,
+                   [graph.nodes[node].get("common_name", node) for node in node_ids],
+                   list(label_index),
+                   [(index[parent], index[child]) for parent, child in graph.edges],
+                   members)
+
+    def to_networkx(self) -> nx.DiGraph:
+        graph = nx.DiGraph()
+        graph.add_nodes_from(
+            (node, {"members": self.member_labels(i), "common_name": self.common_names[i]})
+            for i, node in enumerate(self.node_ids))
+        node_ids = self.node_ids
+        graph.add_edges_from(
+            (node_ids[parent], node_ids[child])
+            for parent in range(len(node_ids))
+            for child in self.children(parent))
+        return graph
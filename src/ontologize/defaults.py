@@ -1 +1,36 @@
+import os
+
 ECOLI="ECOLI"
+
+# BioCyc web services (may point elsewhere, e.g. at a local stand-in server for benchmarks)
+BIOCYC_URL = os.environ.get("ONTOLOGIZE_BIOCYC_URL", "https://websvc.biocyc.org")
+
+# Frame cache
+CACHE_PATH = os.path.join(os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")),
+                          "ontologize", "frames.sqlite")
+CACHE_TTL = 7 * 24 * 60 * 60  # One week, in seconds
+CACHE_MAXSIZE = 8192  # Entries held in memory
+CACHE_DISK_MAXSIZE = 1_000_000  # Entries held on disk
+
+# Crawling
+MAX_WORKERS = 16  # Maximum number of BioCyc requests in flight at once
+INITIAL_WORKERS = 4  # Requests in flight at first, before adapting to the server
+MAX_RETRIES = 5  # Retries of connection errors, timeouts and 429/5xx responses
+BACKOFF_BASE = 0.5  # Base delay between retries, in seconds
+BACKOFF_MAX = 30.0  # Maximum delay between retries, in seconds
+BATCH_SIZE = 100  # Maximum number of objects looked up per request
+XML_CHUNK_SIZE = 1 << 16  # Bytes of a response parsed at a time
+
+# Root class of the class hierarchy of each schema type, used when preloading
+CLASS_ROOTS = {
+    "Gene": "Genes",
+    "Pathway": "Pathways",
+    "Compound": "Compounds",
+    "Reaction": "Reactions",
+}
+
+# Server mode (`ontologize serve`)
+SERVE_HOST = "127.0.0.1"
+SERVE_PORT = 8765
+SERVE_MAX_ONTOLOGIES = 64  # Built ontologies kept in memory
+SERVER = os.environ.get("ONTOLOGIZE_SERVER")  # Address of a server for the CLI to use, if any
@@ -0,0 +1,129 @@
+import numpy as np
+import pandas as pd
+
+from ontologize.compact import CompactGraph
+
+# Maximum number of (node, term) cells summed at once when computing tail probabilities
+CHUNK_CELLS = 1_000_000
+
+
+def _log_factorials(n: int) -> np.ndarray:
+    return np.concatenate([[0.0], np.cumsum(np.log(np.arange(1, n + 1)))])
+
+
+def hypergeometric_sf(k, N, K, n) -> np.ndarray:
+    """Vectorized upper tail P(X >= k) of the hypergeometric distribution, i.e. the probability of drawing
+    at least `k` successes in `n` draws without replacement from `N` items of which `K` are successes.
+
+    Args:
+        k (array-like): Observed successes.
+        N (int): Population size.
+        K (array-like): Successes in the population.
+        n (int): Number of draws.
+
+    Returns:
+        np.ndarray: Tail probabilities.
+    """
+    k = np.asarray(k, dtype=np.int64)
+    K = np.asarray(K, dtype=np.int64)
+    log_fact = _log_factorials(N)
+
+    def log_choose(a, b):
+        return log_fact[a] - log_fact[b] - log_fact[a - b]
+
+    # Sum pmf(i) for i = k..min(K, n), as a masked grid of terms, in chunks of nodes
+    upper = np.minimum(K, n)
+    lower = np.maximum(k, np.maximum(0, n - (N - K)))
+    width = int(max(1, (upper - lower).max(initial=0) + 1))
+    result = np.zeros(len(k))
+    chunk = max(1, CHUNK_CELLS // width)
+    for start in range(0, len(k), chunk):
+        stop = start + chunk
+        i = lower[start:stop, None] + np.arange(width)
+        valid = i <= upper[start:stop, None]
+        i = np.where(valid, i, lower[start:stop, None])
+        K_ = K[start:stop, None]
+        log_pmf = log_choose(K_, i) + log_choose(N - K_, n - i) - log_choose(N, n)
+        log_pmf = np.where(valid, log_pmf, -np.inf)
+
+        # Log-sum-exp, for precision at small p-values
+        peak = log_pmf.max(axis=1, keepdims=True)
+        peak = np.where(np.isfinite(peak), peak, 0)
+        result[start:stop] = np.exp(peak[:, 0]) * np.exp(log_pmf - peak).sum(axis=1)
+
+    # No successes observed (or impossible) means the whole distribution
+    result[k <= np.maximum(0, n - (N - K))] = 1.0
+    result[k > upper] = 0.0
+    return np.clip(result, 0.0, 1.0)
+
+
+def fdr_bh(p_values) -> np.ndarray:
+    """Benjamini-Hochberg false discovery rate adjustment.
+
+    Args:
+        p_values (array-like): p-values.
+
+    Returns:
+        np.ndarray: q-values, in the same order.
+    """
+    p_values = np.asarray(p_values, dtype=float)
+    m = len(p_values)
+    if m == 0:
+        return p_values
+    order = np.argsort(p_values)
+    ranked = p_values[order] * m / np.arange(1, m + 1)
+    q_values = np.minimum.accumulate(ranked[::-1])[::-1]
+    result = np.empty(m)
+    result[order] = np.minimum(q_values, 1.0)
+    return result
+
+
+def _all_labels(graph: CompactGraph) -> np.ndarray:
+    # Labels that are members of at least one node
+    used = np.zeros(len(graph.labels), dtype=bool)
+    used[graph.member_idx] = True
+    return used
+
+
+def enrichment(study: CompactGraph, background: CompactGraph, include_leaves: bool = False) -> pd.DataFrame:
+    """Hypergeometric enrichment of every node of the study ontology, relative to the background ontology.
+    See `Ontology.enrichment`.
+    """
+    # Study labels that belong to the background
+    background_labels = set(np.asarray(background.labels)[_all_labels(background)])
+    in_background = np.fromiter((label in background_labels for label in study.labels),
+                                dtype=bool, count=len(study.labels))
+    in_background &= _all_labels(study)
+    N = len(background_labels)
+    n = int(in_background.sum())
+
+    # Count study members of each node in one pass over the member arrays
+    cumulative = np.concatenate([[0], np.cumsum(in_background[study.member_idx])])
+    k = cumulative[study.member_ptr[1:]] - cumulative[study.member_ptr[:-1]]
+
+    # Count background members of each node (nodes absent from the background only hold study members)
+    background_sizes = np.diff(background.member_ptr)
+    background_index = np.fromiter((background.index.get(node, -1) for node in study.node_ids),
+                                   dtype=np.int64, count=len(study))
+    K = np.where(background_index >= 0, background_sizes[background_index], k)
+    K = np.maximum(K, k)
+
+    # Restrict to classes, unless leaves are requested
+    keep = np.ones(len(study), dtype=bool)
+    if not include_leaves:
+        keep = np.diff(study.child_ptr) > 0
+    keep &= k > 0
+
+    k, K = k[keep], K[keep]
+    expected = n * K / N if N > 0 else np.zeros(len(K))
+    p_values = hypergeometric_sf(k, N, K, n)
+    table = pd.DataFrame({
+        "common_name": np.asarray(study.common_names, dtype=object)[keep],
+        "count": k,
+        "background_count": K,
+        "expected": expected,
+        "fold_enrichment": np.divide(k, expected, out=np.full(len(k), np.nan), where=expected > 0),
+        "p_value": p_values,
+        "q_value": fdr_bh(p_values),
+    }, index=pd.Index(np.asarray(study.node_ids, dtype=object)[keep], name="node"))
+    return table.sort_values("p_value", kind="stable")
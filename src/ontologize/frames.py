@@ -0,0 +1,156 @@
+import json
+import os
+
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from ontologize.compact import CompactGraph
+
+# Tables of an ontology, and the file each is stored in by `write_tables`
+TABLES = ["nodes", "edges", "members"]
+TABLE_FORMATS = {"parquet": ".parquet", "csv": ".csv", "tsv": ".tsv"}
+
+# Key of the ontology's metadata (schema type, organism) in the Parquet metadata of the node table
+METADATA_KEY = b"ontologize"
+
+
+class OntologyFrames(NamedTuple):
+    """Tables of an ontology (see `Ontology.to_frames`).
+
+    Attributes:
+        nodes (pd.DataFrame): One row per node, parents before children, with columns node, common_name,
+            depth (length of the shortest path from a root), member_count, parent_count and child_count.
+        edges (pd.DataFrame): One row per edge, with (categorical) columns parent and child.
+        members (pd.DataFrame): One row per member of each node, with (categorical) columns node and member.
+    """
+    nodes: pd.DataFrame
+    edges: pd.DataFrame
+    members: pd.DataFrame
+
+
+def _depths(graph: CompactGraph, order) -> np.ndarray:
+    # Length of the shortest path from a root to each node
+    depth = np.zeros(len(graph), dtype=np.int64)
+    for i in order:
+        parents = graph.parents(i)
+        if len(parents):
+            depth[i] = depth[parents].min() + 1
+    return depth
+
+
+def to_frames(graph: CompactGraph) -> OntologyFrames:
+    """Node, edge and membership tables of a compact graph, built from its CSR arrays in bulk."""
+    n = len(graph)
+    order = graph.topological_order()
+    node_ids = pd.Index(graph.node_ids, dtype=object)
+    child_counts = np.diff(graph.child_ptr)
+    member_counts = np.diff(graph.member_ptr)
+
+    nodes = pd.DataFrame({
+        "node": node_ids,
+        "common_name": pd.Series(graph.common_names, dtype=object),
+        "depth": _depths(graph, order),
+        "member_count": member_counts,
+        "parent_count": np.diff(graph.parent_ptr),
+        "child_count": child_counts,
+    }).iloc[order].reset_index(drop=True)
+
+    # Edges and members are stored grouped by parent (or node), so their rows are the CSR arrays themselves
+    node_codes = np.arange(n, dtype=np.int32)
+    edges = pd.DataFrame({
+        "parent": pd.Categorical.from_codes(np.repeat(node_codes, child_counts), categories=node_ids),
+        "child": pd.Categorical.from_codes(np.asarray(graph.child_idx), categories=node_ids),
+    })
+    members = pd.DataFrame({
+        "node": pd.Categorical.from_codes(np.repeat(node_codes, member_counts), categories=node_ids),
+        "member": pd.Categorical.from_codes(np.asarray(graph.member_idx),
+                                            categories=pd.Index(graph.labels, dtype=object)),
+    })
+    return OntologyFrames(nodes, edges, members)
+
+
+def _csr_from_pairs(rows, columns, size, sort_columns=False):
+    """CSR (pointer, index) arrays of the columns of each row, from parallel arrays of (row, column) pairs."""
+    order = np.lexsort((columns, rows)) if sort_columns else np.argsort(rows, kind="stable")
+    ptr = np.zeros(size + 1, dtype=np.int64)
+    ptr[1:] = np.cumsum(np.bincount(rows, minlength=size))
+    return ptr, np.asarray(columns, dtype=np.int32)[order]
+
+
+def from_frames(nodes: pd.DataFrame, edges: pd.DataFrame, members: pd.DataFrame) -> CompactGraph:
+    """Compact graph from node, edge and membership tables (as made by `to_frames`), built in bulk.
+
+    Raises:
+        ValueError: If the edge or membership table refers to nodes missing from the node table.
+    """
+    node_ids = nodes["node"].astype(object).tolist()
+    index = pd.Index(node_ids, dtype=object)
+    if not index.is_unique:
+        raise ValueError("Node IDs in the node table are not unique.")
+    n = len(node_ids)
+
+    parent = index.get_indexer(np.asarray(edges["parent"], dtype=object))
+    child = index.get_indexer(np.asarray(edges["child"], dtype=object))
+    member_node = index.get_indexer(np.asarray(members["node"], dtype=object))
+    if (parent < 0).any() or (child < 0).any() or (member_node < 0).any():
+        raise ValueError("Edge or membership table refers to nodes missing from the node table.")
+    label_codes, labels = pd.factorize(np.asarray(members["member"], dtype=object))
+
+    child_ptr, child_idx = _csr_from_pairs(parent, child, n)
+    parent_ptr, parent_idx = _csr_from_pairs(child, parent, n)
+    member_ptr, member_idx = _csr_from_pairs(member_node, label_codes, n, sort_columns=True)
+    return CompactGraph.from_arrays(node_ids, nodes["common_name"].astype(object).tolist(), list(labels),
+                                    child_ptr=child_ptr, child_idx=child_idx,
+                                    parent_ptr=parent_ptr, parent_idx=parent_idx,
+                                    member_ptr=member_ptr, member_idx=member_idx)
+
+
+def _pyarrow():
+    # pyarrow is an optional dependency, only needed for Parquet
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError("Reading and writing Parquet requires pyarrow (pip install ontologize[parquet]).") from e
+    return pyarrow, pyarrow.parquet
+
+
+def write_tables(frames: OntologyFrames, path, format: str = "parquet", metadata=None) -> None:
+    """Write the tables of an ontology to a directory, one file per table (nodes, edges and members).
+
+    Args:
+        frames (OntologyFrames): Tables to write.
+        path (str | os.PathLike): Directory to write to, created if needed.
+        format (str, optional): "parquet" (requires pyarrow), "csv" or "tsv". Defaults to "parquet".
+        metadata (dict, optional): JSON-serializable metadata, stored with the node table (Parquet only).
+            Defaults to None.
+    """
+    if format not in TABLE_FORMATS:
+        raise ValueError(f"Unknown table format {format!r}. Expected one of {', '.join(TABLE_FORMATS)}.")
+    pa, pq = _pyarrow() if format == "parquet" else (None, None)
+    os.makedirs(path, exist_ok=True)
+
+    for name, frame in zip(TABLES, frames):
+        file = os.path.join(path, name + TABLE_FORMATS[format])
+        if format != "parquet":
+            frame.to_csv(file, sep="," if format == "csv" else "\t", index=False)
+            continue
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        if name == "nodes" and metadata:
+            table = table.replace_schema_metadata(
+                {**(table.schema.metadata or {}), METADATA_KEY: json.dumps(metadata).encode("utf-8")})
+        pq.write_table(table, file)
+
+
+def read_tables(path) -> tuple[OntologyFrames, dict]:
+    """Read the tables of an ontology written by `write_tables` in Parquet format.
+
+    Returns:
+        tuple[OntologyFrames, dict]: The tables, and the metadata stored with them.
+    """
+    _, pq = _pyarrow()
+    tables = {name: pq.read_table(os.path.join(path, name + TABLE_FORMATS["parquet"])) for name in TABLES}
+    metadata = json.loads((tables["nodes"].schema.metadata or {}).get(METADATA_KEY, b"{}"))
+    return OntologyFrames(*(tables[name].to_pandas() for name in TABLES)), metadata
@@ -0,0 +1,81 @@
+from collections import defaultdict
+
+
+class AncestorIndex:
+    """Ancestors, descendants and depth of every node of an ontology, precomputed so that queries about them
+    take time proportional to the ancestor sets involved, rather than a traversal of the graph.
+
+    Ancestor sets are built in one pass over the nodes in topological order (the ancestors of a node are its
+    parents and their ancestors). As ontologies are shallow, they take memory roughly linear in the number of
+    nodes times the depth of the ontology. Descendant sets, which are large near the roots, are only collected
+    for the nodes asked about, and memoized.
+
+    The depth of a node is the length of the shortest path to it from a root.
+
+    Args:
+        order (list[str]): IDs of all nodes, parents before children.
+        children (Callable[[str], list[str]]): Children of a node.
+    """
+
+    def __init__(self, order, children) -> None:
+        self._children = children
+        self._descendants = {}
+
+        parents = {node: [] for node in order}
+        for node in order:
+            for child in children(node):
+                parents[child].append(node)
+
+        # Ancestors and depth of each node, from those of its parents
+        self.ancestors = {}
+        self.depth = {}
+        for node in order:
+            node_parents = parents[node]
+            ancestors = set(node_parents)
+            for parent in node_parents:
+                ancestors |= self.ancestors[parent]
+            self.ancestors[node] = frozenset(ancestors)
+            self.depth[node] = min((self.depth[parent] + 1 for parent in node_parents), default=0)
+
+        # Nodes at each depth, in topological order
+        self.by_depth = defaultdict(list)
+        for node in order:
+            self.by_depth[self.depth[node]].append(node)
+
+    def __len__(self) -> int:
+        return len(self.ancestors)
+
+    def descendants(self, node) -> frozenset:
+        if node not in self._descendants:
+            if node not in self.ancestors:
+                raise KeyError(node)
+            found = set()
+            stack = [node]
+            while stack:
+                for child in self._children(stack.pop()):
+                    if child not in found:
+                        found.add(child)
+                        stack.append(child)
+            self._descendants[node] = frozenset(found)
+        return self._descendants[node]
+
+    def is_ancestor(self, ancestor, node) -> bool:
+        return ancestor in self.ancestors[node]
+
+    def common_ancestors(self, nodes) -> set:
+        """Nodes that are ancestors of (or equal to) every one of the given nodes."""
+        common = None
+        for node in nodes:
+            lineage = self.ancestors[node] | {node}
+            common = set(lineage) if common is None else common & lineage
+            if not common:
+                break
+        return common or set()
+
+    def lowest_common_ancestors(self, nodes) -> set:
+        """Common ancestors (see `common_ancestors`) that are not ancestors of another common ancestor."""
+        common = self.common_ancestors(nodes)
+        above = set()
+        for node in common:
+            above |= self.ancestors[node]
+        return common - above
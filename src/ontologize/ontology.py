@@ -1,18 +1,39 @@
+import asyncio
+import io
+import os
+import threading
+import time
 import warnings
 
-from typing import Optional
-from xml.dom.minidom import getDOMImplementation, Document
+from typing import TYPE_CHECKING, Optional
 
-import pandas as pd
 import requests
 import networkx as nx
-from collections import defaultdict
-from pprint import pformat
+from collections import ChainMap, defaultdict, deque
+from contextlib import nullcontext
 from tqdm import tqdm
-from concurrent.futures import ThreadPoolExecutor, as_completed
-
-from ontologize.biocyc import SchemaError, get_parents_and_common_name, get_session, get_parents
-from ontologize.defaults import ECOLI
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+
+from ontologize.biocyc import (SchemaError, get_parents_and_common_names, get_class_hierarchy, as_session_pool,
+                               pathways_of_reactions, genes_of_reactions, AdaptiveLimiter, SessionPool)
+from ontologize.cache import FrameCache, resolve_cache
+from ontologize.compact import CompactGraph
+from ontologize.index import AncestorIndex
+from ontologize.report import write_html
+from ontologize.stats import BuildStats, recording
+from ontologize.defaults import ECOLI, MAX_WORKERS, BATCH_SIZE, CLASS_ROOTS
+
+# pandas is slow to import, and only needed for dataframe input and tabular results
+if TYPE_CHECKING:
+    import pandas as pd
+    from ontologize.frames import OntologyFrames
+
+# Properties that can be derived from the objects themselves, by name. Each source maps
+# (objects, org_id, session, cache) to a dict from each object to the IDs of its property.
+PROPERTY_SOURCES = {
+    "pathways": lambda objects, org_id, session, cache: pathways_of_reactions(objects, org_id, session, cache=cache),
+    "genes": lambda objects, org_id, session, cache: genes_of_reactions(objects, org_id, session, cache=cache),
+}
 
 
 class ShellColors:
@@ -41,258 +62,1042 @@ class HTMLColors:
 
 
 class Ontology:
-    def __init__(self) -> None:
-        self.graph = nx.DiGraph()
+    def __init__(self, compact: Optional[CompactGraph] = None, schema_type: Optional[str] = None,
+                 org_id: Optional[str] = None) -> None:
+        # Exactly one of the two backends holds the ontology
+        self._graph = nx.DiGraph() if compact is None else None
+        self._compact = compact
+
+        # Where the ontology came from, needed to extend it later
+        self.schema_type = schema_type
+        self.org_id = org_id
+
+        # Metrics of building and rendering the ontology
+        self.stats = BuildStats()
+
+        # Ancestor index for queries, built on first use (see `_index`), and the version and shape of the
+        # ontology it was built from. Every change made through the ontology bumps the version.
+        self._ancestor_index = None
+        self._indexed = None
+        self._version = 0
 
     def __str__(self) -> str:
         return self.to_string()
 
-    def to_string(self, max_depth=None, include_leaves=True, colors=False) -> str:
-        """Returns a string representation of the ontology,
-        traversing the DAG in depth-first order.
+    @property
+    def graph(self) -> nx.DiGraph:
+        """The ontology as a networkx DiGraph. For a compact ontology, the graph is built on first access,
+        and from then on replaces the compact storage (so that it may be modified freely)."""
+        if self._graph is None:
+            self._graph = self._compact.to_networkx()
+            self._compact = None
+            self._version += 1
+        return self._graph
+
+    @graph.setter
+    def graph(self, graph: nx.DiGraph) -> None:
+        self._graph = graph
+        self._compact = None
+        self._version += 1
+
+    @property
+    def is_compact(self) -> bool:
+        return self._compact is not None
+
+    def compact(self) -> "Ontology":
+        """Switch to compact, array-backed storage, which uses much less memory than a networkx graph
+        for large ontologies. Rendering works directly on the compact storage; the networkx graph is only
+        rebuilt if `graph` is accessed again.
 
         Returns:
-            str: _description_
+            Ontology: this ontology.
+        """
+        if self._compact is None:
+            self._compact = CompactGraph.from_networkx(self._graph)
+            self._graph = None
+            self._version += 1
+        return self
+
+    def save(self, path) -> None:
+        """Save the ontology to a file in a compact, versioned binary format (integer node IDs, string tables
+        and member arrays), which `Ontology.load` can memory-map.
+
+        Args:
+            path (str | os.PathLike): Path to write to.
+        """
+        self._as_compact().save(path, metadata={"schema_type": self.schema_type, "org_id": self.org_id})
+
+    @classmethod
+    def load(cls, path, mmap_mode: bool = True) -> "Ontology":
+        """Load an ontology saved with `Ontology.save`. The result uses compact storage
+        (see `Ontology.compact`).
+
+        Args:
+            path (str | os.PathLike): Path to read from.
+            mmap_mode (bool, optional): Whether to memory-map the file rather than read it into memory. Defaults to True.
+
+        Returns:
+            Ontology: The loaded ontology.
+        """
+        compact = CompactGraph.load(path, mmap_mode=mmap_mode)
+        return cls(compact=compact, schema_type=compact.metadata.get("schema_type"),
+                   org_id=compact.metadata.get("org_id"))
+
+    def to_frames(self) -> "OntologyFrames":
+        """Node, edge and long-format membership tables of the ontology, built in bulk from its compact form
+        (see `ontologize.frames.OntologyFrames` for their columns). Useful for joining memberships with other
+        tables, e.g. of expression data.
+
+        Returns:
+            OntologyFrames: Named tuple of the nodes, edges and members tables.
+        """
+        from ontologize.frames import to_frames
+
+        return to_frames(self._as_compact())
+
+    @classmethod
+    def from_frames(cls, nodes: "pd.DataFrame", edges: "pd.DataFrame", members: "pd.DataFrame",
+                    schema_type: Optional[str] = None, org_id: Optional[str] = None) -> "Ontology":
+        """Rebuild an ontology from tables made by `to_frames`. The result uses compact storage
+        (see `Ontology.compact`).
+
+        Args:
+            nodes (pd.DataFrame): Node table, with node and common_name columns.
+            edges (pd.DataFrame): Edge table, with parent and child columns.
+            members (pd.DataFrame): Membership table, with node and member columns.
+            schema_type (str, optional): Schema type of the ontology. Defaults to None.
+            org_id (str, optional): BioCyc organism ID of the ontology. Defaults to None.
+
+        Returns:
+            Ontology: The ontology.
+        """
+        from ontologize.frames import from_frames
+
+        return cls(compact=from_frames(nodes, edges, members), schema_type=schema_type, org_id=org_id)
+
+    def write_tables(self, path, format: str = "parquet") -> None:
+        """Write the tables of `to_frames` to a directory, as nodes, edges and members files. Parquet files
+        (the default, which requires pyarrow) can be read back with `Ontology.read_tables`.
+
+        Args:
+            path (str | os.PathLike): Directory to write to, created if needed.
+            format (str, optional): "parquet", "csv" or "tsv". Defaults to "parquet".
+        """
+        from ontologize.frames import write_tables
+
+        write_tables(self.to_frames(), path, format=format,
+                     metadata={"schema_type": self.schema_type, "org_id": self.org_id})
+
+    @classmethod
+    def read_tables(cls, path) -> "Ontology":
+        """Read an ontology written by `write_tables` in Parquet format (requires pyarrow).
+
+        Args:
+            path (str | os.PathLike): Directory to read from.
+
+        Returns:
+            Ontology: The ontology, using compact storage.
+        """
+        from ontologize.frames import read_tables
+
+        frames, metadata = read_tables(path)
+        return cls.from_frames(*frames, schema_type=metadata.get("schema_type"), org_id=metadata.get("org_id"))
+
+    def enrichment(self, background: "Ontology", include_leaves: bool = False) -> "pd.DataFrame":
+        """Test every class of the ontology for over-representation of its members, relative to a background
+        ontology (e.g., built from all genes of the organism), using a one-sided hypergeometric test.
+        All classes are tested in one vectorized pass.
+
+        Args:
+            background (Ontology): Ontology of the background set. Members of this ontology that are not in
+                the background are ignored.
+            include_leaves (bool, optional): Whether to also test leaf nodes. Defaults to False.
+
+        Returns:
+            pd.DataFrame: One row per class with at least one member, indexed by node ID and sorted by p-value, with columns
+                common_name, count, background_count, expected, fold_enrichment, p_value and q_value
+                (Benjamini-Hochberg adjusted).
+        """
+        from ontologize.enrichment import enrichment
+
+        return enrichment(self._as_compact(), background._as_compact(), include_leaves=include_leaves)
+
+    def add_objects(self,
+                    objects: (list[str] | str),
+                    property: Optional[str | list[str | list[str]]] = None,
+                    dataframe: Optional["pd.DataFrame"] = None,
+                    session: Optional[requests.Session] = None,
+                    show_progress: bool = False,
+                    cache=None,
+                    max_workers: int = MAX_WORKERS,
+                    batch_size: int = BATCH_SIZE) -> "Ontology":
+        """Add objects to the ontology in place. Parents and common names of nodes already in the ontology
+        are reused, so only frames not yet in the graph are fetched from BioCyc. Members of existing nodes
+        are updated in place.
+
+        Args:
+            objects (list[str] | str): Objects to add, as for `build_ontology`.
+            property (str | list[list[str]], optional): Properties of the objects, as for `build_ontology`. Defaults to None.
+            dataframe (pd.DataFrame, optional): DataFrame holding objects and properties, as for `build_ontology`. Defaults to None.
+            session (requests.Session | SessionPool, optional): BioCyc session to use. Defaults to None.
+            show_progress (bool, optional): Whether to show progress bars. Defaults to False.
+            cache (FrameCache | bool, optional): Cache of BioCyc frame lookups, as for `build_ontology`. Defaults to None.
+            max_workers (int, optional): Maximum number of requests in flight at once. Defaults to MAX_WORKERS.
+            batch_size (int, optional): Maximum number of objects looked up per request. Defaults to BATCH_SIZE.
+
+        Returns:
+            Ontology: this ontology.
+        """
+        if self.schema_type is None:
+            raise ValueError("Schema type of the ontology is unknown; set Ontology.schema_type before adding objects.")
+
+        # Derive a named property (e.g. "pathways") from the objects themselves
+        if dataframe is None and isinstance(property, str):
+            session = as_session_pool(session)
+            property = _derive_property(objects, property, self.org_id or ECOLI, session, cache, self.stats)
+
+        objects, property = _prepare_inputs(objects, property, dataframe)
+        flat_property = [item for sublist in property for item in sublist]
+        was_compact = self.is_compact
+        graph = self.graph
+
+        # Every node of the graph holds all of its parents, so the graph can stand in for their frames
+        known = {node: (list(graph.predecessors(node)), data["common_name"])
+                 for node, data in graph.nodes(data=True)}
+
+        # Get parents of the new objects, fetching only what the graph lacks
+        common_names, parents_dict = get_ontology_data(
+            set(flat_property), self.schema_type, org_id=self.org_id or ECOLI, session=session,
+            show_progress=show_progress, cache=cache, max_workers=max_workers, batch_size=batch_size,
+            known=known, stats=self.stats)
+
+        with self.stats.timer("assemble"):
+            added = _assemble(objects, property, common_names, parents_dict).graph
+
+            # Merge into the graph, taking the union of members of shared nodes
+            for node, data in added.nodes(data=True):
+                if node in graph:
+                    graph.nodes[node]["members"] |= data["members"]
+                else:
+                    graph.add_node(node, **data)
+            graph.add_edges_from(added.edges)
+
+            if was_compact:
+                self.compact()
+        self._version += 1
+        self.stats.export()
+        return self
+
+    def remove_objects(self, objects: list[str]) -> "Ontology":
+        """Remove objects (member labels) from the ontology in place. Nodes left without members are removed.
+
+        Args:
+            objects (list[str]): Objects to remove.
+
+        Returns:
+            Ontology: this ontology.
+        """
+        labels = set(objects)
+        was_compact = self.is_compact
+        graph = self.graph
+
+        # Members propagate upwards, so a node left empty only has empty descendants
+        empty = []
+        for node, data in graph.nodes(data=True):
+            data["members"] -= labels
+            if not data["members"]:
+                empty.append(node)
+        graph.remove_nodes_from(empty)
+
+        if was_compact:
+            self.compact()
+        self._version += 1
+        return self
+
+    # Queries, answered from an index of the ancestors of every node
+
+    def _shape(self) -> tuple[int, int]:
+        # Numbers of nodes and edges, to catch direct changes to the graph. Counting the out-edges of each
+        # node directly is several times faster than number_of_edges().
+        if self._compact is not None:
+            return len(self._compact), len(self._compact.child_idx)
+        return len(self._graph), sum(map(len, self._graph._succ.values()))
+
+    def _index(self) -> AncestorIndex:
+        # Rebuild the index if the ontology has changed since it was built
+        indexed = (self._version, self._shape())
+        if self._ancestor_index is None or self._indexed != indexed:
+            self._ancestor_index = AncestorIndex(self._topological_order(), self._children)
+            self._indexed = indexed
+        return self._ancestor_index
+
+    def invalidate_index(self) -> None:
+        """Drop the index answering queries (`is_ancestor`, `common_ancestors`, ...), so that it is rebuilt on the
+        next query. Only needed after direct changes to `graph` that keep its numbers of nodes and edges
+        (e.g. moving an edge); other changes are detected."""
+        self._ancestor_index = None
+
+    def is_ancestor(self, ancestor: str, node: str) -> bool:
+        """Whether a node is an ancestor of another (e.g. whether a gene is under a class).
+
+        Args:
+            ancestor (str): ID of the possible ancestor.
+            node (str): ID of the node.
+
+        Returns:
+            bool: Whether `ancestor` is a (strict) ancestor of `node`.
+        """
+        return self._index().is_ancestor(ancestor, node)
+
+    def ancestors(self, node: str) -> set[str]:
+        """IDs of all ancestors of a node."""
+        return set(self._index().ancestors[node])
+
+    def descendants(self, node: str) -> set[str]:
+        """IDs of all descendants of a node."""
+        return set(self._index().descendants(node))
+
+    def common_ancestors(self, nodes: list[str]) -> set[str]:
+        """IDs of the nodes that are ancestors of every one of the given nodes (or are that node).
+
+        Args:
+            nodes (list[str]): IDs of the nodes (e.g. genes).
+
+        Returns:
+            set[str]: Common ancestors.
+        """
+        return self._index().common_ancestors(nodes)
+
+    def lowest_common_ancestors(self, nodes: list[str]) -> set[str]:
+        """IDs of the most specific classes shared by the given nodes: their common ancestors that are not
+        ancestors of another common ancestor. There may be several, as a node may have several parents.
+
+        Args:
+            nodes (list[str]): IDs of the nodes (e.g. genes).
+
+        Returns:
+            set[str]: Lowest common ancestors.
+        """
+        return self._index().lowest_common_ancestors(nodes)
+
+    def members_at_depth(self, depth: int) -> dict[str, set]:
+        """Members of each node at the given depth, i.e. whose shortest path from a root has that length.
+
+        Args:
+            depth (int): Depth, 0 for the roots.
+
+        Returns:
+            dict[str, set]: Members of each node at that depth, by node ID, in topological order.
+        """
+        return {node: self._members(node) for node in self._index().by_depth.get(depth, [])}
+
+    # Backend-independent accessors, used for rendering
+
+    def _as_compact(self) -> CompactGraph:
+        # Compact form of the ontology, without switching storage
+        if self._compact is not None:
+            return self._compact
+        return CompactGraph.from_networkx(self._graph)
+
+    def _topological_order(self) -> list:
+        if self._compact is not None:
+            node_ids = self._compact.node_ids
+            return [node_ids[i] for i in self._compact.topological_order()]
+        return list(nx.topological_sort(self._graph))
+
+    def _roots(self) -> list:
+        # Nodes without parents, in topological order
+        if self._compact is not None:
+            c = self._compact
+            return [c.node_ids[i] for i in c.topological_order() if c.parent_ptr[i] == c.parent_ptr[i + 1]]
+        return [node for node in nx.topological_sort(self._graph) if self._graph.in_degree(node) == 0]
+
+    def _children(self, node) -> list:
+        if self._compact is not None:
+            c = self._compact
+            return [c.node_ids[i] for i in c.children(c.index[node])]
+        return list(self._graph.successors(node))
+
+    def _common_name(self, node) -> str:
+        if self._compact is not None:
+            return self._compact.common_names[self._compact.index[node]]
+        return self._graph.nodes[node].get("common_name", node)
+
+    def _members(self, node) -> set:
+        if self._compact is not None:
+            return self._compact.member_labels(self._compact.index[node])
+        return self._graph.nodes[node].get("members", set())
+
+    def iter_lines(self, max_depth=None, include_leaves=True, colors=False, dedupe=False):
+        """Yields the lines of the string representation of the ontology (without newlines),
+        traversing the DAG in depth-first order with an explicit stack, so that output can be
+        streamed as it is produced. Traversal stops at `max_depth`.
+
+        Args:
+            max_depth (int, optional): Maximum depth of nodes to include. Defaults to None (no limit).
+            include_leaves (bool, optional): Whether to include leaf nodes. Defaults to True.
+            colors (bool, optional): Whether to color nodes by depth with ANSI escape codes. Defaults to False.
+            dedupe (bool, optional): Whether to print the subtree of a node with several parents in full only once.
+                Later occurrences of the node are marked "(see above)", and their children are omitted. Defaults to False.
+
+        Yields:
+            str: Lines of the representation.
         """
-        result = ""
         if max_depth is None:
             max_depth = float("inf")
 
-        # Define recursive function to traverse DAG in depth-first order,
-        # starting from a given node
-        def str_iter(node, depth=0, prefix=""):
-            # Keep track of nodes visited, so outer function does not
-            # revisit them as root of some tree
-            visited = {node}
-
-            # Check if this is a leaf
-            is_leaf = len(list(self.graph.successors(node))) == 0
-
-            # Get common name
-            name = self.graph.nodes[node].get("common_name", node)
-
-            # Build formatting for node
-            node_members = self.graph.nodes[node].get("members", [])
-            memberstring = (", ".join(node_members)
-                            if len(node_members) <= 5
-                            else f"{len(node_members)} members")
-
-            # Build color formatting
-            COLORSTART, COLOREND = "", ""
-            if colors:
-                COLORSTART = ShellColors.DEPTH_COLORS[depth % len(
-                    ShellColors.DEPTH_COLORS)] if not is_leaf else ShellColors.LEAF_COLOR
-                COLOREND = ShellColors.ENDC
-            if len(prefix) > 0:
-                prefix = prefix[:-1] + COLORSTART + prefix[-1] + COLOREND
-
-            # Add node to result if max_depth is not reached, and
-            # either the node is not a leaf or leaves are included
-            # (still need to visit children to avoid re-visiting them later).
-            if depth <= max_depth and ((is_leaf and include_leaves) or not is_leaf):
-                result = (f"{prefix}{COLORSTART}{name}"
-                          f" [{node}]{COLOREND} {{{memberstring}}}\n")
-            else:
-                result = ""
+        # Nodes whose children have already been printed (only tracked when deduplicating)
+        expanded = set()
 
-            # Recursively traverse children
-            children = list(self.graph.successors(node))
-            for i, child in enumerate(children):
-                pref = prefix.replace("└", " ").replace(
-                    "├", "│") + ("└" if i == len(children) - 1 else "├")
-                _visited, _result = str_iter(child,
-                                             depth=depth+1,
-                                             prefix=pref)
-                visited.update(_visited)
-                result += _result
+        # Traverse DAG starting from roots
+        for root in self._roots():
+            stack = [(root, 0, "")]
+            while stack:
+                node, depth, prefix = stack.pop()
+
+                # Check if this is a leaf
+                children = self._children(node)
+                is_leaf = len(children) == 0
+
+                # Get common name
+                name = self._common_name(node)
+
+                # Build formatting for node
+                node_members = self._members(node)
+                memberstring = (", ".join(node_members)
+                                if len(node_members) <= 5
+                                else f"{len(node_members)} members")
+
+                # Build color formatting
+                COLORSTART, COLOREND = "", ""
+                if colors:
+                    COLORSTART = ShellColors.DEPTH_COLORS[depth % len(
+                        ShellColors.DEPTH_COLORS)] if not is_leaf else ShellColors.LEAF_COLOR
+                    COLOREND = ShellColors.ENDC
+                if len(prefix) > 0:
+                    prefix = prefix[:-1] + COLORSTART + prefix[-1] + COLOREND
+
+                # Refer back to subtrees that were already printed
+                repeated = dedupe and not is_leaf and node in expanded
+                reference = " (see above)" if repeated else ""
+
+                # Yield node if either the node is not a leaf or leaves are included
+                if (is_leaf and include_leaves) or not is_leaf:
+                    yield (f"{prefix}{COLORSTART}{name}"
+                           f" [{node}]{COLOREND} {{{memberstring}}}{reference}")
+
+                # Stop at max_depth (or at repeated subtrees)
+                if depth >= max_depth or repeated:
+                    continue
+                if dedupe:
+                    expanded.add(node)
+
+                # Push children in reverse, so they are popped in order
+                child_prefix = prefix.replace("└", " ").replace("├", "│")
+                for i in reversed(range(len(children))):
+                    stack.append((children[i],
+                                  depth + 1,
+                                  child_prefix + ("└" if i == len(children) - 1 else "├")))
+
+    def write(self, stream, max_depth=None, include_leaves=True, colors=False, dedupe=False) -> None:
+        """Writes the string representation of the ontology to a stream (e.g. sys.stdout) line by line,
+        without building it in memory first. Takes the same options as `iter_lines`.
+        """
+        with self.stats.timer("render.text"):
+            for line in self.iter_lines(max_depth=max_depth, include_leaves=include_leaves, colors=colors,
+                                        dedupe=dedupe):
+                stream.write(line)
+                stream.write("\n")
 
-            return visited, result
+    def to_string(self, max_depth=None, include_leaves=True, colors=False, dedupe=False) -> str:
+        """Returns a string representation of the ontology,
+        traversing the DAG in depth-first order. Takes the same options as `iter_lines`.
 
-        # Traverse DAG starting from roots
-        remaining = list(nx.topological_sort(self.graph))
-        while len(remaining) > 0:
-            visited, substring = str_iter(remaining[0])
-            remaining = [node for node in remaining if node not in visited]
-            result += substring
+        Returns:
+            str: String representation, one node per line.
+        """
+        stream = io.StringIO()
+        self.write(stream, max_depth=max_depth, include_leaves=include_leaves, colors=colors, dedupe=dedupe)
+        return stream.getvalue()
+
+    def write_html(self, file, max_depth=None, include_leaves=True, dedupe=False, lazy=False, open_depth=1) -> None:
+        """Writes an HTML representation of the ontology, as nested collapsible elements,
+        straight to a file or stream without building it in memory first.
+
+        Args:
+            file (str | os.PathLike | file-like): Path or text stream to write to.
+            max_depth (int, optional): Maximum depth of nodes to include. Defaults to None (no limit).
+            include_leaves (bool, optional): Whether to include leaf nodes. Defaults to True.
+            dedupe (bool, optional): Whether to show the subtree of a node with several parents in full only once
+                (see `iter_lines`). Ignored if `lazy` is True. Defaults to False.
+            lazy (bool, optional): Whether to embed the ontology as compact JSON, and only create the elements of
+                a node's children when it is opened. Keeps reports of large ontologies small and fast to open.
+                Defaults to False.
+            open_depth (int, optional): Nodes above this depth start out expanded. Defaults to 1 (only roots).
+        """
+        if isinstance(file, (str, os.PathLike)):
+            with open(file, "w", encoding="utf-8") as stream:
+                self.write_html(stream, max_depth=max_depth, include_leaves=include_leaves, dedupe=dedupe,
+                                lazy=lazy, open_depth=open_depth)
+            return
 
-        return result
+        with self.stats.timer("render.html"):
+            write_html(self, file, HTMLColors.DEPTH_COLORS, max_depth=max_depth, include_leaves=include_leaves,
+                       dedupe=dedupe, lazy=lazy, open_depth=open_depth)
 
-    def to_html(self) -> str:
+    def to_html(self, max_depth=None, include_leaves=True, dedupe=False, lazy=False, open_depth=1) -> str:
         """Returns an HTML representation of the ontology,
-        traversing the DAG in depth-first order.
+        traversing the DAG in depth-first order. Takes the same options as `write_html`.
 
         Returns:
-            str: _description_
+            str: HTML document.
         """
-        # Create HTML document
-        impl = getDOMImplementation()
-        dt = impl.createDocumentType(
-            "html",
-            "-//W3C//DTD XHTML 1.0 Strict//EN",
-            "http://www.w3.org/TR/xhtml1/DTD/xhtml1-strict.dtd",
-        )
-        dom = impl.createDocument("http://www.w3.org/1999/xhtml", "html", dt)
-        html = dom.documentElement
-
-        # Add head
-        head = dom.createElement("head")
-        html.appendChild(head)
-
-        # Add style
-        style = dom.createElement("style")
-        style_str = """
-        details {
-            padding: 10px;
-            border: 5px solid #f7f7f7;
-            border-radius: 3px;
-        }
-        """
-        style_str += "\n".join([f'''
-            .depth_{depth} {{
-                background-color: {color};
-            }}'''
-            for depth, color in enumerate(HTMLColors.DEPTH_COLORS)])
-        style.appendChild(dom.createTextNode(style_str))
-        head.appendChild(style)
-
-        # Traverse the nodes in depth-first order,
-        # starting from the roots
-
-        def html_iter(node, parent, depth=0):
-            # Keep track of nodes visited, so outer function does not
-            # revisit them as root of some tree
-            visited = {node}
-
-            # Get common name
-            name = self.graph.nodes[node].get("common_name", node)
-
-            # Build formatting for node
-            node_members = self.graph.nodes[node].get("members", [])
-            memberstring = (", ".join(node_members)
-                            if len(node_members) <= 5
-                            else f"{len(node_members)} members")
-
-            # Create HTML element for node
-            node_elem = dom.createElement("details")
-            node_elem.setAttribute("open", "open")
-            summary = dom.createElement("summary")
-            summary.appendChild(dom.createTextNode(
-                f"{name} {{{memberstring}}}"))
-            summary.setAttribute(
-                "class", f"depth_{depth % len(HTMLColors.DEPTH_COLORS)}")
-            node_elem.appendChild(summary)
-
-            parent.appendChild(node_elem)
-
-            # Recursively traverse children
-            children = list(self.graph.successors(node))
-            for child in children:
-                visited.update(html_iter(child, node_elem, depth=depth+1))
-
-            return visited
-
-        # Create HTML element for ontology
-        ontology_elem = dom.createElement("div")
-        ontology_elem.setAttribute("id", "ontology")
-        html.appendChild(ontology_elem)
+        stream = io.StringIO()
+        self.write_html(stream, max_depth=max_depth, include_leaves=include_leaves, dedupe=dedupe,
+                        lazy=lazy, open_depth=open_depth)
+        return stream.getvalue()
 
-        # Traverse DAG starting from roots
-        remaining = list(nx.topological_sort(self.graph))
-        while len(remaining) > 0:
-            visited = html_iter(remaining[0], ontology_elem)
-            remaining = [node for node in remaining if node not in visited]
 
-        return dom.toxml()
+class LazyOntology(Ontology):
+    """Ontology whose ancestors are looked up on demand. Only the frames of the objects (or properties) themselves
+    are fetched up front; `parents`, `ancestors` and `common_name` fetch the frames they need as they are called,
+    while the remaining ancestors are prefetched in the background, a generation at a time. Fetched frames are
+    memoized, and the foreground and background never fetch the same frame twice.
 
+    Anything that needs the whole ontology (rendering, `graph`, saving, ...) waits for the remaining ancestors and
+    assembles it, after which the ontology behaves like any other. Create with `build_lazy_ontology`.
+    """
 
-def get_ontology_data(objects, schema_type, org_id=ECOLI, session=None, show_progress=True):
-    # Collect common name, parents of each object
-    orphans = set(objects)
-    common_names = {}
-    object_to_parents = defaultdict(list, {obj: [] for obj in objects})
-
-    # Create session
-    # TODO: safer to get username and password, and use those to create one session per thread
-    session = get_session() if session is None else session
-
-    while len(orphans) > 0:
-
-        # Show progress bar
-        if show_progress:
-            pbar = tqdm(total=len(orphans))
-        
-        # Get parents in parallel so as not to waste time
-        with ThreadPoolExecutor() as executor:
-
-            # Create futures for each orphaned object,
-            # keeping track of which object id they correspond to
-            futures = set()
-            future_to_obj = {}
-            for obj in orphans:
-                future = executor.submit(
-                    get_parents_and_common_name, obj, schema_type, org_id, session)
-                futures.add(future)
-                future_to_obj[future] = obj
-
-            # Collect results
-            for future in as_completed(futures):
-                try:
-                    # Get parents and object id
-                    parents, common_name = future.result()
-                except requests.exceptions.RequestException:
-                    # If request fails, skip this object
-                    warnings.warn(
-                        f"Request failed for object {future_to_obj[future]}. Skipping.")
-                    parents = []
-                    common_name = future_to_obj[future]
-                except SchemaError:
-                    # If object does not match schema, skip this object
-                    # TODO: store result as child of a Schema Error node
-                    warnings.warn(
-                        f"Object {future_to_obj[future]} does not match schema {schema_type}. Skipping.")
-                    parents = []
-                    common_name = future_to_obj[future]
-                except Exception as e:
-                    # If any other error occurs, raise it indicating which object caused it
-                    raise Exception(f"Error for object {future_to_obj[future]}") from e  # nopep8
-
-                obj = future_to_obj[future]
-
-                # Remove object from orphans
-                orphans.remove(obj)
-
-                # Store common name of object
-                common_names[obj] = common_name
-
-                # Store parents of object
-                for parent in parents:
-                    parent_id = parent[schema_type]["@frameid"]
-
-                    # Add parent to object_to_parents
-                    object_to_parents[obj].append(parent_id)
-
-                    # Add parent to orphans if it is not already in object_to_parents
-                    if parent_id not in object_to_parents:
-                        orphans.add(parent_id)
-
-                # Update progress bar
-                if show_progress:
-                    pbar.update(1)
-            
-            # Close progress bar
-            if show_progress:
-                pbar.close()
-
-    return common_names, object_to_parents
+    def __init__(self, objects, property, schema_type, org_id=ECOLI, session=None, cache=None,
+                 max_workers=MAX_WORKERS, batch_size=BATCH_SIZE, prefetch=True) -> None:
+        super().__init__(schema_type=schema_type, org_id=org_id)
+        self._assembled = None
+        self._materialized = False
+        self._objects = objects
+        self._property = property
+        self._session = as_session_pool(session)
+        self._max_workers = max_workers
+        self._batch_size = batch_size
+
+        # Lookups go through a frame cache, which coalesces those of the foreground and background
+        self._cache = resolve_cache(cache) or FrameCache(path=None)
+
+        # Memoized frames: object -> (parent IDs, common name)
+        self._frames = {}
+        self._frames_lock = threading.Lock()
+        self._materialize_lock = threading.Lock()
+
+        # Fetch the frames of the properties themselves first
+        self._flat_property = list(dict.fromkeys(item for sublist in property for item in sublist))
+        self._lookup(self._flat_property)
+
+        self._stopped = threading.Event()
+        self._prefetcher = None
+        if prefetch:
+            self._prefetcher = threading.Thread(target=self._prefetch, daemon=True)
+            self._prefetcher.start()
+
+    # The graph is assembled when first needed
+    @property
+    def _graph(self):
+        if not self._materialized:
+            self._materialize()
+        return self._assembled
+
+    @_graph.setter
+    def _graph(self, graph):
+        self._assembled = graph
+        self._materialized = True
+
+    def parents(self, node) -> list[str]:
+        """IDs of the parents of a node, fetching its frame if needed."""
+        self._lookup([node])
+        return self._frames[node][0]
+
+    def common_name(self, node) -> str:
+        """Common name of a node, fetching its frame if needed."""
+        self._lookup([node])
+        return self._frames[node][1]
+
+    def ancestors(self, node) -> set[str]:
+        """IDs of all ancestors of a node, fetching the frames of each generation of ancestors at once."""
+        found = set()
+        generation = self.parents(node)
+        while generation:
+            generation = [parent for parent in dict.fromkeys(generation) if parent not in found]
+            found.update(generation)
+            self._lookup(generation)
+            generation = [p for parent in generation for p in self._frames[parent][0]]
+        return found
+
+    def close(self) -> None:
+        """Stop prefetching."""
+        self._stopped.set()
+
+    def _lookup(self, objs) -> None:
+        # Fetch the frames of objects not yet memoized, in parallel batches
+        with self._frames_lock:
+            missing = [obj for obj in dict.fromkeys(objs) if obj not in self._frames]
+        if not missing:
+            return
+        batches = [missing[i:i + self._batch_size] for i in range(0, len(missing), self._batch_size)]
+        with ThreadPoolExecutor(max_workers=min(self._max_workers, len(batches))) as executor:
+            futures = [executor.submit(self._cached_frames, batch) for batch in batches]
+            for future in futures:
+                frames = future.result()
+                with self._frames_lock:
+                    self._frames.update(frames)
+
+    def _cached_frames(self, objs) -> dict:
+        # Frames of a batch from the cache, fetching the rest
+        raw, uncached = {}, []
+        for obj in objs:
+            cached = self._cache.get(self.org_id, obj, self.schema_type)
+            if cached is None:
+                uncached.append(obj)
+            else:
+                raw[obj] = cached
+        if uncached:
+            raw.update(_fetch_frames(uncached, self.schema_type, self.org_id, self._session, self._cache, self.stats))
+        return {obj: ([parent[self.schema_type]["@frameid"] for parent in parents], common_name)
+                for obj, (parents, common_name) in raw.items()}
+
+    def _crawl(self, stop=None) -> None:
+        # Fetch all ancestors of the properties, a generation at a time
+        seen = set(self._flat_property)
+        generation = self._flat_property
+        while generation and not (stop is not None and stop.is_set()):
+            self._lookup(generation)
+            generation = [parent for obj in generation for parent in self._frames[obj][0] if parent not in seen]
+            generation = list(dict.fromkeys(generation))
+            seen.update(generation)
+
+    def _prefetch(self) -> None:
+        try:
+            with self.stats.timer("prefetch"):
+                self._crawl(stop=self._stopped)
+        except Exception:
+            # Errors surface when the ontology is assembled, which repeats the failed lookups
+            pass
+
+    def _materialize(self) -> None:
+        with self._materialize_lock:
+            if self._materialized:
+                return
+            self._crawl()
+            self._stopped.set()
+            common_names = {obj: common_name for obj, (_, common_name) in self._frames.items()}
+            parents_dict = defaultdict(list, {obj: parent_ids for obj, (parent_ids, _) in self._frames.items()})
+            with self.stats.timer("assemble"):
+                self._graph = _assemble(self._objects, self._property, common_names, parents_dict).graph
+
+
+class _Frontier:
+    """Crawl state shared by the threaded and asyncio crawlers. Objects are queued
+    for lookup as soon as they are first discovered, so that no lookup waits on
+    unrelated lookups of the same generation."""
+
+    def __init__(self, objects, schema_type, org_id, cache, show_progress, known=None, stats=None):
+        self.schema_type = schema_type
+        self.org_id = org_id
+        self.cache = cache
+        self.stats = stats
+
+        # Parents (as IDs) and common names known up front, resolved without requests
+        self.known = known if known is not None else {}
+
+        self.common_names = {}
+        self.object_to_parents = defaultdict(list, {obj: [] for obj in objects})
+
+        # Objects waiting to be looked up, and every object ever queued (to dedupe)
+        self.pending = deque(self.object_to_parents)
+        self.seen = set(self.object_to_parents)
+
+        # Distance of each object from the objects being ontologized (for stats)
+        self.generation = {obj: 0 for obj in self.object_to_parents}
+
+        self.pbar = tqdm(total=len(self.pending)) if show_progress else None
+
+    def pop_uncached(self, limit):
+        """Pop up to `limit` objects that need a request, resolving preloaded and cached objects along the way."""
+        result = []
+        while self.pending and len(result) < limit:
+            obj = self.pending.popleft()
+            if obj in self.known:
+                self._record_lookup(obj, "known")
+                self.resolve_ids(obj, *self.known[obj])
+                continue
+
+            cached = (self.cache.get(self.org_id, obj, self.schema_type)
+                      if self.cache is not None else None)
+            if cached is not None:
+                self._record_lookup(obj, "cache")
+                self.resolve(obj, *cached)
+            else:
+                self._record_lookup(obj, "request")
+                result.append(obj)
+        return result
+
+    def _record_lookup(self, obj, source):
+        if self.stats is not None:
+            self.stats.record_lookup(self.generation[obj], source)
+
+    def resolve(self, obj, parents, common_name):
+        # Parents are given in raw dict form
+        self.resolve_ids(obj, [parent[self.schema_type]["@frameid"] for parent in parents], common_name)
+
+    def resolve_ids(self, obj, parent_ids, common_name):
+        # Store common name of object
+        self.common_names[obj] = common_name
+
+        # Store parents of object
+        for parent_id in parent_ids:
+            # Add parent to object_to_parents
+            self.object_to_parents[obj].append(parent_id)
+
+            # Queue parent right away if it has not been seen before
+            if parent_id not in self.seen:
+                self.seen.add(parent_id)
+                self.pending.append(parent_id)
+                self.generation[parent_id] = self.generation[obj] + 1
+                if self.pbar is not None:
+                    self.pbar.total += 1
+                    self.pbar.refresh()
+
+        if self.stats is not None:
+            self.stats.record_resolved(self.generation[obj])
+
+        # Update progress bar
+        if self.pbar is not None:
+            self.pbar.update(1)
+
+    def close(self):
+        # Close progress bar
+        if self.pbar is not None:
+            self.pbar.close()
+
+
+def _fetch_frames(objs, schema_type, org_id, session, cache, stats=None):
+    """Look up a batch of objects, turning failures that should not abort the crawl into warnings.
+
+    With a cache, objects already being looked up by a concurrent crawl sharing the cache are not requested
+    again; their results are taken from the cache once that crawl has stored them.
+    """
+    if cache is None:
+        return _request_frames(objs, schema_type, org_id, session, None, stats)
+
+    mine, theirs = cache.inflight.claim([(org_id, obj, schema_type) for obj in objs])
+    try:
+        # Another crawl may have cached some objects since the frontier checked
+        results, uncached = {}, []
+        for key in mine:
+            cached = cache.get(*key)
+            if cached is None:
+                uncached.append(key[1])
+            else:
+                results[key[1]] = cached
+        results.update(_request_frames(uncached, schema_type, org_id, session, cache, stats))
+    finally:
+        cache.inflight.release(mine)
+
+    # Wait for the rest, requesting any whose lookup failed elsewhere
+    missing = []
+    for key, event in theirs.items():
+        event.wait()
+        cached = cache.get(*key)
+        if cached is None:
+            missing.append(key[1])
+        else:
+            results[key[1]] = cached
+    if missing:
+        results.update(_request_frames(missing, schema_type, org_id, session, cache, stats))
+
+    # Raw parents of cached frames are resolved by the frontier, as for any cache hit
+    return results
+
+
+def _request_frames(objs, schema_type, org_id, session, cache, stats=None):
+    if not objs:
+        return {}
+    try:
+        with recording(stats):
+            results, errors = get_parents_and_common_names(
+                objs, schema_type, org_id, session, cache=False)
+    except Exception as e:
+        # If any other error occurs, raise it indicating which objects caused it
+        raise Exception(f"Error for objects {', '.join(objs)}") from e  # nopep8
+
+    for obj, error in errors.items():
+        if isinstance(error, SchemaError):
+            # If object does not match schema, skip this object
+            # TODO: store result as child of a Schema Error node
+            warnings.warn(f"Object {obj} does not match schema {schema_type}. Skipping.")
+        else:
+            # If request fails, skip this object
+            warnings.warn(f"Request failed for object {obj}. Skipping.")
+        if stats is not None:
+            stats.skip(obj, f"{type(error).__name__}: {error}" if str(error) else type(error).__name__)
+        results[obj] = ([], obj)
+
+    # Store in cache, in one write (cache was already checked by the frontier)
+    if cache is not None:
+        cache.set_many((org_id, obj, schema_type, list(results[obj])) for obj in objs if obj not in errors)
+
+    return results
+
+
+def _concurrency(session, max_workers):
+    # Follow the session pool's adaptive limit, if it has one, up to max_workers
+    limiter = getattr(session, "limiter", None)
+    return max_workers if limiter is None else min(max_workers, limiter.limit)
+
+
+def _preload_roots(preload, schema_type):
+    """Resolve the `preload` argument of `get_ontology_data` into a list of root classes."""
+    if preload is True:
+        return [CLASS_ROOTS.get(schema_type, f"{schema_type}s")]
+    if isinstance(preload, str):
+        return [preload]
+    return list(preload)
+
+
+def _preload_hierarchy(roots, schema_type, org_id, session, cache):
+    # Merge the hierarchies under each root into one index of parent IDs and common names
+    known = {}
+    for root in roots:
+        hierarchy = get_class_hierarchy(root, schema_type, org_id, session, cache=cache or False)
+        for class_id, (parents, common_name) in hierarchy.items():
+            known[class_id] = ([parent[schema_type]["@frameid"] for parent in parents], common_name)
+    return known
+
+
+def get_ontology_data(objects, schema_type, org_id=ECOLI, session=None, show_progress=True, cache=None,
+                      max_workers=MAX_WORKERS, batch_size=BATCH_SIZE, preload=False, known=None, stats=None):
+    cache = resolve_cache(cache)
+    session = as_session_pool(session)
+    crawl_start = time.perf_counter()
+
+    # Download whole class hierarchies up front, so only the objects themselves need lookups
+    if preload:
+        with recording(stats), (stats.timer("preload") if stats is not None else nullcontext()):
+            preloaded = _preload_hierarchy(_preload_roots(preload, schema_type), schema_type, org_id, session, cache)
+        known = preloaded if known is None else ChainMap(known, preloaded)
+
+    frontier = _Frontier(objects, schema_type, org_id, cache, show_progress, known=known, stats=stats)
+
+    # Get parents in parallel from one persistent pool, submitting each parent
+    # as soon as it is discovered rather than level by level
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        future_to_batch = {}
+        try:
+            while frontier.pending or future_to_batch:
+                # Top up in-flight requests, batching whatever has queued up since
+                while frontier.pending and len(future_to_batch) < _concurrency(session, max_workers):
+                    batch = frontier.pop_uncached(batch_size)
+                    if not batch:
+                        break
+
+                    future = executor.submit(_fetch_frames, batch, schema_type, org_id, session, cache, stats)
+                    future_to_batch[future] = batch
+
+                if not future_to_batch:
+                    continue
+
+                # Collect whichever requests finish first
+                done, _ = wait(future_to_batch, return_when=FIRST_COMPLETED)
+                for future in done:
+                    future_to_batch.pop(future)
+                    for obj, (parents, common_name) in future.result().items():
+                        frontier.resolve(obj, parents, common_name)
+        finally:
+            for future in future_to_batch:
+                future.cancel()
+            frontier.close()
+
+    if stats is not None:
+        stats.timings["crawl"] = time.perf_counter() - crawl_start
+    return frontier.common_names, frontier.object_to_parents
+
+
+async def get_ontology_data_async(objects, schema_type, org_id=ECOLI, session=None, show_progress=True, cache=None,
+                                  max_workers=MAX_WORKERS, batch_size=BATCH_SIZE, preload=False, known=None,
+                                  stats=None):
+    """Asyncio variant of `get_ontology_data`. Requests run in worker threads, so the
+    event loop is never blocked; at most `max_workers` requests (of up to `batch_size`
+    objects each) are in flight at once.
+    """
+    cache = resolve_cache(cache)
+    session = as_session_pool(session)
+    crawl_start = time.perf_counter()
+
+    # Download whole class hierarchies up front, so only the objects themselves need lookups
+    if preload:
+        def preload_hierarchy():
+            with recording(stats), (stats.timer("preload") if stats is not None else nullcontext()):
+                return _preload_hierarchy(_preload_roots(preload, schema_type), schema_type, org_id, session, cache)
+
+        preloaded = await asyncio.to_thread(preload_hierarchy)
+        known = preloaded if known is None else ChainMap(known, preloaded)
+
+    frontier = _Frontier(objects, schema_type, org_id, cache, show_progress, known=known, stats=stats)
+
+    task_to_batch = {}
+    try:
+        while frontier.pending or task_to_batch:
+            # Top up in-flight requests, batching whatever has queued up since
+            while frontier.pending and len(task_to_batch) < _concurrency(session, max_workers):
+                # Cache lookups hit the disk (and the cache lock shared with worker threads), so they run
+                # in a worker thread too. The loop waits for them, so the frontier is never used concurrently.
+                if cache is None:
+                    batch = frontier.pop_uncached(batch_size)
+                else:
+                    batch = await asyncio.to_thread(frontier.pop_uncached, batch_size)
+                if not batch:
+                    break
+
+                task = asyncio.create_task(asyncio.to_thread(
+                    _fetch_frames, batch, schema_type, org_id, session, cache, stats))
+                task_to_batch[task] = batch
+
+            if not task_to_batch:
+                continue
+
+            # Collect whichever requests finish first
+            done, _ = await asyncio.wait(task_to_batch, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task_to_batch.pop(task)
+                for obj, (parents, common_name) in task.result().items():
+                    frontier.resolve(obj, parents, common_name)
+    finally:
+        for task in task_to_batch:
+            task.cancel()
+        frontier.close()
+
+    if stats is not None:
+        stats.timings["crawl"] = time.perf_counter() - crawl_start
+    return frontier.common_names, frontier.object_to_parents
+
+
+def _derive_property(objects, property, org_id, session, cache, stats=None):
+    """Derive the property of each object from the named source in PROPERTY_SOURCES, in bulk."""
+    if property not in PROPERTY_SOURCES:
+        raise ValueError(f"Unknown property {property!r}. Without a dataframe, property must be one of "
+                         f"{', '.join(PROPERTY_SOURCES)}, or a list.")
+    with recording(stats), (stats.timer("derive") if stats is not None else nullcontext()):
+        mapping = PROPERTY_SOURCES[property](objects, org_id, session, cache)
+    return [sorted(mapping.get(obj, ())) for obj in objects]
+
+
+def _prepare_inputs(objects, property, dataframe):
+    """Resolve the `objects`, `property` and `dataframe` arguments of `build_ontology`
+    into parallel lists of objects and properties."""
+    # If dataframe is provided, get objects and property from dataframe
+    # (need to be column names)
+    if dataframe is not None:
+        # Get objects list from dataframe
+        if not isinstance(objects, str):
+            raise ValueError(
+                "If dataframe is provided, objects must be a column name.")
+        objects = dataframe[objects].tolist()
+
+        # Get property list from dataframe (or default to objects)
+        if isinstance(property, str):
+            property = dataframe[property].tolist()
+        elif property is not None:
+            raise ValueError(
+                "If dataframe is provided, property must be a column name.")
+
+    # If property not supplied, set default to objects
+    if property is None:
+        property = [[obj] for obj in objects]
+
+    # Allow a single property in place of a list
+    property = [prop if isinstance(prop, list) else [prop] for prop in property]
+
+    return objects, property
+
+
+def _assemble(objects, property, common_names, parents_dict, compact=False) -> Ontology:
+    """Assemble an ontology from crawled parent data: ancestors are collected once per node, then
+    member labels are propagated from children to parents in topological order, as sets of label
+    indices. Each edge costs time proportional to the members below it, not to the number of labels."""
+    # Assign each label an index, and mark the properties that carry it
+    label_index = {}
+    node_members = defaultdict(set)
+    for obj, prop in zip(objects, property):
+        if not isinstance(prop, list):
+            prop = [prop]
+        index = label_index.setdefault(obj, len(label_index))
+        for p in prop:
+            node_members[p].add(index)
+    labels = list(label_index)
+
+    # Collect every ancestor of the properties once, with the edges between them.
+    # Properties without parents are left out, as they belong to no class.
+    nodes = {}
+    edges = []
+    stack = [p for p in node_members if parents_dict[p]]
+    for p in reversed(stack):
+        nodes[p] = None
+    while stack:
+        child = stack.pop()
+        for node in parents_dict[child]:
+            edges.append((node, child))
+            if node not in nodes:
+                nodes[node] = None
+                stack.append(node)
+
+    # Order nodes so that every child comes before its parents
+    child_count = {node: 0 for node in nodes}
+    node_parents = defaultdict(list)
+    for node, child in edges:
+        child_count[node] += 1
+        node_parents[child].append(node)
+    order = [node for node, count in child_count.items() if count == 0]
+    for child in order:
+        for node in node_parents[child]:
+            child_count[node] -= 1
+            if child_count[node] == 0:
+                order.append(node)
+
+    # Propagate members up the DAG
+    for child in order:
+        members = node_members[child]
+        for node in node_parents[child]:
+            node_members[node] |= members
+
+    # Create ontology
+    if compact:
+        node_index = {node: i for i, node in enumerate(nodes)}
+        return Ontology(compact=CompactGraph(
+            list(nodes),
+            [common_names[node] for node in nodes],
+            labels,
+            [(node_index[node], node_index[child]) for node, child in edges],
+            [node_members[node] for node in nodes]))
+
+    ontology = Ontology()
+    ontology.graph.add_nodes_from(
+        (node, {"members": {labels[i] for i in node_members[node]},
+                "common_name": common_names[node]})
+        for node in nodes)
+    ontology.graph.add_edges_from(edges)
+
+    return ontology
 
 
 def build_ontology(objects: (list[str] | str),
                    schema_type: str,
                    property: Optional[str | list[str | list[str]]] = None,
-                   dataframe: Optional[pd.DataFrame] = None,
+                   dataframe: Optional["pd.DataFrame"] = None,
                    org_id: str = ECOLI,
                    session: Optional[requests.Session] = None,
-                   show_progress : bool = True) -> Ontology:
+                   show_progress : bool = True,
+                   cache=None,
+                   max_workers: int = MAX_WORKERS,
+                   batch_size: int = BATCH_SIZE,
+                   preload: bool | str | list[str] = False,
+                   compact: bool = False) -> Ontology:
     """Build an ontology from a list of objects, where each object is connected to its parents according to
     the MultiFun ontology.
 
@@ -303,77 +1108,309 @@ def build_ontology(objects: (list[str] | str),
         property (str | list[list[str]], optional): Often, one wishes to ontologize objects based on some property, rather than the objects themselves.
             For example, one may wish to ontologize reactions based on the pathways they are part of. In this case, the property could be supplied as a list of the
             same length as `objects`, where each element is a list of (BioCyc IDs of) pathways that the corresponding reaction is part of. Alternatively, if
-            the `dataframe` argument is supplied, this can be the column name containing the property. If `None` (the default), the objects themselves are ontologized.
+            the `dataframe` argument is supplied, this can be the column name containing the property. Without a dataframe, this can instead name a property
+            that is derived from the objects in bulk (see PROPERTY_SOURCES): "pathways" or "genes" for Reaction objects. If `None` (the default), the objects themselves are ontologized.
         dataframe (pd.DataFrame, optional): Pandas DataFrame with columns for objects IDs (and optionally, properties) to ontologize.
             If provided, `objects` and `property` must be strings corresponding to the name of a column (or possible `None` in the case of `property`).
             Defaults to `None`.
         org_id (str, optional): BioCyc organism ID. Defaults to ECOLI.
-        session (requests.Session, optional): BioCyc session to use. Defaults to None.
+        session (requests.Session | SessionPool, optional): BioCyc session to use. A plain session is wrapped in a SessionPool
+            sharing its login. If None, a new SessionPool is created, logging in on the first request. Defaults to None.
         show_progress (bool, optional): Whether to show progress bars. Defaults to True.
+        cache (FrameCache | bool, optional): Cache of BioCyc frame lookups. If None, the default (on-disk) cache is used;
+            if False, caching is disabled. Defaults to None.
+        max_workers (int, optional): Maximum number of requests in flight at once. Within this limit, the number
+            of requests in flight adapts to the server's latency and error rate. Defaults to MAX_WORKERS.
+        batch_size (int, optional): Maximum number of objects looked up per request. Defaults to BATCH_SIZE.
+        preload (bool | str | list[str], optional): Whether to download the whole class hierarchy of `schema_type` up front,
+            so that only the objects themselves need to be looked up individually. May also be the root class(es) of the hierarchy
+            to download (e.g. "Pathways"); if True, the root is taken from CLASS_ROOTS. Defaults to False.
+        compact (bool, optional): Whether to store the ontology in compact, array-backed form rather than as a
+            networkx graph (see `Ontology.compact`). Defaults to False.
 
     Returns:
         Ontology: ontology object (access graph with ontology.graph).
     """
-    # If property not supplied, set default to objects
-    if property is None:
-        property = [[obj] for obj in objects]
+    stats = BuildStats()
 
-    # If dataframe is provided, get objects and property from dataframe
-    # (need to be column names)
-    if dataframe is not None:
-        # Get objects list from dataframe
-        if not isinstance(objects, str):
-            raise ValueError(
-                "If dataframe is provided, objects must be a column name.")
-        objects = dataframe[objects].tolist()
+    # Derive a named property (e.g. "pathways") from the objects themselves
+    if dataframe is None and isinstance(property, str):
+        session = as_session_pool(session)
+        property = _derive_property(objects, property, org_id, session, cache, stats)
 
-        # Get property list from dataframe (or default to objects)
-        if property is None:
-            property = [[obj] for obj in objects]
-        elif isinstance(property, str):
-            property = dataframe[property].tolist()
-        else:
-            raise ValueError(
-                "If dataframe is provided, property must be a column name.")
+    objects, property = _prepare_inputs(objects, property, dataframe)
 
     # Flatten property list
     flat_property = [item for sublist in property for item in sublist]
 
     # Get parents of each object
     common_names, parents_dict = get_ontology_data(
-        set(flat_property), schema_type, org_id=org_id, session=session, show_progress=show_progress)
+        set(flat_property), schema_type, org_id=org_id, session=session, show_progress=show_progress,
+        cache=cache, max_workers=max_workers, batch_size=batch_size, preload=preload, stats=stats)
+
+    with stats.timer("assemble"):
+        ontology = _assemble(objects, property, common_names, parents_dict, compact=compact)
+    ontology.schema_type, ontology.org_id = schema_type, org_id
+    ontology.stats = stats
+    stats.export()
+    return ontology
 
-    # Create ontology
-    ontology = Ontology()
 
-    # Recursive function to add objects to ontology
-    def add_iter(obj, parents, label=None, child=None):
-        if child is None:
-            child = obj
-        if label is None:
-            label = obj
-
-        for node in parents:
-            # Add node if it doesn't exist, and add object to members
-            if node not in ontology.graph.nodes:
-                ontology.graph.add_node(
-                    node, members={label}, common_name=common_names[node])
+def build_lazy_ontology(objects: (list[str] | str),
+                        schema_type: str,
+                        property: Optional[str | list[str | list[str]]] = None,
+                        dataframe: Optional["pd.DataFrame"] = None,
+                        org_id: str = ECOLI,
+                        session: Optional[requests.Session] = None,
+                        cache=None,
+                        max_workers: int = MAX_WORKERS,
+                        batch_size: int = BATCH_SIZE,
+                        prefetch: bool = True) -> LazyOntology:
+    """Build an ontology lazily (see `LazyOntology`): only the frames of the objects (or properties) themselves are
+    fetched before returning, and their ancestors as they are needed, or in the background. Useful for exploring
+    a few branches of an ontology of many objects.
+
+    Args:
+        prefetch (bool, optional): Whether to fetch the remaining ancestors in the background. Defaults to True.
+
+    The remaining arguments are as for `build_ontology`.
+
+    Returns:
+        LazyOntology: ontology object.
+    """
+    # Derive a named property (e.g. "pathways") from the objects themselves
+    if dataframe is None and isinstance(property, str):
+        session = as_session_pool(session)
+        property = _derive_property(objects, property, org_id, session, cache)
+
+    objects, property = _prepare_inputs(objects, property, dataframe)
+    return LazyOntology(objects, property, schema_type, org_id=org_id, session=session, cache=cache,
+                        max_workers=max_workers, batch_size=batch_size, prefetch=prefetch)
+
+
+def build_ontologies(groups: dict[str, list[str]],
+                     schema_type: str,
+                     properties: Optional[dict[str, list[str | list[str]]] | str] = None,
+                     org_id: str = ECOLI,
+                     session: Optional[requests.Session] = None,
+                     show_progress : bool = True,
+                     cache=None,
+                     max_workers: int = MAX_WORKERS,
+                     batch_size: int = BATCH_SIZE,
+                     preload: bool | str | list[str] = False,
+                     compact: bool = False) -> dict[str, Ontology]:
+    """Build one ontology per list of objects, crawling the union of all lists only once. Useful when
+    comparing many lists (e.g. genes up- or down-regulated in several contrasts), whose ontologies
+    share most of their ancestors.
+
+    Args:
+        groups (dict[str, list[str]]): Lists of BioCyc object IDs to ontologize, by name.
+        schema_type (str): Type of the objects (or properties) in the BioCyc schema, as for `build_ontology`.
+        properties (dict[str, list[list[str]]] | str, optional): Properties of the objects of each list, by name,
+            as for the `property` argument of `build_ontology`, or the name of a property derived from the objects
+            (see PROPERTY_SOURCES). If None, the objects themselves are ontologized. Defaults to None.
+
+    The remaining arguments are as for `build_ontology`.
+
+    Returns:
+        dict[str, Ontology]: Ontology of each list, by name.
+    """
+    # Stats of the shared crawl, shared by all the ontologies
+    stats = BuildStats()
+
+    # Derive a named property (e.g. "pathways") for the objects of all lists at once
+    if isinstance(properties, str):
+        session = as_session_pool(session)
+        all_objects = list(dict.fromkeys(obj for objects in groups.values() for obj in objects))
+        derived = dict(zip(all_objects, _derive_property(all_objects, properties, org_id, session, cache, stats)))
+        properties = {name: [derived[obj] for obj in objects] for name, objects in groups.items()}
+
+    inputs = {name: _prepare_inputs(objects, None if properties is None else properties.get(name), None)
+              for name, objects in groups.items()}
+
+    # Get parents of the properties of all lists at once
+    flat_property = {item for _, property in inputs.values() for sublist in property for item in sublist}
+    common_names, parents_dict = get_ontology_data(
+        flat_property, schema_type, org_id=org_id, session=session, show_progress=show_progress,
+        cache=cache, max_workers=max_workers, batch_size=batch_size, preload=preload, stats=stats)
+
+    # Assemble each list from the shared parent index
+    ontologies = {}
+    for name, (objects, property) in inputs.items():
+        with stats.timer("assemble"):
+            ontology = _assemble(objects, property, common_names, parents_dict, compact=compact)
+        ontology.schema_type, ontology.org_id = schema_type, org_id
+        ontology.stats = stats
+        ontologies[name] = ontology
+    stats.export()
+    return ontologies
+
+
+def combined_counts(ontologies: dict[str, Ontology]) -> "pd.DataFrame":
+    """Combined view of several ontologies (e.g. from `build_ontologies`), with the number of members
+    of each node in each ontology side by side.
+
+    Args:
+        ontologies (dict[str, Ontology]): Ontologies, by name.
+
+    Returns:
+        pd.DataFrame: One row per node of any of the ontologies, indexed by node ID, parents before children,
+            with a common_name column and a column of member counts for each ontology (0 where the node is absent).
+    """
+    import pandas as pd
+
+    # Collect nodes of all ontologies, keeping parents before children
+    common_names = {}
+    for ontology in ontologies.values():
+        for node in ontology._topological_order():
+            if node not in common_names:
+                common_names[node] = ontology._common_name(node)
+
+    table = pd.DataFrame({"common_name": pd.Series(common_names, dtype=object)},
+                         index=pd.Index(list(common_names), name="node"))
+    for name, ontology in ontologies.items():
+        counts = {node: len(ontology._members(node)) for node in ontology._topological_order()}
+        table[name] = pd.Series(counts, dtype="int64").reindex(table.index, fill_value=0)
+    return table
+
+
+def build_organism_ontologies(objects: (list[str] | dict[str, list[str]] | str),
+                              schema_type: str,
+                              org_ids: Optional[list[str] | str] = None,
+                              property: Optional[str | list[str | list[str]] | dict[str, list[str | list[str]]]] = None,
+                              dataframe: Optional["pd.DataFrame"] = None,
+                              session: Optional[requests.Session] = None,
+                              show_progress : bool = True,
+                              cache=None,
+                              max_workers: int = MAX_WORKERS,
+                              batch_size: int = BATCH_SIZE,
+                              preload: bool | str | list[str] = False,
+                              compact: bool = False) -> dict[str, Ontology]:
+    """Build an ontology of the same kind of objects in each of several organisms, crawling all organisms
+    concurrently. Each organism gets its own parent index, but all share one session pool, so requests to
+    BioCyc stay within one concurrency limit (`max_workers`, adapting to the server) overall.
+
+    Args:
+        objects (list[str] | dict[str, list[str]] | str): BioCyc object IDs to ontologize in every organism of `org_ids`,
+            or lists of object IDs by organism ID, or, if dataframe is provided, the column name containing the object IDs.
+        schema_type (str): Type of the objects (or properties) in the BioCyc schema, as for `build_ontology`.
+        org_ids (list[str] | str, optional): BioCyc organism IDs to build in, when `objects` is a single list; or, if
+            dataframe is provided, the column name containing the organism of each row. Defaults to None.
+        property (str | list[list[str]] | dict[str, list[list[str]]], optional): Properties of the objects, as for
+            `build_ontology`, or properties of the objects of each organism by organism ID. Defaults to None.
+        dataframe (pd.DataFrame, optional): DataFrame with columns for organisms, objects and (optionally) properties.
+            Defaults to None.
+        session (requests.Session | SessionPool, optional): BioCyc session to use, as for `build_ontology`. A new
+            pool is limited to `max_workers` requests in flight across all organisms. Defaults to None.
+        max_workers (int, optional): Maximum number of requests in flight at once, across all organisms. Defaults to MAX_WORKERS.
+
+    The remaining arguments are as for `build_ontology`.
+
+    Returns:
+        dict[str, Ontology]: Ontology of each organism, by organism ID.
+    """
+    # Arguments of build_ontology for each organism
+    if dataframe is not None:
+        if not isinstance(org_ids, str):
+            raise ValueError("If dataframe is provided, org_ids must be a column name.")
+        inputs = {org_id: {"objects": objects, "property": property, "dataframe": rows}
+                  for org_id, rows in dataframe.groupby(org_ids, sort=False)}
+    elif isinstance(objects, dict):
+        inputs = {org_id: {"objects": objs, "property": property.get(org_id) if isinstance(property, dict) else property}
+                  for org_id, objs in objects.items()}
+    else:
+        if org_ids is None or isinstance(org_ids, str):
+            raise ValueError("org_ids must be a list of organism IDs, unless objects are given by organism.")
+        inputs = {org_id: {"objects": objects, "property": property} for org_id in org_ids}
+
+    # One pool, and so one concurrency limit, shared by all organisms
+    if session is None or isinstance(session, requests.Session):
+        session = SessionPool(session=session, limiter=AdaptiveLimiter(maximum=max_workers))
+
+    ontologies = {}
+    with ThreadPoolExecutor(max_workers=max(1, len(inputs))) as executor:
+        future_to_org = {
+            executor.submit(build_ontology, schema_type=schema_type, org_id=org_id, session=session,
+                            show_progress=False, cache=cache, max_workers=max_workers, batch_size=batch_size,
+                            preload=preload, compact=compact, **arguments): org_id
+            for org_id, arguments in inputs.items()}
+        for future in tqdm(as_completed(future_to_org), total=len(future_to_org), desc="Organisms",
+                           disable=not show_progress):
+            ontologies[future_to_org[future]] = future.result()
+
+    # Keep the order organisms were given in
+    return {org_id: ontologies[org_id] for org_id in inputs}
+
+
+def merge_ontologies(ontologies: dict[str, Ontology]) -> Ontology:
+    """Merge several ontologies (e.g. of several organisms, from `build_organism_ontologies`) into one, aligning
+    nodes by frame ID. Members are labelled with the name of their ontology, as "name:member".
+
+    Args:
+        ontologies (dict[str, Ontology]): Ontologies, by name.
+
+    Returns:
+        Ontology: Merged ontology.
+    """
+    merged = Ontology()
+    graph = merged.graph
+    edges = []
+    for name, ontology in ontologies.items():
+        for node in ontology._topological_order():
+            members = {f"{name}:{member}" for member in ontology._members(node)}
+            if node in graph:
+                graph.nodes[node]["members"] |= members
             else:
-                ontology.graph.nodes[node]["members"].add(label)
+                graph.add_node(node, members=members, common_name=ontology._common_name(node))
+            edges.extend((node, child) for child in ontology._children(node))
+    graph.add_edges_from(edges)
+
+    # Keep the schema type, if all ontologies share it
+    schema_types = {ontology.schema_type for ontology in ontologies.values()}
+    if len(schema_types) == 1:
+        merged.schema_type = schema_types.pop()
+    return merged
+
+
+async def build_ontology_async(objects: (list[str] | str),
+                               schema_type: str,
+                               property: Optional[str | list[str | list[str]]] = None,
+                               dataframe: Optional["pd.DataFrame"] = None,
+                               org_id: str = ECOLI,
+                               session: Optional[requests.Session] = None,
+                               show_progress : bool = False,
+                               cache=None,
+                               max_workers: int = MAX_WORKERS,
+                               batch_size: int = BATCH_SIZE,
+                               preload: bool | str | list[str] = False,
+                               compact: bool = False) -> Ontology:
+    """Asyncio variant of `build_ontology`, for use from within a running event loop.
+    Takes the same arguments, except that progress bars are off by default.
 
-            # Connect child to parent
-            if child not in ontology.graph.nodes:
-                ontology.graph.add_node(
-                    child, members={label}, common_name=common_names[child])
-            ontology.graph.add_edge(node, child)
+    Returns:
+        Ontology: ontology object (access graph with ontology.graph).
+    """
+    stats = BuildStats()
 
-            # Recurse to parents of node
-            add_iter(obj, parents_dict[node], label=label, child=node)
+    # Derive a named property (e.g. "pathways") from the objects themselves
+    if dataframe is None and isinstance(property, str):
+        session = as_session_pool(session)
+        property = await asyncio.to_thread(_derive_property, objects, property, org_id, session, cache, stats)
 
-    for obj, prop in zip(objects, property):
-        if not isinstance(prop, list):
-            prop = [prop]
-        for p in prop:
-            add_iter(p, parents_dict[p], label=obj)
+    objects, property = _prepare_inputs(objects, property, dataframe)
+
+    # Flatten property list
+    flat_property = [item for sublist in property for item in sublist]
 
+    # Get parents of each object
+    common_names, parents_dict = await get_ontology_data_async(
+        set(flat_property), schema_type, org_id=org_id, session=session, show_progress=show_progress,
+        cache=cache, max_workers=max_workers, batch_size=batch_size, preload=preload, stats=stats)
+
+    # Assemble off the event loop, since this is CPU-bound
+    with stats.timer("assemble"):
+        ontology = await asyncio.to_thread(_assemble, objects, property, common_names, parents_dict, compact)
+    ontology.schema_type, ontology.org_id = schema_type, org_id
+    ontology.stats = stats
+    stats.export()
     return ontology
@@ -0,0 +1,159 @@
+import json
+
+from html import escape
+
+HEAD = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<style>
+details {{
+    padding: 10px;
+    border: 5px solid #f7f7f7;
+    border-radius: 3px;
+}}
+{depth_styles}
+</style>
+</head>
+<body>
+<div id="ontology">
+"""
+
+TAIL = """</div>
+</body>
+</html>
+"""
+
+# Renders nodes from the embedded JSON, creating the children of a node when it is first opened.
+# Each node is [id, label, children]; DATA also holds roots, maxDepth, openDepth and the number of depth colors.
+LAZY_SCRIPT = """<script id="ontology-data" type="application/json">{data}</script>
+<script>
+(function () {{
+    const data = JSON.parse(document.getElementById("ontology-data").textContent);
+
+    function render(i, depth, parent) {{
+        const node = data.nodes[i];
+        const details = document.createElement("details");
+        const summary = document.createElement("summary");
+        summary.textContent = node[1];
+        summary.className = "depth_" + (depth % data.colors);
+        details.appendChild(summary);
+        parent.appendChild(details);
+
+        const children = data.maxDepth === null || depth < data.maxDepth ? node[2] : [];
+        let populated = false;
+        function populate() {{
+            if (populated) return;
+            populated = true;
+            for (const child of children) render(child, depth + 1, details);
+        }}
+        details.addEventListener("toggle", function () {{ if (details.open) populate(); }});
+        if (depth < data.openDepth) details.open = true;
+    }}
+
+    const container = document.getElementById("ontology");
+    for (const root of data.roots) render(root, 0, container);
+}})();
+</script>
+"""
+
+
+def _label(ontology, node) -> str:
+    # Common name and members, as shown in the summary of each node
+    name = ontology._common_name(node)
+    node_members = ontology._members(node)
+    memberstring = (", ".join(node_members)
+                    if len(node_members) <= 5
+                    else f"{len(node_members)} members")
+    return f"{name} {{{memberstring}}}"
+
+
+def write_html(ontology, stream, colors, max_depth=None, include_leaves=True, dedupe=False, lazy=False,
+               open_depth=1) -> None:
+    """Write an HTML report of the ontology to a stream. See `Ontology.write_html`."""
+    if max_depth is None:
+        max_depth = float("inf")
+
+    depth_styles = "\n".join(f".depth_{depth} {{ background-color: {color}; }}"
+                             for depth, color in enumerate(colors))
+    stream.write(HEAD.format(depth_styles=depth_styles))
+
+    if lazy:
+        _write_lazy(ontology, stream, len(colors), max_depth, include_leaves, open_depth)
+    else:
+        _write_eager(ontology, stream, len(colors), max_depth, include_leaves, dedupe, open_depth)
+
+    stream.write(TAIL)
+
+
+def _write_eager(ontology, stream, n_colors, max_depth, include_leaves, dedupe, open_depth) -> None:
+    # Nodes whose children have already been written (only tracked when deduplicating)
+    expanded = set()
+
+    # Traverse DAG depth-first from the roots, writing markup as we go.
+    # None on the stack marks where a node's element is closed.
+    for root in ontology._roots():
+        stack = [(root, 0)]
+        while stack:
+            item = stack.pop()
+            if item is None:
+                stream.write("</details>\n")
+                continue
+
+            node, depth = item
+            children = ontology._children(node)
+            if len(children) == 0 and not include_leaves:
+                continue
+
+            repeated = dedupe and len(children) > 0 and node in expanded
+            label = _label(ontology, node) + (" (see above)" if repeated else "")
+            stream.write(f'<details{" open" if depth < open_depth else ""}>'
+                         f'<summary class="depth_{depth % n_colors}">{escape(label)}</summary>\n')
+            stack.append(None)
+
+            # Stop at max_depth (or at repeated subtrees)
+            if depth >= max_depth or repeated:
+                continue
+            if dedupe:
+                expanded.add(node)
+
+            # Push children in reverse, so they are popped in order
+            for child in reversed(children):
+                stack.append((child, depth + 1))
+
+
+def _write_lazy(ontology, stream, n_colors, max_depth, include_leaves, open_depth) -> None:
+    # Collect nodes within max_depth of a root, breadth-first
+    roots = ontology._roots()
+    index = {}
+    frontier = roots
+    depth = 0
+    while frontier and depth <= max_depth:
+        next_frontier = []
+        for node in frontier:
+            if node in index:
+                continue
+            children = ontology._children(node)
+            if len(children) == 0 and not include_leaves:
+                continue
+            index[node] = len(index)
+            if depth < max_depth:
+                next_frontier.extend(children)
+        frontier = next_frontier
+        depth += 1
+
+    # Encode each node once, as [id, label, children]
+    nodes = [[node, _label(ontology, node),
+              [index[child] for child in ontology._children(node) if child in index]]
+             for node in index]
+
+    data = json.dumps({
+        "nodes": nodes,
+        "roots": [index[root] for root in roots if root in index],
+        "maxDepth": None if max_depth == float("inf") else max_depth,
+        "openDepth": open_depth,
+        "colors": n_colors,
+    }, separators=(",", ":"))
+
+    # Keep the JSON from closing the script element
+    stream.write(LAZY_SCRIPT.format(data=data.replace("</", "<\\/")))
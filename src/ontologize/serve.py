@@ -0,0 +1,243 @@
+"""Long-running ontologize server, for running many small builds without logging in or warming caches each time.
+
+Keeps one session pool (logged in once), one frame cache, and the most recently built ontologies in memory,
+and serves a JSON API over local HTTP or a Unix socket:
+
+    POST /build   {"objects": [...], "schema_type": "Gene", "property": ..., "org_id": "ECOLI", "preload": false,
+                   "refresh": false}
+                  -> {"nodes": ..., "edges": ..., "cached": ..., "stats": {...}}
+    POST /render  same as /build, plus {"format": "text" | "html", "options": {"max_depth": 2, ...}}
+                  -> same as /build, plus {"output": "..."}
+    GET  /status  -> {"ontologies": ..., "building": ..., "cache_hits": ..., "cache_misses": ...}
+
+Requests are handled concurrently. Identical builds in flight are coalesced into one, and concurrent builds
+share the frame cache, so a frame being fetched for one build is not fetched again for another.
+"""
+
+import copy
+import json
+import os
+import socketserver
+import threading
+
+from collections import OrderedDict
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from ontologize.biocyc import as_session_pool
+from ontologize.cache import resolve_cache
+from ontologize.defaults import ECOLI, MAX_WORKERS, BATCH_SIZE, SERVE_MAX_ONTOLOGIES
+from ontologize.ontology import Ontology, build_ontology
+from ontologize.stats import BuildStats
+
+# Paths of the JSON API
+PATHS = {"/build", "/render", "/status"}
+
+# Rendering options accepted by /render, by format
+RENDER_OPTIONS = {
+    "text": {"max_depth", "include_leaves", "colors", "dedupe"},
+    "html": {"max_depth", "include_leaves", "dedupe", "lazy", "open_depth"},
+}
+
+
+class OntologyService:
+    """Builds and renders ontologies on behalf of many clients, keeping a session pool, a frame cache
+    and recently built ontologies warm between requests. Safe to use from several threads.
+
+    Args:
+        session (requests.Session | SessionPool, optional): BioCyc session to use, as for `build_ontology`.
+            Defaults to None (a new SessionPool).
+        cache (FrameCache | bool, optional): Cache of BioCyc frame lookups, as for `build_ontology`. Defaults to None.
+        max_ontologies (int, optional): Maximum number of built ontologies kept in memory. Defaults to SERVE_MAX_ONTOLOGIES.
+        max_workers (int, optional): Maximum number of requests in flight at once, per build. Defaults to MAX_WORKERS.
+        batch_size (int, optional): Maximum number of objects looked up per request. Defaults to BATCH_SIZE.
+    """
+
+    def __init__(self, session=None, cache=None, max_ontologies=SERVE_MAX_ONTOLOGIES, max_workers=MAX_WORKERS,
+                 batch_size=BATCH_SIZE) -> None:
+        self.session = as_session_pool(session)
+        self.cache = resolve_cache(cache)
+        self.max_ontologies = max_ontologies
+        self.max_workers = max_workers
+        self.batch_size = batch_size
+
+        # Built ontologies (LRU) and builds in flight, keyed by their request
+        self._ontologies = OrderedDict()
+        self._building = {}
+        self._lock = threading.Lock()
+
+    def build(self, objects, schema_type, property=None, org_id=ECOLI, preload=False,
+              refresh=False) -> tuple[Ontology, bool]:
+        """Build an ontology, as `build_ontology` would, reusing a previously built one if possible.
+        Callers asking for the same ontology while it is being built wait for that build.
+
+        Args:
+            refresh (bool, optional): Whether to drop cached frames and ontologies of the organism first.
+                Defaults to False.
+
+        Returns:
+            tuple[Ontology, bool]: The ontology, and whether it was built before (or by another caller).
+        """
+        if refresh:
+            self.invalidate(org_id)
+
+        key = json.dumps([list(objects), schema_type, property, org_id, preload])
+        with self._lock:
+            if key in self._ontologies:
+                self._ontologies.move_to_end(key)
+                return self._ontologies[key], True
+            future = self._building.get(key)
+            owner = future is None
+            if owner:
+                future = self._building[key] = Future()
+        if not owner:
+            return future.result(), True
+
+        try:
+            ontology = build_ontology(
+                list(objects), schema_type, property=property, org_id=org_id, session=self.session,
+                show_progress=False, cache=self.cache if self.cache is not None else False,
+                max_workers=self.max_workers, batch_size=self.batch_size, preload=preload)
+        except BaseException as e:
+            with self._lock:
+                del self._building[key]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            del self._building[key]
+            self._ontologies[key] = ontology
+            while len(self._ontologies) > self.max_ontologies:
+                self._ontologies.popitem(last=False)
+        future.set_result(ontology)
+        return ontology, False
+
+    def invalidate(self, org_id=None) -> None:
+        """Drop cached frames and ontologies of the given organism, or of all organisms if org_id is None."""
+        if self.cache is not None:
+            self.cache.invalidate(org_id)
+        with self._lock:
+            for key in [key for key in self._ontologies if org_id is None or json.loads(key)[3] == org_id]:
+                del self._ontologies[key]
+
+    def status(self) -> dict:
+        with self._lock:
+            status = {"ontologies": len(self._ontologies), "building": len(self._building)}
+        if self.cache is not None:
+            status.update(cache_hits=self.cache.hits, cache_misses=self.cache.misses)
+        return status
+
+    def handle(self, path, request=None) -> dict:
+        """Handle a request of the JSON API (see the module docstring).
+
+        Raises:
+            ValueError: If the path is unknown or the request is invalid.
+        """
+        if path not in PATHS:
+            raise ValueError(f"Unknown path {path}.")
+        if path == "/status":
+            return self.status()
+        if not isinstance(request, dict):
+            raise ValueError("Expected a JSON object.")
+        for field in ("objects", "schema_type"):
+            if field not in request:
+                raise ValueError(f"Missing field {field!r}.")
+
+        ontology, cached = self.build(request["objects"], request["schema_type"], property=request.get("property"),
+                                      org_id=request.get("org_id", ECOLI), preload=request.get("preload", False),
+                                      refresh=request.get("refresh", False))
+        response = {"nodes": ontology.graph.number_of_nodes(), "edges": ontology.graph.number_of_edges(),
+                    "cached": cached}
+
+        # Stats of this request only: a reused ontology did no build work for it, and renders are timed
+        # on a shallow copy, so that they do not add up in the shared ontology's stats
+        stats = BuildStats() if cached else BuildStats.from_dict(ontology.stats.to_dict())
+
+        if path == "/render":
+            format = request.get("format", "text")
+            if format not in RENDER_OPTIONS:
+                raise ValueError(f"Unknown format {format!r}. Expected one of {', '.join(RENDER_OPTIONS)}.")
+            options = request.get("options", {})
+            unknown = set(options) - RENDER_OPTIONS[format]
+            if unknown:
+                raise ValueError(f"Unknown options for {format}: {', '.join(sorted(unknown))}.")
+            rendered = copy.copy(ontology)
+            rendered.stats = stats
+            response["output"] = (rendered.to_string(**options) if format == "text"
+                                  else rendered.to_html(**options))
+
+        response["stats"] = stats.to_dict()
+        return response
+
+
+def _handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            self._dispatch(None)
+
+        def do_POST(self):
+            try:
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"null")
+            except ValueError:
+                return self._send(400, {"error": "Invalid JSON."})
+            self._dispatch(request)
+
+        def _dispatch(self, request):
+            if self.path not in PATHS:
+                return self._send(404, {"error": f"Unknown path {self.path}."})
+            try:
+                response = service.handle(self.path, request)
+            except (ValueError, TypeError) as e:
+                return self._send(400, {"error": str(e)})
+            except Exception as e:
+                return self._send(500, {"error": f"{type(e).__name__}: {e}"})
+            self._send(200, response)
+
+        def _send(self, status, body):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def address_string(self):
+            # Unix socket clients have no address
+            return str(self.client_address[0]) if self.client_address else "unix"
+
+    return Handler
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def server_bind(self):
+        # Replace a stale socket left behind by a previous server
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+        super().server_bind()
+
+
+def make_server(service, host=None, port=None, socket_path=None):
+    """Create a threaded server of the JSON API, listening on a Unix socket if `socket_path` is given,
+    else on host and port. Call `serve_forever()` on the result to run it.
+
+    Args:
+        service (OntologyService): Service handling the requests.
+        host (str, optional): Host to listen on. Defaults to None.
+        port (int, optional): Port to listen on (0 for any free port). Defaults to None.
+        socket_path (str, optional): Path of the Unix socket to listen on. Defaults to None.
+
+    Returns:
+        socketserver.BaseServer: The server.
+    """
+    if socket_path is not None:
+        return _UnixHTTPServer(socket_path, _handler(service))
+    server = ThreadingHTTPServer((host, port), _handler(service))
+    server.daemon_threads = True
+    return server
@@ -0,0 +1,210 @@
+import bisect
+import json
+import threading
+import time
+
+from collections import Counter
+from contextlib import contextmanager
+
+# Upper bounds of the request latency histogram buckets, in seconds (the last bucket is unbounded)
+LATENCY_BUCKETS = [0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+
+# Callbacks run with the stats of every finished build (see `add_exporter`)
+_exporters = []
+
+# Stats that requests made on the current thread are recorded to (see `recording`)
+_current = threading.local()
+
+
+class BuildStats:
+    """Metrics collected while building (and rendering) an ontology: requests, bytes and latencies,
+    retries, parse time, per-generation crawl timings, cache and preload hits, skipped objects, and the
+    time spent in each phase. Safe to update from several threads.
+
+    Generation 0 holds the objects (or properties) being ontologized, generation 1 their parents, and so on.
+    Objects are resolved from the preloaded hierarchy (or an existing ontology), from the cache, or by a request.
+    """
+
+    def __init__(self) -> None:
+        self.requests = 0
+        self.retries = 0
+        self.bytes = 0
+        self.statuses = Counter()
+        self.latency_buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_total = 0.0
+        self.parse_seconds = 0.0
+        self.generations = {}
+        self.known_hits = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.skipped = {}
+        self.timings = {}
+
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def record_request(self, latency: float, status, nbytes: int = 0, retry: bool = False) -> None:
+        """Record one request attempt. `status` is the HTTP status, or the name of the exception raised."""
+        with self._lock:
+            self.requests += 1
+            self.retries += retry
+            self.bytes += nbytes
+            self.statuses[str(status)] += 1
+            self.latency_buckets[bisect.bisect_left(LATENCY_BUCKETS, latency)] += 1
+            self.latency_total += latency
+
+    def record_parse(self, seconds: float) -> None:
+        with self._lock:
+            self.parse_seconds += seconds
+
+    def record_lookup(self, generation: int, source: str) -> None:
+        """Record that an object of the given generation was queued for a lookup from the given source
+        ("known", "cache" or "request")."""
+        now = time.perf_counter() - self._start
+        with self._lock:
+            entry = self.generations.setdefault(
+                generation, {"objects": 0, "requested": 0, "start": now, "end": now})
+            entry["objects"] += 1
+            entry["requested"] += source == "request"
+            if source == "known":
+                self.known_hits += 1
+            elif source == "cache":
+                self.cache_hits += 1
+            elif source == "request":
+                self.cache_misses += 1
+
+    def record_resolved(self, generation: int) -> None:
+        """Record that an object of the given generation was resolved."""
+        now = time.perf_counter() - self._start
+        with self._lock:
+            entry = self.generations.get(generation)
+            if entry is not None:
+                entry["end"] = max(entry["end"], now)
+
+    def skip(self, obj: str, reason: str) -> None:
+        with self._lock:
+            self.skipped[obj] = reason
+
+    @contextmanager
+    def timer(self, name: str):
+        """Time a block, adding its duration to `timings[name]`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - start
+
+    def to_dict(self) -> dict:
+        """The stats as JSON-serializable dict."""
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "retries": self.retries,
+                "bytes": self.bytes,
+                "statuses": dict(self.statuses),
+                "latency": {
+                    "buckets": [{"le": bound, "count": count}
+                                for bound, count in zip(LATENCY_BUCKETS + [None], self.latency_buckets)],
+                    "total_seconds": self.latency_total,
+                    "mean_seconds": self.latency_total / self.requests if self.requests else None,
+                },
+                "parse_seconds": self.parse_seconds,
+                "generations": [{"generation": generation, **entry,
+                                 "seconds": entry["end"] - entry["start"]}
+                                for generation, entry in sorted(self.generations.items())],
+                "known_hits": self.known_hits,
+                "cache_hits": self.cache_hits,
+                "cache_misses": self.cache_misses,
+                "skipped": dict(self.skipped),
+                "timings": dict(self.timings),
+            }
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "BuildStats":
+        """Rebuild stats from the output of `to_dict` (e.g. as received from a server)."""
+        stats = cls()
+        for field in ("requests", "retries", "bytes", "parse_seconds", "known_hits", "cache_hits", "cache_misses"):
+            setattr(stats, field, d[field])
+        stats.statuses = Counter(d["statuses"])
+        stats.latency_buckets = [bucket["count"] for bucket in d["latency"]["buckets"]]
+        stats.latency_total = d["latency"]["total_seconds"]
+        stats.generations = {g["generation"]: {key: g[key] for key in ("objects", "requested", "start", "end")}
+                             for g in d["generations"]}
+        stats.skipped = dict(d["skipped"])
+        stats.timings = dict(d["timings"])
+        return stats
+
+    def to_json(self, **kwargs) -> str:
+        return json.dumps(self.to_dict(), **kwargs)
+
+    def summary(self) -> str:
+        """Human-readable summary of the stats."""
+        d = self.to_dict()
+        lines = [f"Requests: {d['requests']} ({d['retries']} retries), {d['bytes'] / 1e6:.2f} MB"]
+        if d["requests"]:
+            statuses = ", ".join(f"{status}: {count}" for status, count in sorted(d["statuses"].items()))
+            lines.append(f"Latency: mean {d['latency']['mean_seconds'] * 1000:.1f} ms; statuses {statuses}")
+            histogram = ", ".join(f"{'≤' + format(b['le'], 'g') + ' s' if b['le'] is not None else 'more'}: {b['count']}"
+                                  for b in d["latency"]["buckets"] if b["count"])
+            lines.append(f"Latency histogram: {histogram}")
+        lines.append(f"Parsing: {d['parse_seconds']:.3f} s")
+        lines.append(f"Lookups: {d['known_hits']} preloaded, {d['cache_hits']} cached, {d['cache_misses']} requested")
+        for g in d["generations"]:
+            lines.append(f"  Generation {g['generation']}: {g['objects']} objects ({g['requested']} requested), "
+                         f"{g['start']:.3f}-{g['end']:.3f} s")
+        if d["skipped"]:
+            lines.append(f"Skipped: {len(d['skipped'])}")
+            for obj, reason in d["skipped"].items():
+                lines.append(f"  {obj}: {reason}")
+        for name, seconds in d["timings"].items():
+            lines.append(f"{name.capitalize()}: {seconds:.3f} s")
+        return "\n".join(lines)
+
+    def export(self) -> None:
+        """Pass the stats to every registered exporter (see `add_exporter`)."""
+        for exporter in list(_exporters):
+            exporter(self)
+
+
+def add_exporter(exporter) -> None:
+    """Register a callback to receive the `BuildStats` of every build, once it finishes
+    (e.g. to forward them to a metrics system).
+
+    Args:
+        exporter (Callable[[BuildStats], None]): Callback.
+    """
+    _exporters.append(exporter)
+
+
+def remove_exporter(exporter) -> None:
+    """Unregister a callback registered with `add_exporter`."""
+    _exporters.remove(exporter)
+
+
+@contextmanager
+def recording(stats):
+    """Record requests made (through a SessionPool) and responses parsed on the current thread to `stats`,
+    within the block. If `stats` is None, nothing is recorded."""
+    previous = getattr(_current, "stats", None)
+    _current.stats = stats
+    try:
+        yield
+    finally:
+        _current.stats = previous
+
+
+def current():
+    """The stats that the current thread records to, or None."""
+    return getattr(_current, "stats", None)
+
+
+def carry(fn):
+    """Wrap `fn` so that, called on another thread (e.g. in a thread pool), it records to the stats
+    that the current thread records to."""
+    stats = current()
+
+    def wrapper(*args, **kwargs):
+        with recording(stats):
+            return fn(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,102 @@
+from xml.parsers import expat
+
+
+class FrameParser:
+    """Incremental parser for BioCyc (ptools-xml) responses, which keeps only what ontologize needs
+    of each top-level frame: its type and ID, parents, common name, and reaction list. Everything else is
+    skipped while reading, so memory is bounded by the frames kept rather than by the size of the XML.
+
+    Feed the response in chunks with `feed`, and collect finished frames with `pop` as they complete.
+    Each frame is a dict with keys type, frameid, common_name (None if absent), parents (in raw dict form,
+    i.e. `{parent_type: {"@frameid": ..., ...}}`, as given by xmltodict), reactions and subpathways
+    (the Reaction and Pathway IDs in the reaction list).
+    """
+
+    def __init__(self) -> None:
+        self._parser = expat.ParserCreate()
+        self._parser.buffer_text = True
+        self._parser.StartElementHandler = self._start
+        self._parser.EndElementHandler = self._end
+        self._parser.CharacterDataHandler = self._text
+
+        self._depth = 0
+        self._frame = None
+        self._slot = None
+        self._text_parts = None
+        self._frames = []
+
+    def _start(self, tag, attrs):
+        self._depth += 1
+        depth = self._depth
+
+        # Frames are the children of the root element (others, like metadata, have no frameid)
+        if depth == 2:
+            frameid = attrs.get("frameid")
+            if frameid is not None:
+                self._frame = {"type": tag, "frameid": frameid, "common_name": None,
+                               "parents": [], "reactions": [], "subpathways": []}
+            return
+        if self._frame is None:
+            return
+
+        # Slots of the frame
+        if depth == 3:
+            self._slot = tag
+            if tag == "common-name":
+                self._text_parts = []
+            return
+
+        # Frames referenced by the parent and reaction-list slots
+        if depth == 4 and "frameid" in attrs:
+            if self._slot == "parent":
+                self._frame["parents"].append({tag: {f"@{key}": value for key, value in attrs.items()}})
+            elif self._slot == "reaction-list":
+                if tag == "Reaction":
+                    self._frame["reactions"].append(attrs["frameid"])
+                elif tag == "Pathway":
+                    self._frame["subpathways"].append(attrs["frameid"])
+
+    def _text(self, data):
+        if self._text_parts is not None and self._depth == 3:
+            self._text_parts.append(data)
+
+    def _end(self, tag):
+        depth = self._depth
+        self._depth -= 1
+        if self._frame is None:
+            return
+
+        if depth == 3:
+            if self._text_parts is not None:
+                self._frame["common_name"] = "".join(self._text_parts).strip() or None
+                self._text_parts = None
+            self._slot = None
+        elif depth == 2:
+            self._frames.append(self._frame)
+            self._frame = None
+
+    def feed(self, data, final: bool = False) -> None:
+        """Parse the next chunk (bytes or str) of the response."""
+        self._parser.Parse(data, final)
+
+    def pop(self) -> list[dict]:
+        """Take the frames completed so far."""
+        frames, self._frames = self._frames, []
+        return frames
+
+
+def iter_frames(chunks):
+    """Parse a response given as an iterable of chunks, yielding each frame as soon as it is complete.
+    See `FrameParser`.
+    """
+    parser = FrameParser()
+    for chunk in chunks:
+        parser.feed(chunk)
+        yield from parser.pop()
+    parser.feed(b"", final=True)
+    yield from parser.pop()
+
+
+def parse_frames(content) -> list[dict]:
+    """Parse a whole response (bytes or str). See `FrameParser`."""
+    return list(iter_frames([content]))
@@ -0,0 +1,105 @@
+"""Offline stand-ins for BioCyc, for tests that should not need credentials."""
+
+import threading
+import time
+
+# Minimal hierarchy: two genes under one class, under the root
+FRAMES = {
+    "G1": ("Gene 1", ["CLASS-A"]),
+    "G2": ("Gene 2", ["CLASS-A"]),
+    "CLASS-A": ("Class A", ["Genes"]),
+    "Genes": ("Genes", []),
+}
+
+# Pathways, with the reactions and sub-pathways in their reaction lists
+PATHWAY_FRAMES = {
+    "PWY-1": ("Pathway 1", ["ENERGY"]),
+    "PWY-2": ("Pathway 2", ["ENERGY"]),
+    "SUPER-PWY": ("Superpathway", ["ENERGY"]),
+    "ENERGY": ("Energy", ["Pathways"]),
+    "Pathways": ("Pathways", []),
+}
+REACTION_LISTS = {
+    "PWY-1": (["RXN-1", "RXN-2"], []),
+    "PWY-2": (["RXN-3"], []),
+    "SUPER-PWY": (["RXN-4"], ["PWY-1"]),
+}
+
+# Genes of each reaction
+REACTION_GENES = {
+    "RXN-1": ["G1"],
+    "RXN-3": ["G1", "G2"],
+    "RXN-4": [],
+}
+
+
+class FakeResponse:
+    def __init__(self, content, status_code=200):
+        self.content = content.encode()
+        self.text = content
+        self.status_code = status_code
+
+    def iter_content(self, chunk_size=1):
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start:start + chunk_size]
+
+
+class FakeSession:
+    """Serves getxml requests for FRAMES, counting requests made. Unknown objects are
+    left out of batched responses, and give a 404 on their own."""
+
+    def __init__(self, latency=0, reject_batches=False):
+        self.requests = 0
+        self.latency = latency
+        self.reject_batches = reject_batches
+        self._lock = threading.Lock()
+
+    def get(self, url, **kwargs):
+        with self._lock:
+            self.requests += 1
+        time.sleep(self.latency)
+
+        if "fn=get-class-all-instances" in url:
+            return FakeResponse(f'<ptools-xml>{"".join(self._frame(p) for p in REACTION_LISTS)}</ptools-xml>')
+
+        if "fn=genes-of-reaction" in url:
+            reaction = url.split("id=", 1)[1].split("&")[0].split(":", 1)[1]
+            if reaction not in REACTION_GENES:
+                return FakeResponse("", status_code=404)
+            genes = "".join(f'<Gene frameid="{g}"/>' for g in REACTION_GENES[reaction])
+            return FakeResponse(f'<ptools-xml>{genes}</ptools-xml>')
+
+        if "fn=get-class-all-subs" in url:
+            # All classes (objects with children) except the root
+            classes = {p for _, parents in FRAMES.values() for p in parents} - {"Genes"}
+            return FakeResponse(f'<ptools-xml>{"".join(self._frame(c) for c in classes)}</ptools-xml>')
+
+        query = url.split("?", 1)[1].split("&")[0]
+        object_ids = [item.split(":", 1)[1] for item in query.split(",")]
+        if len(object_ids) > 1 and self.reject_batches:
+            return FakeResponse("", status_code=400)
+
+        frames = []
+        for object_id in object_ids:
+            if object_id not in FRAMES and object_id not in PATHWAY_FRAMES:
+                continue
+            frames.append(self._frame(object_id))
+        if not frames:
+            return FakeResponse("", status_code=404)
+        return FakeResponse(f'<ptools-xml>{"".join(frames)}</ptools-xml>')
+
+    @staticmethod
+    def _frame(object_id):
+        frame_type = "Gene" if object_id in FRAMES else "Pathway"
+        common_name, parents = FRAMES.get(object_id) or PATHWAY_FRAMES[object_id]
+        parent_xml = "".join(f'<parent><{frame_type} frameid="{p}"/></parent>' for p in parents)
+        reaction_xml = ""
+        if object_id in REACTION_LISTS:
+            reactions, subpathways = REACTION_LISTS[object_id]
+            reaction_xml = ("<reaction-list>"
+                            + "".join(f'<Reaction frameid="{r}"/>' for r in reactions)
+                            + "".join(f'<Pathway frameid="{p}"/>' for p in subpathways)
+                            + "</reaction-list>")
+        return (f'<{frame_type} frameid="{object_id}">'
+                f'<common-name datatype="string">{common_name}</common-name>'
+                f'{parent_xml}{reaction_xml}</{frame_type}>')
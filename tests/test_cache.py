@@ -0,0 +1,80 @@
+import os
+import tempfile
+
+from ontologize.cache import FrameCache
+from ontologize.ontology import get_ontology_data
+
+from fakes import FakeSession
+
+
+def test_cache_roundtrip():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "frames.sqlite")
+        cache = FrameCache(path=path)
+        cache.set("ECOLI", "G1", "Gene", [[], "Gene 1"])
+        assert cache.get("ECOLI", "G1", "Gene") == [[], "Gene 1"]
+        assert cache.get("ECOLI", "G1", "Pathway") is None
+
+        # On-disk tier survives a new process-level cache
+        cache.close()
+        cache = FrameCache(path=path)
+        assert cache.get("ECOLI", "G1", "Gene") == [[], "Gene 1"]
+
+        # Per-organism invalidation
+        cache.set("GCF_000011965", "G1", "Gene", [[], "Gene 1"])
+        cache.invalidate("ECOLI")
+        assert cache.get("ECOLI", "G1", "Gene") is None
+        assert cache.get("GCF_000011965", "G1", "Gene") is not None
+        cache.close()
+
+
+def test_set_many():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "frames.sqlite")
+        cache = FrameCache(path=path, disk_maxsize=300)
+        cache.set_many(("ECOLI", f"G{i}", "Gene", [[], f"Gene {i}"]) for i in range(400))
+        assert cache.get("ECOLI", "G399", "Gene") == [[], "Gene 399"]
+
+        # One batch past the pruning interval still enforces the on-disk size limit
+        cache.close()
+        cache = FrameCache(path=path)
+        assert sum(cache.get("ECOLI", f"G{i}", "Gene") is not None for i in range(400)) == 300
+        cache.close()
+
+
+def test_cache_eviction():
+    cache = FrameCache(path=None, maxsize=2, ttl=None)
+    for obj in ["A", "B", "C"]:
+        cache.set("ECOLI", obj, "Gene", [[], obj])
+    assert cache.get("ECOLI", "A", "Gene") is None
+    assert cache.get("ECOLI", "C", "Gene") == [[], "C"]
+
+    cache = FrameCache(path=None, ttl=-1)
+    cache.set("ECOLI", "A", "Gene", [[], "A"])
+    assert cache.get("ECOLI", "A", "Gene") is None
+
+
+def test_warm_run():
+    cache = FrameCache(path=None)
+
+    session = FakeSession()
+    cold = get_ontology_data(["G1", "G2"], "Gene", session=session,
+                             show_progress=False, cache=cache)
+    assert session.requests > 0
+
+    session = FakeSession()
+    warm = get_ontology_data(["G1", "G2"], "Gene", session=session,
+                             show_progress=False, cache=cache)
+    assert session.requests == 0
+    assert cold == warm
+
+
+def main():
+    test_cache_roundtrip()
+    test_set_many()
+    test_cache_eviction()
+    test_warm_run()
+
+
+if __name__ == "__main__":
+    main()
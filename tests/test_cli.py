@@ -0,0 +1,66 @@
+import os
+import subprocess
+import sys
+import tempfile
+
+from ontologize.cli import read_columns
+from ontologize.ontology import _assemble
+
+
+def test_read_columns():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "genes.tsv")
+        with open(path, "w") as f:
+            f.write("id\tcontrast\tnote\nG1\tup\tx\n\nG2\tdown\n")
+
+        # By name (with a header), or by position
+        names, (ids, contrasts, missing, notes) = read_columns(
+            path, ["id", 1, "pathways", "note"], header=True)
+        assert names == ["id", "contrast", "note"]
+        assert ids == ["G1", "G2"]
+        assert contrasts == ["up", "down"]
+        assert missing is None
+        assert notes == ["x", ""]
+
+        # Without a header, the first row is data
+        names, (ids, skipped) = read_columns(path, [0, None])
+        assert names == [] and ids == ["id", "G1", "G2"] and skipped is None
+
+        # A byte order mark (as written by Excel) is not part of the first column name
+        path = os.path.join(tmp, "excel.csv")
+        with open(path, "w", encoding="utf-8-sig") as f:
+            f.write("Gene,contrast\r\nG1,up\r\nG2,down\r\n")
+        names, (ids,) = read_columns(path, ["Gene"], header=True)
+        assert names == ["Gene", "contrast"] and ids == ["G1", "G2"]
+
+
+def test_lazy_imports():
+    # The CLI module itself does not pull in heavy dependencies
+    code = "import sys, ontologize.cli; print(any(m in sys.modules for m in ['pandas', 'networkx', 'requests']))"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "False"
+
+
+def test_tables():
+    ontology = _assemble(["G1", "G2"], [["G1"], ["G2"]], {"ROOT": "Root", "G1": "Gene 1", "G2": "Gene 2"},
+                         {"ROOT": [], "G1": ["ROOT"], "G2": ["ROOT"]})
+    with tempfile.TemporaryDirectory() as tmp:
+        saved = os.path.join(tmp, "genes.ontology")
+        ontology.save(saved)
+        tables = os.path.join(tmp, "tables")
+        subprocess.run([sys.executable, "-m", "ontologize", "--load", saved, "--tables", tables,
+                        "--table-format", "csv", "--coloroff"], capture_output=True, text=True, check=True)
+        with open(os.path.join(tables, "nodes.csv")) as f:
+            assert f.readline().strip() == "node,common_name,depth,member_count,parent_count,child_count"
+            assert f.readline().strip() == "ROOT,Root,0,2,0,2"
+        assert sorted(os.listdir(tables)) == ["edges.csv", "members.csv", "nodes.csv"]
+
+
+def main():
+    test_read_columns()
+    test_lazy_imports()
+    test_tables()
+
+
+if __name__ == "__main__":
+    main()
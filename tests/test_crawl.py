@@ -0,0 +1,245 @@
+import asyncio
+import threading
+import warnings
+
+from ontologize.biocyc import get_parents_and_common_names, pathways_of_reactions, genes_of_reactions
+from ontologize.cache import FrameCache
+from ontologize.ontology import (get_ontology_data, build_ontology, build_ontology_async, build_ontologies,
+                                 build_organism_ontologies, build_lazy_ontology, combined_counts, merge_ontologies)
+
+from fakes import FRAMES, FakeSession
+
+
+def test_crawl():
+    session = FakeSession(latency=0.01)
+    common_names, parents = get_ontology_data(["G1", "G2"], "Gene", session=session,
+                                              show_progress=False, cache=False, max_workers=2,
+                                              batch_size=1)
+
+    # Shared ancestors are only requested once
+    assert session.requests == len(FRAMES)
+    assert common_names == {obj: name for obj, (name, _) in FRAMES.items()}
+    assert all(parents[obj] == p for obj, (_, p) in FRAMES.items())
+
+
+def test_batched_crawl():
+    # One request per generation
+    session = FakeSession()
+    common_names, _ = get_ontology_data(["G1", "G2"], "Gene", session=session,
+                                        show_progress=False, cache=False)
+    assert session.requests == 3
+    assert common_names["Genes"] == "Genes"
+
+
+def test_batch_fallback():
+    # Rejected batches fall back to one request per object
+    session = FakeSession(reject_batches=True)
+    results, errors = get_parents_and_common_names(["G1", "G2", "MISSING"], "Gene",
+                                                   session=session, cache=False)
+    assert session.requests == 4
+    assert results["G1"][1] == "Gene 1"
+    assert list(errors) == ["MISSING"]
+
+    # Unknown objects do not abort the crawl
+    with warnings.catch_warnings(record=True):
+        common_names, _ = get_ontology_data(["G1", "MISSING"], "Gene", session=FakeSession(),
+                                            show_progress=False, cache=False)
+    assert common_names["MISSING"] == "MISSING"
+
+
+def test_preload():
+    # Hierarchy, root, then both genes in one batch
+    session = FakeSession()
+    common_names, parents = get_ontology_data(["G1", "G2"], "Gene", session=session,
+                                              show_progress=False, cache=False, preload=True)
+    assert session.requests == 3
+    assert parents["CLASS-A"] == ["Genes"]
+    assert common_names["Genes"] == "Genes"
+
+
+def test_build_ontology_async():
+    expected = build_ontology(["G1", "G2"], "Gene", session=FakeSession(),
+                              show_progress=False, cache=False)
+
+    async def run():
+        return await build_ontology_async(["G1", "G2"], "Gene", session=FakeSession(), cache=False)
+
+    ontology = asyncio.run(run())
+    assert set(ontology.graph.edges) == set(expected.graph.edges)
+    assert ontology.graph.nodes["Genes"]["members"] == {"G1", "G2"}
+
+    # Cache lookups do not run on the event loop's thread
+    class ThreadRecordingCache(FrameCache):
+        def get(self, *key):
+            threads.add(threading.current_thread())
+            return super().get(*key)
+
+    threads = set()
+    cache = ThreadRecordingCache(path=None)
+    asyncio.run(build_ontology_async(["G1", "G2"], "Gene", session=FakeSession(), cache=cache))
+    asyncio.run(build_ontology_async(["G1", "G2"], "Gene", session=FakeSession(), cache=cache))
+    assert threads and threading.main_thread() not in threads
+
+
+def test_add_remove_objects():
+    ontology = build_ontology(["G1"], "Gene", session=FakeSession(), show_progress=False, cache=False)
+
+    # Only the new gene is fetched; its ancestors are already in the graph
+    session = FakeSession()
+    ontology.add_objects(["G2"], session=session, cache=False)
+    assert session.requests == 1
+    assert ontology.graph.nodes["CLASS-A"]["members"] == {"G1", "G2"}
+    assert ontology.graph.nodes["G2"]["common_name"] == "Gene 2"
+
+    # Nodes left without members are pruned
+    ontology.remove_objects(["G1"])
+    assert "G1" not in ontology.graph
+    assert ontology.graph.nodes["Genes"]["members"] == {"G2"}
+    ontology.remove_objects(["G2"])
+    assert len(ontology.graph) == 0
+
+
+def test_build_ontologies():
+    # Costs the same requests as a single crawl of all lists
+    single = FakeSession()
+    build_ontology(["G1", "G2"], "Gene", session=single, show_progress=False, cache=False)
+    session = FakeSession()
+    ontologies = build_ontologies({"up": ["G1"], "down": ["G2"], "both": ["G1", "G2"]}, "Gene",
+                                  session=session, show_progress=False, cache=False)
+    assert session.requests == single.requests
+    assert ontologies["up"].graph.nodes["Genes"]["members"] == {"G1"}
+    assert ontologies["both"].graph.nodes["Genes"]["members"] == {"G1", "G2"}
+    assert "G2" not in ontologies["up"].graph
+
+    table = combined_counts(ontologies)
+    assert list(table.columns) == ["common_name", "up", "down", "both"]
+    assert table.index[0] == "Genes"
+    assert table.loc["CLASS-A", ["up", "down", "both"]].tolist() == [1, 1, 2]
+    assert table.loc["G2", "up"] == 0
+
+
+def test_concurrent_crawls():
+    # Concurrent crawls sharing a cache wait for each other's requests instead of repeating them
+    single = FakeSession()
+    build_ontology(["G1", "G2"], "Gene", session=single, show_progress=False, cache=False)
+    session = FakeSession(latency=0.05)
+    cache = FrameCache(path=None)
+    threads = [threading.Thread(target=build_ontology, args=(["G1", "G2"], "Gene"),
+                                kwargs={"session": session, "show_progress": False, "cache": cache})
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert session.requests == single.requests
+
+
+def test_organism_ontologies():
+    cache = FrameCache(path=None)
+    ontologies = build_organism_ontologies(["G1", "G2"], "Gene", org_ids=["ECOLI", "OTHER"], session=FakeSession(),
+                                           show_progress=False, cache=cache)
+    assert list(ontologies) == ["ECOLI", "OTHER"]
+    assert ontologies["OTHER"].org_id == "OTHER"
+    assert ontologies["OTHER"].graph.nodes["Genes"]["members"] == {"G1", "G2"}
+
+    # Each organism has its own parent index
+    assert cache.get("OTHER", "CLASS-A", "Gene") is not None
+
+    # Objects may differ by organism; the merged view aligns nodes by frame ID
+    ontologies = build_organism_ontologies({"ECOLI": ["G1"], "OTHER": ["G2"]}, "Gene", session=FakeSession(),
+                                           show_progress=False, cache=cache)
+    merged = merge_ontologies(ontologies)
+    assert merged.graph.nodes["CLASS-A"]["members"] == {"ECOLI:G1", "OTHER:G2"}
+    assert set(merged.graph.successors("CLASS-A")) == {"G1", "G2"}
+    assert combined_counts(ontologies).loc["G1", ["ECOLI", "OTHER"]].tolist() == [1, 0]
+
+
+def _structure(ontology):
+    # Edges and members of each node (rendered member order follows set order, which varies)
+    graph = ontology.graph
+    return set(graph.edges), {node: set(data["members"]) for node, data in graph.nodes(data=True)}
+
+
+def test_lazy_ontology():
+    eager = build_ontology(["G1", "G2"], "Gene", session=FakeSession(), show_progress=False, cache=False)
+
+    # Only the objects are looked up up front, then ancestors as they are needed
+    session = FakeSession()
+    lazy = build_lazy_ontology(["G1", "G2"], "Gene", session=session, cache=False, prefetch=False)
+    assert session.requests == 1
+    assert lazy.parents("G1") == ["CLASS-A"] and lazy.common_name("G2") == "Gene 2"
+    assert session.requests == 1
+    assert lazy.ancestors("G1") == {"CLASS-A", "Genes"}
+    assert session.requests == 3
+    assert _structure(lazy) == _structure(eager)
+    assert session.requests == 3
+
+    # Prefetching in the background does not repeat lookups made in the foreground
+    session = FakeSession(latency=0.01)
+    lazy = build_lazy_ontology(["G1", "G2"], "Gene", session=session, cache=False)
+    assert lazy.ancestors("G2") == {"CLASS-A", "Genes"}
+    assert lazy.graph.nodes["Genes"]["members"] == {"G1", "G2"}
+    assert session.requests == 3
+    lazy.compact()
+    assert _structure(lazy) == _structure(eager)
+
+
+def test_pathways_of_reactions():
+    cache = FrameCache(path=None)
+    session = FakeSession()
+    result = pathways_of_reactions(["RXN-1", "RXN-3", "RXN-4", "RXN-X"], session=session, cache=cache)
+
+    # Superpathways include the reactions of their sub-pathways
+    assert result == {"RXN-1": {"PWY-1", "SUPER-PWY"}, "RXN-3": {"PWY-2"},
+                      "RXN-4": {"SUPER-PWY"}, "RXN-X": set()}
+
+    # The index is downloaded once per organism
+    pathways_of_reactions(["RXN-2"], session=session, cache=cache)
+    assert session.requests == 1
+
+
+def test_derived_property():
+    ontology = build_ontology(["RXN-1", "RXN-3"], "Pathway", property="pathways", session=FakeSession(),
+                              show_progress=False, cache=False)
+    assert ontology.graph.nodes["ENERGY"]["members"] == {"RXN-1", "RXN-3"}
+    assert ontology.graph.nodes["SUPER-PWY"]["members"] == {"RXN-1"}
+
+
+def test_genes_of_reactions():
+    cache = FrameCache(path=None)
+    session = FakeSession()
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        result = genes_of_reactions(["RXN-1", "RXN-3", "RXN-4", "RXN-X"], session=session, cache=cache)
+    assert result == {"RXN-1": ["G1"], "RXN-3": ["G1", "G2"], "RXN-4": [], "RXN-X": []}
+    assert len(caught) == 1
+
+    # Found reactions are cached
+    session = FakeSession()
+    genes_of_reactions(["RXN-1", "RXN-3", "RXN-4"], session=session, cache=cache)
+    assert session.requests == 0
+
+    ontology = build_ontology(["RXN-1", "RXN-3"], "Gene", property="genes", session=FakeSession(),
+                              show_progress=False, cache=cache)
+    assert ontology.graph.nodes["G2"]["members"] == {"RXN-3"}
+    assert ontology.graph.nodes["CLASS-A"]["members"] == {"RXN-1", "RXN-3"}
+
+
+def main():
+    test_crawl()
+    test_batched_crawl()
+    test_batch_fallback()
+    test_preload()
+    test_build_ontology_async()
+    test_add_remove_objects()
+    test_build_ontologies()
+    test_concurrent_crawls()
+    test_organism_ontologies()
+    test_lazy_ontology()
+    test_pathways_of_reactions()
+    test_derived_property()
+    test_genes_of_reactions()
+
+
+if __name__ == "__main__":
+    main()
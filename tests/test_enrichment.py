@@ -0,0 +1,63 @@
+import math
+from collections import defaultdict
+
+from ontologize.enrichment import hypergeometric_sf, fdr_bh
+from ontologize.ontology import _assemble
+
+
+def hierarchy(genes):
+    """Parent data for genes G0..G99: G0-G9 under CLASS-A, the rest under CLASS-B, both under the root."""
+    parents = defaultdict(list, {"CLASS-A": ["Genes"], "CLASS-B": ["Genes"]})
+    for gene in genes:
+        parents[gene] = ["CLASS-A" if int(gene[1:]) < 10 else "CLASS-B"]
+    common_names = {node: node for node in [*parents, "Genes"]}
+    return common_names, parents
+
+
+def build(genes):
+    common_names, parents = hierarchy(genes)
+    return _assemble(genes, [[gene] for gene in genes], common_names, parents)
+
+
+def test_hypergeometric_sf():
+    def exact(k, N, K, n):
+        return sum(math.comb(K, i) * math.comb(N - K, n - i)
+                   for i in range(k, min(K, n) + 1)) / math.comb(N, n)
+
+    for k, N, K, n in [(0, 10, 3, 4), (2, 10, 3, 4), (3, 10, 3, 4), (5, 100, 10, 8), (4, 20, 5, 15)]:
+        assert math.isclose(hypergeometric_sf([k], N, [K], n)[0], exact(k, N, K, n))
+
+
+def test_fdr_bh():
+    q = fdr_bh([0.01, 0.04, 0.03, 0.5])
+    assert [round(x, 4) for x in q] == [0.04, 0.0533, 0.0533, 0.5]
+
+
+def test_enrichment():
+    background = build([f"G{i}" for i in range(100)])
+
+    # Study set drawn mostly from CLASS-A
+    study = build([f"G{i}" for i in range(8)] + ["G50", "G60"])
+    table = study.enrichment(background)
+
+    assert table.index[0] == "CLASS-A"
+    assert table.loc["CLASS-A", "count"] == 8
+    assert table.loc["CLASS-A", "background_count"] == 10
+    assert table.loc["CLASS-A", "fold_enrichment"] == 8
+    assert table.loc["CLASS-A", "q_value"] < 1e-6
+    assert table.loc["Genes", "p_value"] == 1.0
+    assert "G0" not in table.index
+
+    # Compact ontologies give the same result
+    compact = study.enrichment(background.compact())
+    assert compact.equals(table)
+
+
+def main():
+    test_hypergeometric_sf()
+    test_fdr_bh()
+    test_enrichment()
+
+
+if __name__ == "__main__":
+    main()
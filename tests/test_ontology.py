@@ -0,0 +1,301 @@
+import io
+import os
+import random
+import tempfile
+from collections import defaultdict
+
+import ontologize.ontology as ontology_module
+from ontologize.ontology import Ontology, _assemble
+
+
+def chain(depth):
+    """Parent data for a single chain C0 <- C1 <- ... <- C{depth}, plus two objects under the deepest class."""
+    parents = defaultdict(list, {f"C{i}": [f"C{i - 1}"] for i in range(1, depth + 1)})
+    parents["A"] = [f"C{depth}"]
+    parents["B"] = [f"C{depth}"]
+    common_names = {node: node for node in [*parents, "C0"]}
+    return common_names, parents
+
+
+def normalized(text):
+    """Sorted lines of a text rendering, with members sorted (set order is arbitrary)."""
+    lines = []
+    for line in text.splitlines():
+        head, _, members = line.partition(" {")
+        lines.append(head + " {" + ", ".join(sorted(members.rstrip("}").split(", "))) + "}")
+    return sorted(lines)
+
+
+def test_assemble_deep():
+    # Deeper than the default recursion limit
+    common_names, parents = chain(5000)
+    ontology = _assemble(["A", "B"], [["A"], ["B"]], common_names, parents)
+
+    assert ontology.graph.number_of_nodes() == 5003
+    assert ontology.graph.nodes["C0"]["members"] == {"A", "B"}
+    assert ontology.graph.nodes["A"]["members"] == {"A"}
+
+    # Renders without recursion, too
+    lines = ontology.to_string().splitlines()
+    assert len(lines) == 5003
+    assert {line.lstrip(" └├") for line in lines[-2:]} == {"A [A] {A}", "B [B] {B}"}
+
+
+def test_assemble_property():
+    # Members are labels, propagated from every property they carry
+    common_names, parents = chain(2)
+    ontology = _assemble(["X", "Y"], [["A", "B"], ["B"]], common_names, parents)
+
+    assert ontology.graph.nodes["B"]["members"] == {"X", "Y"}
+    assert ontology.graph.nodes["C1"]["members"] == {"X", "Y"}
+    assert set(ontology.graph.successors("C2")) == {"A", "B"}
+
+
+def wide(n_objects, n_classes=500, seed=0):
+    """Parent data for a random DAG of classes (a fifth with two parents), with each object under one class."""
+    rng = random.Random(seed)
+    parents = defaultdict(list)
+    classes = ["C0"]
+    for i in range(1, n_classes):
+        parents[f"C{i}"] = rng.sample(classes, min(len(classes), 1 + (rng.random() < 0.2)))
+        classes.append(f"C{i}")
+    objects = [f"O{i}" for i in range(n_objects)]
+    for obj in objects:
+        parents[obj] = [rng.choice(classes[1:])]
+    common_names = {node: node for node in [*parents, "C0"]}
+    return objects, [[obj] for obj in objects], common_names, parents
+
+
+def test_assemble_work():
+    # Members are propagated with one set union per edge, each costing the members below the edge,
+    # rather than work proportional to the number of labels at every node (timings: benchmarks/run.py)
+    class CountingSet(set):
+        def __ior__(self, other):
+            work.append(len(other))
+            return super().__ior__(other)
+
+    objects, property, common_names, parents = wide(10_000)
+    work = []
+    ontology_module.set = CountingSet
+    try:
+        ontology = _assemble(objects, property, common_names, parents)
+    finally:
+        del ontology_module.set
+
+    graph = ontology.graph
+    assert graph.nodes["C0"]["members"] == set(objects)
+    assert len(work) == graph.number_of_edges()
+    assert sum(work) == sum(len(graph.nodes[child]["members"]) for _, child in graph.edges)
+
+
+def test_write():
+    common_names, parents = chain(2)
+    ontology = _assemble(["A"], [["A"]], common_names, parents)
+
+    stream = io.StringIO()
+    ontology.write(stream, max_depth=1)
+    assert stream.getvalue() == ontology.to_string(max_depth=1)
+    assert stream.getvalue() == "C0 [C0] {A}\n└C1 [C1] {A}\n"
+    assert list(ontology.iter_lines(include_leaves=False))[-1] == " └C2 [C2] {A}"
+
+
+def test_dedupe():
+    # C2 has two parents, so is reachable along two paths
+    common_names, parents = chain(2)
+    parents["C2"].append("C0")
+    ontology = _assemble(["A"], [["A"]], common_names, parents)
+
+    full = ontology.to_string()
+    assert full.count("C2 [C2]") == 2
+    assert full.count("A [A]") == 2
+
+    deduped = ontology.to_string(dedupe=True)
+    assert deduped.count("C2 [C2]") == 2
+    assert deduped.count("A [A]") == 1
+    assert "(see above)" in deduped
+
+    html = ontology.to_html(dedupe=True)
+    assert html.count("(see above)") == 1
+
+
+def test_html():
+    common_names, parents = chain(2)
+    common_names["A"] = "</script><A & co>"
+    ontology = _assemble(["A"], [["A"]], common_names, parents)
+
+    html = ontology.to_html()
+    assert html.count("<details") == 4
+    assert "&lt;/script&gt;&lt;A &amp; co&gt;" in html
+    assert ontology.to_html(max_depth=1).count("<details") == 2
+    assert ontology.to_html(include_leaves=False).count("<details") == 3
+
+    # Lazy reports embed the nodes as JSON instead
+    lazy = ontology.to_html(lazy=True)
+    assert "<details" not in lazy
+    assert '"C2"' in lazy
+    assert lazy.count("</script>") == 2
+
+    stream = io.StringIO()
+    ontology.write_html(stream)
+    assert stream.getvalue() == html
+
+
+def test_save_load():
+    common_names, parents = chain(3)
+    common_names["C1"] = "Ünïcode name"
+    ontology = _assemble(["A", "B"], [["A"], ["A", "B"]], common_names, parents)
+    ontology.schema_type, ontology.org_id = "Gene", "ECOLI"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "chain.ont")
+        ontology.save(path)
+
+        for mmap_mode in [True, False]:
+            loaded = Ontology.load(path, mmap_mode=mmap_mode)
+            assert loaded.is_compact
+            assert len(loaded.to_string().splitlines()) == len(ontology.to_string().splitlines())
+            assert loaded.graph.nodes["C1"]["common_name"] == "Ünïcode name"
+            assert set(loaded.graph.edges) == set(ontology.graph.edges)
+            assert loaded.graph.nodes["C0"]["members"] == {"A", "B"}
+            assert (loaded.schema_type, loaded.org_id) == ("Gene", "ECOLI")
+
+        # Empty ontologies round-trip too
+        Ontology().save(path)
+        assert len(Ontology.load(path).graph) == 0
+
+        # Numeric labels (e.g. from a spreadsheet) are saved as strings, and missing ones are rejected
+        numeric = _assemble([101, 102], [["A"], ["B"]], common_names, parents)
+        numeric.save(path)
+        assert Ontology.load(path).graph.nodes["C0"]["members"] == {"101", "102"}
+        try:
+            _assemble([101, float("nan")], [["A"], ["B"]], common_names, parents).save(path)
+            assert False, "expected a ValueError"
+        except ValueError as e:
+            assert "Missing value among the labels" in str(e)
+
+
+def test_compact():
+    common_names, parents = chain(3)
+    parents["C"] = ["C1"]
+    objects, property = ["A", "B", "C"], [["A"], ["B"], ["C"]]
+    ontology = _assemble(objects, property, common_names | {"C": "C"}, parents)
+    compact = _assemble(objects, property, common_names | {"C": "C"}, parents, compact=True)
+    assert compact.is_compact
+
+    # Renders without materializing the graph
+    assert normalized(compact.to_string()) == normalized(ontology.to_string())
+    compact.to_html()
+    assert compact.is_compact
+
+    # Graph is materialized on access
+    assert set(compact.graph.edges) == set(ontology.graph.edges)
+    assert compact.graph.nodes["C0"]["members"] == {"A", "B", "C"}
+    assert not compact.is_compact
+
+    # And can be compacted again
+    assert ontology.compact().is_compact
+    assert set(ontology.graph.edges) == set(compact.graph.edges)
+
+
+def test_queries():
+    # C0 <- C1 <- C2 <- C3 <- {A, B}, with C under C1 and D under both C3 and C
+    common_names, parents = chain(3)
+    parents["C"] = ["C1"]
+    parents["D"] = ["C3", "C"]
+    objects = ["A", "B", "C", "D"]
+    common_names = common_names | {"C": "C", "D": "D"}
+    for compact in [False, True]:
+        ontology = _assemble(objects, [[obj] for obj in objects], common_names, parents, compact=compact)
+        assert ontology.is_ancestor("C1", "A") and not ontology.is_ancestor("A", "C1")
+        assert not ontology.is_ancestor("C", "A")
+        assert ontology.ancestors("D") == {"C0", "C1", "C2", "C3", "C"}
+        assert ontology.descendants("C1") == {"C2", "C3", "A", "B", "C", "D"}
+        assert ontology.common_ancestors(["A", "B"]) == {"C0", "C1", "C2", "C3"}
+        assert ontology.lowest_common_ancestors(["A", "B"]) == {"C3"}
+        assert ontology.lowest_common_ancestors(["A", "C"]) == {"C1"}
+        assert ontology.lowest_common_ancestors(["C3", "A"]) == {"C3"}
+
+        # D is two levels below C1 through C, so at depth 3 rather than 4
+        assert ontology.members_at_depth(2) == {"C2": {"A", "B", "D"}, "C": {"C", "D"}}
+        assert ontology.members_at_depth(3) == {"C3": {"A", "B", "D"}, "D": {"D"}}
+        assert ontology.members_at_depth(4) == {"A": {"A"}, "B": {"B"}}
+        assert ontology.is_compact == compact
+
+    # The index follows changes to the ontology
+    ontology.remove_objects(["A"])
+    assert "A" not in ontology.descendants("C3")
+    ontology.graph.add_edge("C0", "E")
+    assert ontology.is_ancestor("C0", "E")
+
+    # Including edits that keep the number of nodes
+    ontology.graph.add_edge("C", "C3")
+    assert ontology.is_ancestor("C", "B") and ontology.lowest_common_ancestors(["B", "C"]) == {"C"}
+
+    # Reading the graph keeps the index
+    index = ontology._index()
+    assert ontology.graph.nodes["C"]["common_name"] == "C"
+    assert ontology.is_ancestor("C", "B") and ontology._index() is index
+
+    # Moving an edge keeps the numbers of nodes and edges, so needs invalidate_index
+    ontology.graph.remove_edge("C", "C3")
+    ontology.graph.add_edge("C2", "E")
+    ontology.invalidate_index()
+    assert not ontology.is_ancestor("C", "B") and ontology.is_ancestor("C2", "E")
+
+
+def test_frames():
+    common_names, parents = chain(2)
+    parents["C"] = ["C1", "C0"]
+    objects = ["A", "B", "C"]
+    ontology = _assemble(objects, [[obj] for obj in objects], common_names | {"C": "C"}, parents)
+    nodes, edges, members = ontology.to_frames()
+
+    # Parents come before children; C is directly under C0, so at depth 1
+    assert nodes["node"].tolist()[0] == "C0"
+    depth = dict(zip(nodes["node"], nodes["depth"]))
+    assert depth == {"C0": 0, "C1": 1, "C2": 2, "A": 3, "B": 3, "C": 1}
+    assert dict(zip(nodes["node"], nodes["member_count"]))["C1"] == 3
+    assert set(zip(edges["parent"], edges["child"])) == set(ontology.graph.edges)
+    assert len(members) == nodes["member_count"].sum()
+    assert set(members.loc[members["node"] == "C1", "member"]) == {"A", "B", "C"}
+
+    # Tables rebuild the ontology
+    rebuilt = Ontology.from_frames(nodes, edges, members, schema_type="Gene")
+    assert rebuilt.is_compact and rebuilt.schema_type == "Gene"
+    assert normalized(rebuilt.to_string()) == normalized(ontology.to_string())
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ontology.write_tables(os.path.join(tmp, "tsv"), format="tsv")
+        assert sorted(os.listdir(os.path.join(tmp, "tsv"))) == ["edges.tsv", "members.tsv", "nodes.tsv"]
+
+        # Parquet needs pyarrow
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            try:
+                ontology.write_tables(os.path.join(tmp, "parquet"))
+                assert False, "expected an ImportError"
+            except ImportError:
+                return
+        ontology.schema_type = "Gene"
+        ontology.write_tables(os.path.join(tmp, "parquet"))
+        loaded = Ontology.read_tables(os.path.join(tmp, "parquet"))
+        assert loaded.schema_type == "Gene"
+        assert normalized(loaded.to_string()) == normalized(ontology.to_string())
+
+
+def main():
+    test_assemble_deep()
+    test_assemble_property()
+    test_assemble_work()
+    test_write()
+    test_dedupe()
+    test_html()
+    test_save_load()
+    test_compact()
+    test_queries()
+    test_frames()
+
+
+if __name__ == "__main__":
+    main()
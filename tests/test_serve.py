@@ -0,0 +1,106 @@
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+
+from ontologize.cache import FrameCache
+from ontologize.client import ServiceClient, ServiceError, parse_address
+from ontologize.ontology import build_ontology
+from ontologize.serve import OntologyService, make_server
+
+from fakes import FakeSession
+
+
+def _serving(service, **address):
+    server = make_server(service, **address)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def test_coalesced_builds():
+    # Identical concurrent builds are built once, and reused afterwards
+    single = FakeSession()
+    build_ontology(["G1", "G2"], "Gene", session=single, show_progress=False, cache=False)
+    session = FakeSession(latency=0.05)
+    service = OntologyService(session=session, cache=FrameCache(path=None))
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(service.build(["G1", "G2"], "Gene")))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert session.requests == single.requests
+    assert len({id(ontology) for ontology, _ in results}) == 1
+    assert sorted(cached for _, cached in results) == [False, True, True, True]
+    assert service.build(["G1", "G2"], "Gene") == (results[0][0], True)
+
+    # Refreshing drops the built ontology
+    _, cached = service.build(["G1", "G2"], "Gene", refresh=True)
+    assert not cached and service.status()["ontologies"] == 1
+
+
+def test_http_api():
+    service = OntologyService(session=FakeSession(), cache=FrameCache(path=None))
+    server = _serving(service, host="127.0.0.1", port=0)
+    try:
+        client = ServiceClient(f"127.0.0.1:{server.server_address[1]}")
+        response = client.render(["G1", "G2"], "Gene", max_depth=1)
+        assert response["output"].startswith("Genes [Genes]")
+        assert "Class A" in response["output"] and "Gene 1" not in response["output"]
+        assert response["nodes"] == 4 and not response["cached"]
+        assert response["stats"]["cache_misses"] == 4
+
+        html = client.render(["G1", "G2"], "Gene", format="html", lazy=True)
+        assert html["cached"] and html["output"].startswith("<!DOCTYPE html>")
+
+        # Stats cover each request only: a reused ontology reports no new lookups, and renders do not add up
+        again = client.render(["G1", "G2"], "Gene", max_depth=1)
+        assert again["cached"] and again["stats"]["requests"] == 0 and again["stats"]["cache_misses"] == 0
+        assert set(again["stats"]["timings"]) == {"render.text"}
+        assert set(html["stats"]["timings"]) == {"render.html"}
+        assert client.status()["ontologies"] == 1
+
+        for bad in [{"format": "pdf"}, {"bogus": 1}]:
+            try:
+                client.render(["G1"], "Gene", **bad)
+                assert False, "expected an error"
+            except ServiceError:
+                pass
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_unix_socket_and_cli():
+    with tempfile.TemporaryDirectory() as tmp:
+        socket_path = os.path.join(tmp, "ontologize.sock")
+        service = OntologyService(session=FakeSession(), cache=FrameCache(path=None))
+        server = _serving(service, socket_path=socket_path)
+        try:
+            assert parse_address(f"unix:{socket_path}") == ("unix", socket_path)
+            assert ServiceClient(f"unix:{socket_path}").build(["G1"], "Gene")["nodes"] == 3
+
+            # The CLI hands the build to the server
+            path = os.path.join(tmp, "genes.tsv")
+            with open(path, "w") as f:
+                f.write("G1\nG2\n")
+            result = subprocess.run(
+                [sys.executable, "-m", "ontologize", path, "Gene", "--server", f"unix:{socket_path}", "--coloroff",
+                 "--stats", "json"], capture_output=True, text=True, check=True)
+            assert "Class A [CLASS-A]" in result.stdout
+            assert '"cache_misses"' in result.stderr
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+def main():
+    test_coalesced_builds()
+    test_http_api()
+    test_unix_socket_and_cli()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "benchmarks"))
+
+import ontologize.biocyc as biocyc
+from ontologize.biocyc import SessionPool
+from ontologize.ontology import build_ontology
+
+from server import BioCycServer, SyntheticHierarchy
+
+
+def test_build_against_server():
+    # Real HTTP round trips: login, batched getxml, class hierarchy preload and retried 503s
+    hierarchy = SyntheticHierarchy(200, depth=3, fanout=3, multi_parent_rate=0.3)
+    url = biocyc.BIOCYC_URL
+    try:
+        with BioCycServer(hierarchy, error_rate=0.2, seed=1) as server:
+            biocyc.BIOCYC_URL = server.url
+            session = SessionPool(user="user", password="password", backoff=0.001)
+            for preload in [False, True]:
+                ontology = build_ontology(hierarchy.objects, "Gene", session=session, show_progress=False,
+                                          cache=False, preload=preload)
+                assert ontology.graph.nodes["Genes"]["members"] == set(hierarchy.objects)
+                assert set(ontology.graph.predecessors("OBJ-0")) == set(hierarchy.frames["OBJ-0"][1])
+            assert server.stats["errors"] > 0
+    finally:
+        biocyc.BIOCYC_URL = url
+
+
+def main():
+    test_build_against_server()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import threading
+import time
+
+import requests
+
+from ontologize.biocyc import AdaptiveLimiter, SessionPool
+
+
+class FlakyAdapter(requests.adapters.BaseAdapter):
+    """Answers with the given status codes in turn, then 200."""
+
+    def __init__(self, statuses):
+        super().__init__()
+        self.statuses = list(statuses)
+        self.sent = 0
+
+    def send(self, request, **kwargs):
+        self.sent += 1
+        r = requests.Response()
+        r.status_code = self.statuses.pop(0) if self.statuses else 200
+        r.request = request
+        r._content = b""
+        return r
+
+    def close(self):
+        pass
+
+
+def test_retries():
+    pool = SessionPool(session=requests.Session(), backoff=0)
+    adapter = FlakyAdapter([429, 503])
+    pool.session().mount("https://", adapter)
+
+    r = pool.get("https://websvc.biocyc.org/getxml?ECOLI:EG10131")
+    assert r.status_code == 200
+    assert adapter.sent == 3
+
+    # Gives up after max retries, returning the last response
+    pool = SessionPool(session=requests.Session(), backoff=0, retries=1)
+    adapter = FlakyAdapter([500, 500, 500])
+    pool.session().mount("https://", adapter)
+    assert pool.get("https://websvc.biocyc.org/getxml?ECOLI:EG10131").status_code == 500
+    assert adapter.sent == 2
+
+
+def test_adaptive_limiter():
+    limiter = AdaptiveLimiter(initial=4, maximum=8)
+
+    # Fast successes grow the limit additively
+    for _ in range(40):
+        limiter.record(0.1, ok=True)
+    assert limiter.limit == 8
+
+    # A failure halves it
+    limiter.record(0.1, ok=False)
+    assert limiter.limit == 4
+
+    # Slow responses count as congestion
+    limiter._last_decrease = 0
+    limiter.record(1.0, ok=True)
+    assert limiter.limit == 2
+
+
+def test_limiter_slots():
+    # Requests sharing a limiter never exceed its limit together
+    limiter = AdaptiveLimiter(initial=2, maximum=2)
+    in_flight, peak = [0], [0]
+    lock = threading.Lock()
+
+    def request():
+        with limiter.slot():
+            with lock:
+                in_flight[0] += 1
+                peak[0] = max(peak[0], in_flight[0])
+            time.sleep(0.01)
+            with lock:
+                in_flight[0] -= 1
+
+    threads = [threading.Thread(target=request) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert peak[0] == 2
+
+
+def main():
+    test_retries()
+    test_adaptive_limiter()
+    test_limiter_slots()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import json
+import os
+import sys
+import warnings
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "benchmarks"))
+
+import ontologize.biocyc as biocyc
+from ontologize.biocyc import SessionPool
+from ontologize.cache import FrameCache
+from ontologize.ontology import build_ontology
+from ontologize.stats import BuildStats, add_exporter, remove_exporter
+
+from fakes import FakeSession
+from server import BioCycServer, SyntheticHierarchy
+
+
+def test_build_stats():
+    cache = FrameCache(path=None)
+    exported = []
+    add_exporter(exported.append)
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            ontology = build_ontology(["G1", "G2", "MISSING"], "Gene", session=FakeSession(), show_progress=False,
+                                      cache=cache)
+        ontology.to_string()
+        ontology.to_html()
+        again = build_ontology(["G1", "G2"], "Gene", session=FakeSession(), show_progress=False, cache=cache)
+    finally:
+        remove_exporter(exported.append)
+
+    stats = ontology.stats
+    assert exported == [stats, again.stats]
+
+    # Objects are generation 0, their class generation 1 and the root generation 2
+    generations = {g["generation"]: g for g in stats.to_dict()["generations"]}
+    assert sorted(generations) == [0, 1, 2]
+    assert generations[0]["objects"] == 3 and generations[0]["requested"] == 3
+    assert stats.cache_misses == 5 and stats.cache_hits == 0
+    assert stats.skipped["MISSING"].startswith("HTTPError")
+    assert {"crawl", "assemble", "render.text", "render.html"} <= set(stats.timings)
+
+    # The second build is served from the cache
+    assert again.stats.cache_hits == 4 and again.stats.cache_misses == 0
+    assert json.loads(again.stats.to_json())["cache_hits"] == 4
+    assert "4 cached" in again.stats.summary()
+
+
+def test_request_stats():
+    # Requests through a SessionPool are counted, including retried 503s
+    hierarchy = SyntheticHierarchy(50, depth=2, fanout=3)
+    url = biocyc.BIOCYC_URL
+    try:
+        with BioCycServer(hierarchy, error_rate=0.5, seed=1) as server:
+            biocyc.BIOCYC_URL = server.url
+            session = SessionPool(user="user", password="password", backoff=0.001)
+            ontology = build_ontology(hierarchy.objects, "Gene", session=session, show_progress=False,
+                                      cache=False, preload=True)
+            stats = ontology.stats
+            assert stats.requests == server.stats["requests"]
+            assert stats.statuses["503"] == server.stats["errors"] > 0
+            assert stats.retries > 0
+            assert 0 < stats.bytes <= server.stats["bytes"]
+            assert sum(stats.latency_buckets) == stats.requests
+            assert stats.parse_seconds > 0
+            assert stats.known_hits > 0 and "preload" in stats.timings
+    finally:
+        biocyc.BIOCYC_URL = url
+
+
+def test_empty_stats():
+    stats = BuildStats()
+    assert stats.to_dict()["latency"]["mean_seconds"] is None
+    assert stats.summary().startswith("Requests: 0")
+
+
+def main():
+    test_build_stats()
+    test_request_stats()
+    test_empty_stats()
+
+
+if __name__ == "__main__":
+    main()
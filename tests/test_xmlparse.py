@@ -0,0 +1,51 @@
+from ontologize.xmlparse import iter_frames, parse_frames
+
+RESPONSE = b"""<?xml version="1.0" encoding="UTF-8"?>
+<ptools-xml ptools-version="27.0" xml:base="http://BioCyc.org/getxml?ECOLI:PWY-1">
+<metadata><url>http://BioCyc.org/</url><service_name>getxml</service_name></metadata>
+<Pathway ID="ECOLI:SUPER-PWY" orgid="ECOLI" frameid="SUPER-PWY" detail="low">
+  <parent><Pathway resource="getxml?ECOLI:ENERGY" orgid="ECOLI" frameid="ENERGY" class="true"/></parent>
+  <parent><Pathway resource="getxml?ECOLI:SUPER" orgid="ECOLI" frameid="SUPER" class="true"/></parent>
+  <common-name datatype="string">super &amp; &lt;i&gt;pathway&lt;/i&gt;</common-name>
+  <reaction-list>
+    <Reaction resource="getxml?ECOLI:RXN-1" orgid="ECOLI" frameid="RXN-1"/>
+    <Pathway resource="getxml?ECOLI:PWY-1" orgid="ECOLI" frameid="PWY-1"/>
+  </reaction-list>
+  <enzymatic-reaction><Enzymatic-Reaction frameid="ENZRXN-1"><common-name>nested</common-name></Enzymatic-Reaction></enzymatic-reaction>
+</Pathway>
+<Gene ID="ECOLI:G1" orgid="ECOLI" frameid="G1" detail="low"/>
+</ptools-xml>
+"""
+
+
+def test_parse_frames():
+    pathway, gene = parse_frames(RESPONSE)
+
+    assert pathway["type"] == "Pathway" and pathway["frameid"] == "SUPER-PWY"
+    assert pathway["common_name"] == "super & <i>pathway</i>"
+    assert [p["Pathway"]["@frameid"] for p in pathway["parents"]] == ["ENERGY", "SUPER"]
+    assert pathway["parents"][0]["Pathway"]["@class"] == "true"
+    assert pathway["reactions"] == ["RXN-1"]
+    assert pathway["subpathways"] == ["PWY-1"]
+
+    # Frames without slots, and nested frames are not frames of their own
+    assert gene == {"type": "Gene", "frameid": "G1", "common_name": None,
+                    "parents": [], "reactions": [], "subpathways": []}
+
+
+def test_iter_frames_chunked():
+    # Chunk boundaries may fall anywhere, including within text and multi-byte characters
+    response = RESPONSE.replace(b"super", "süper".encode("utf-8"))
+    chunks = [response[i:i + 7] for i in range(0, len(response), 7)]
+    frames = list(iter_frames(chunks))
+    assert frames == parse_frames(response)
+    assert frames[0]["common_name"] == "süper & <i>pathway</i>"
+
+
+def main():
+    test_parse_frames()
+    test_iter_frames_chunked()
+
+
+if __name__ == "__main__":
+    main()